@@ -1,5 +1,6 @@
 import logging
-from flask import Flask, request, jsonify
+import json
+from flask import Flask, request, jsonify, Response, stream_with_context
 import os
 import tempfile
 from werkzeug.utils import secure_filename
@@ -13,7 +14,6 @@ from collections import defaultdict
 import time
 from config import SUPPORTED_FILE_TYPES
 from flask import Flask, request, jsonify
-from main import rag_app
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -70,6 +70,17 @@ class TaskTracker:
 
 task_tracker = TaskTracker()
 
+# Built on first use rather than at import, so importing this module stays cheap
+rag_app = None
+rag_app_lock = threading.Lock()
+
+def get_rag_app():
+    global rag_app
+    with rag_app_lock:
+        if rag_app is None:
+            rag_app = RAGApplication()
+        return rag_app
+
 def cleanup_old_tasks():
     while True:
         task_tracker.cleanup_old_tasks()
@@ -87,9 +98,9 @@ def allowed_file(filename, content_type):
     ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
     return ext in ALLOWED_EXTENSIONS and content_type in SUPPORTED_FILE_TYPES
 
-def ingest_document_thread(file_path, task_id):
+def ingest_document_thread(file_path, task_id, source=None):
     try:
-        rag_app.ingest_document(file_path)
+        get_rag_app().ingest_document(file_path, source=source)
         task_tracker.update_task(task_id, status="Completed")
         logger.debug(f"File ingested successfully: {file_path}")
     except Exception as e:
@@ -122,7 +133,7 @@ def ingest_document():
                 logger.debug(f"Temporary file created: {temp_file.name}")
                 
                 task_tracker.create_task(task_id, file.filename)
-                thread = threading.Thread(target=ingest_document_thread, args=(temp_file.name, task_id))
+                thread = threading.Thread(target=ingest_document_thread, args=(temp_file.name, task_id, file.filename))
                 thread.start()
                 
             logger.debug(f"Ingestion task started for file: {file.filename}")
@@ -160,7 +171,7 @@ def process_query():
         query = data['query']
         model = data.get('model')  # Optional model parameter
 
-        response = rag_app.query_component.process_query(query, model=model)
+        response = get_rag_app().query_component.process_query(query, model=model)
 
         logger.debug(f"Query processed successfully: {response}")
         return jsonify({
@@ -172,10 +183,31 @@ def process_query():
         logger.error(f"Error processing query: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
     
+@app.route('/api/query/stream', methods=['POST'])
+def stream_query():
+    """Streams a query as Server-Sent Events: the retrieved chunks first, then each generated token."""
+    data = request.get_json(silent=True)
+    if not data or 'query' not in data:
+        logger.warning("No query provided in stream request")
+        return jsonify({"error": "No query provided"}), 400
+
+    query = data['query']
+    model = data.get('model')  # Optional model parameter
+
+    def events():
+        for event in get_rag_app().query_component.stream_query(query, model=model):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.route('/stats', methods=['GET'])
 def get_stats():
     try:
-        stats = rag_app.get_stats()
+        stats = get_rag_app().get_stats()
         stats.update({
             "recent_success": task_tracker.last_success is not None and 
                             (datetime.now() - task_tracker.last_success) < timedelta(minutes=5),
@@ -191,7 +223,7 @@ def get_stats():
 def health_check():
     logger.info("Health check endpoint called")
     try:
-        chroma_health = rag_app.ingest_component.check_chroma_health()
+        chroma_health = get_rag_app().ingest_component.check_chroma_health()
         recent_success = (task_tracker.last_success is not None and 
                         (datetime.now() - task_tracker.last_success) < timedelta(minutes=5))
         
@@ -218,7 +250,7 @@ def query_endpoint():
 
         query = data['query']
         model = data.get('model')  # Optional model parameter
-        response = rag_app.query_component.process_query(query, model=model)
+        response = get_rag_app().query_component.process_query(query, model=model)
 
         if response.get("error"):
             return jsonify({"error": response['error']}), 500
@@ -27,6 +27,7 @@ from frontend.components.system_logs import render_system_logs
 from frontend.components.file_upload import render_file_upload
 from frontend.components.results_display import render_results
 from frontend.config import API_BASE_URL
+from frontend.streaming import iter_sse_events
 from frontend.translations import get_text
 from frontend.language_utils import render_language_selector, get_user_language
 
@@ -102,25 +103,45 @@ elif choice_key == "query":
 
     query = st.text_input(get_text("enter_query", current_lang))
     if st.button(get_text("process_query", current_lang)):
-        with st.spinner(get_text("processing_query", current_lang)):
-            try:
+        live = st.empty()
+        try:
+            with st.spinner(get_text("processing_query", current_lang)):
                 response = requests.post(
-                    f"{API_BASE_URL}/api/query",
+                    f"{API_BASE_URL}/api/query/stream",
                     json={"query": query, "model": selected_model},
-                    headers={"Content-Type": "application/json"}
+                    headers={"Content-Type": "application/json", "Accept": "text/event-stream"},
+                    stream=True
                 )
-                logger.debug(f"API Response status: {response.status_code}")
-                logger.debug(f"API Response content: {response.text[:200]}...")
-
-                if response.status_code == 200:
-                    result = response.json()
-                    render_results("query", result, current_lang)
-                else:
-                    error_msg = response.json().get('error', 'Unknown error occurred') if response.content else 'Empty response'
-                    st.error(get_text("error_processing_query", current_lang).format(error_msg))
-            except requests.RequestException as e:
-                logger.error(f"Network error while processing query: {e}", exc_info=True)
-                st.error(get_text("network_error", current_lang).format(str(e)))
+            logger.debug(f"API Response status: {response.status_code}")
+
+            if response.status_code == 200:
+                result, answer = {}, ""
+                with live.container():
+                    status = st.empty()
+                    status.info(get_text("processing_query", current_lang))
+                    st.subheader(get_text("query_response", current_lang))
+                    answer_area = st.empty()
+                for event, data in iter_sse_events(response):
+                    if event == "chunks":
+                        result = data
+                        status.info(get_text("generating_response", current_lang).format(len(data["relevant_chunks"])))
+                    elif event == "token":
+                        answer += data["token"]
+                        answer_area.markdown(answer + "▌")
+                    elif event == "error":
+                        live.empty()
+                        st.error(get_text("error_processing_query", current_lang).format(data["error"]))
+                        break
+                    elif event == "done":
+                        live.empty()
+                        render_results("query", {"response": {**result, "response": answer, "timings": data["timings"]},
+                                                 "status": "success"}, current_lang)
+            else:
+                error_msg = response.json().get('error', 'Unknown error occurred') if response.content else 'Empty response'
+                st.error(get_text("error_processing_query", current_lang).format(error_msg))
+        except requests.RequestException as e:
+            logger.error(f"Network error while processing query: {e}", exc_info=True)
+            st.error(get_text("network_error", current_lang).format(str(e)))
 
 elif choice_key == "semantic_search":
     st.header(get_text("semantic_search", current_lang))
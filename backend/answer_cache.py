@@ -0,0 +1,145 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from config import (
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_TTL
+)
+from backend.retrieval_cache import IndexGeneration
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers, matched by query embedding.
+
+    Each entry keeps the answer, the normalized embedding of the query it answered, and the IDs and scores of
+    the context chunks it was generated from. A lookup scores the query against every cached embedding with
+    one matrix-vector product and accepts the best entry for the same model and language whose cosine
+    similarity reaches the threshold. Entries are only served for the index generation they were generated
+    in, since newly ingested documents may now outrank their context; the least recently used entry is
+    replaced when the cache is full.
+    """
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, max_entries: int = ANSWER_CACHE_SIZE,
+                 ttl: float = ANSWER_CACHE_TTL, generation: Optional[IndexGeneration] = None):
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.generation = generation if generation is not None else IndexGeneration()
+        self.lock = threading.Lock()
+        self.embeddings: Optional[np.ndarray] = None
+        self.entries: List[Optional[Dict[str, Any]]] = [None] * self.max_entries
+        self.last_used = np.zeros(self.max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        logger.info(f"Initialized AnswerCache (threshold: {self.threshold}, size: {self.max_entries})")
+
+    def lookup(self, embedding: np.ndarray, model: str, language: str,
+               fetch_chunks: Callable[[List[str]], List[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer to a query with a similar embedding.
+
+        Args:
+            embedding (np.ndarray): Embedding of the incoming query.
+            model (str): LLM the answer must come from.
+            language (str): Detected query language the answer must be in.
+            fetch_chunks (Callable): Fetches chunks by ID, e.g. RetrievalComponent.retrieve_by_id.
+
+        Returns:
+            Optional[Dict[str, Any]]: The cached "response", "query" and "relevant_chunks" (fetched again,
+            with their original scores), or None on a miss or when any context chunk is gone.
+        """
+        query = self._normalize(embedding)
+        generation = self.generation.current()
+        with self.lock:
+            slot = self._best_slot(query, model, language, generation)
+            if slot is None:
+                self.misses += 1
+                return None
+            entry = self.entries[slot]
+            self.last_used[slot] = time.monotonic()
+
+        chunks = {chunk["chunk_id"]: chunk for chunk in fetch_chunks(entry["chunk_ids"])}
+        if len(chunks) < len(entry["chunk_ids"]):
+            with self.lock:
+                if self.entries[slot] is entry:
+                    self.entries[slot] = None
+                self.invalidations += 1
+                self.misses += 1
+            logger.debug(f"Cached answer for '{entry['query'][:50]}' dropped: its context is gone")
+            return None
+
+        with self.lock:
+            self.hits += 1
+        relevant_chunks = [{**chunks[chunk_id], "similarity_score": score}
+                           for chunk_id, score in zip(entry["chunk_ids"], entry["scores"])]
+        return {"query": entry["query"], "response": entry["response"], "relevant_chunks": relevant_chunks}
+
+    def store(self, embedding: np.ndarray, model: str, language: str, query: str, response: str,
+              relevant_chunks: List[Dict[str, Any]], generation: Optional[int] = None):
+        """Cache an answer under the index generation its context was retrieved in (the current one by default)."""
+        query_embedding = self._normalize(embedding)
+        if generation is None:
+            generation = self.generation.current()
+        with self.lock:
+            if self.embeddings is None:
+                self.embeddings = np.zeros((self.max_entries, len(query_embedding)), dtype=np.float32)
+            empty = [slot for slot, entry in enumerate(self.entries) if entry is None]
+            slot = empty[0] if empty else int(np.argmin(self.last_used))
+            self.embeddings[slot] = query_embedding
+            self.entries[slot] = {
+                "model": model,
+                "language": language,
+                "query": query,
+                "response": response,
+                "chunk_ids": [chunk["chunk_id"] for chunk in relevant_chunks],
+                "scores": [chunk["similarity_score"] for chunk in relevant_chunks],
+                "generation": generation,
+                "expires": time.monotonic() + self.ttl,
+            }
+            self.last_used[slot] = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "answer_cache_entries": sum(entry is not None for entry in self.entries),
+                "answer_cache_hits": self.hits,
+                "answer_cache_misses": self.misses,
+                "answer_cache_invalidations": self.invalidations,
+                "answer_cache_hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _best_slot(self, query: np.ndarray, model: str, language: str, generation: int) -> Optional[int]:
+        if self.embeddings is None or len(query) != self.embeddings.shape[1]:
+            return None
+        now = time.monotonic()
+        similarities = self.embeddings @ query
+        for slot in np.argsort(-similarities):
+            if similarities[slot] < self.threshold:
+                return None
+            entry = self.entries[slot]
+            if entry is None:
+                continue
+            if entry["expires"] <= now:
+                self.entries[slot] = None
+                continue
+            if entry["generation"] != generation:
+                self.entries[slot] = None
+                self.invalidations += 1
+                continue
+            if entry["model"] == model and entry["language"] == language:
+                return int(slot)
+        return None
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
@@ -0,0 +1,370 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+import numpy as np
+
+from config import (
+    CHUNKING_STRATEGY,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    CHUNK_TOKEN_BUDGET,
+    CHUNK_TOKEN_OVERLAP,
+    CDC_MIN_SIZE,
+    CDC_AVG_SIZE,
+    EMBEDDING_CONTEXT_TOKENS
+)
+from backend.utils import chunk_text, iter_chunks
+
+# Lookup tables indexed by code point; anything at or above TABLE_SIZE - 1 maps to the last, always-false entry
+TABLE_SIZE = 0x3002
+
+
+def _table(code_points: Iterable[int]) -> np.ndarray:
+    table = np.zeros(TABLE_SIZE, dtype=bool)
+    table[list(code_points)] = True
+    return table
+
+
+# Code points for which str.isspace is true
+WHITESPACE = _table([9, 10, 11, 12, 13, 28, 29, 30, 31, 32, 0x85, 0xA0, 0x1680, *range(0x2000, 0x200B), 0x2028, 0x2029, 0x202F, 0x205F, 0x3000])
+SENTENCE_ENDS = _table(map(ord, ".!?"))
+CLOSERS = _table(map(ord, "\"')]"))
+# Characters per estimated token within a word, close to what subword tokenizers produce on English text
+CHARS_PER_TOKEN = 4
+
+# Random 64-bit value per character (low 16 bits of the code point) for the gear rolling hash
+GEAR = np.random.default_rng(0x5C417).integers(0, 2**64, size=2**16, dtype=np.uint64)
+# Characters covered by the gear hash; one bit of shift per character, so 64 for a 64-bit hash
+GEAR_WINDOW = 64
+# Average gap between word boundaries in prose, used to turn an average chunk size into a cut probability
+MEAN_WORD_GAP = 6
+
+# Text kept after the last chunk of a partial buffer, so a boundary is never decided on a cut-off whitespace run
+LOOKAHEAD = 256
+# Chunks' worth of text buffered before a streaming split
+WINDOW_CHUNKS = 64
+
+STRUCTURED_FILE_TYPES = ('text/html', 'text/markdown')
+
+STRATEGIES: Dict[str, Type["ChunkingStrategy"]] = {}
+
+
+def register_strategy(cls: Type["ChunkingStrategy"]) -> Type["ChunkingStrategy"]:
+    STRATEGIES[cls.name] = cls
+    return cls
+
+
+class BoundaryIndex:
+    """
+    Every candidate chunk boundary of a text, found in one vectorized pass over its code points.
+
+    A boundary is the offset of a word that follows whitespace, classified by that whitespace:
+    heading (a line starting with '#'), paragraph (two or more line breaks), line, sentence
+    (after '.', '!' or '?', optionally followed by a closing quote or bracket) and word.
+    """
+
+    def __init__(self, text: str):
+        self.length = len(text)
+        # One byte per character for ASCII text, which is most of it
+        if text.isascii():
+            codes = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+            # ASCII whitespace is 9-13 and 28-32; uint8 subtraction wraps around below the range
+            self.space = ((codes - np.uint8(9)) <= 4) | ((codes - np.uint8(28)) <= 4)
+        else:
+            codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+            self.space = WHITESPACE[np.minimum(codes, TABLE_SIZE - 1)]
+        self.codes = codes
+
+        # Whitespace runs: the last character before each run and the first word after it
+        words = np.flatnonzero(self.space[:-1] & ~self.space[1:]) + 1
+        before = np.flatnonzero(~self.space[:-1] & self.space[1:])
+        if len(self.space) and self.space[0]:
+            words = words[1:]
+        before = before[:len(words)]
+
+        # Line breaks per run; most runs are a single character, so only longer ones need counting
+        breaks = (codes[before + 1] == 10).astype(np.int64)
+        longer = np.flatnonzero(words - before > 2)
+        newlines = np.flatnonzero(codes == 10)
+        breaks[longer] = newlines.searchsorted(words[longer]) - newlines.searchsorted(before[longer])
+        previous = np.minimum(codes[before], TABLE_SIZE - 1, dtype=np.uint32)
+        preceding = np.minimum(codes[np.maximum(before - 1, 0)], TABLE_SIZE - 1, dtype=np.uint32)
+        sentence = SENTENCE_ENDS[previous] | (CLOSERS[previous] & SENTENCE_ENDS[preceding])
+
+        self.positions = {
+            "heading": words[(breaks >= 1) & (codes[words] == ord("#"))],
+            "paragraph": words[breaks >= 2],
+            "line": words[breaks >= 1],
+            "sentence": words[sentence],
+            "word": words,
+        }
+        self._tokens: Optional[np.ndarray] = None
+        self._word_hashes: Optional[np.ndarray] = None
+        # Derived arrays that strategies compute once per text
+        self.cache: Dict[Any, np.ndarray] = {}
+
+    @property
+    def tokens(self) -> np.ndarray:
+        """Start offsets of estimated tokens: every CHARS_PER_TOKEN characters within each word."""
+        if self._tokens is None:
+            text_edge = np.ones(1, dtype=bool)
+            starts = np.flatnonzero(~self.space & np.concatenate((text_edge, self.space[:-1])))
+            ends = np.flatnonzero(~self.space & np.concatenate((self.space[1:], text_edge))) + 1
+            counts = -(-(ends - starts) // CHARS_PER_TOKEN)
+            within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            self._tokens = np.repeat(starts, counts) + within * CHARS_PER_TOKEN
+        return self._tokens
+
+    @property
+    def word_hashes(self) -> np.ndarray:
+        """
+        Gear hash of the GEAR_WINDOW characters before each word boundary.
+
+        The hash at offset i is sum(GEAR[c[i - k]] << k for k < GEAR_WINDOW) modulo 2**64, the value a byte-by-byte
+        gear hash reaches there. It is built by doubling the window six times instead of rolling one character at a time.
+        """
+        if self._word_hashes is None:
+            hashes = GEAR[self.codes if self.codes.dtype == np.uint8 else self.codes & 0xFFFF]
+            width = 1
+            while width < GEAR_WINDOW:
+                shifted = np.zeros_like(hashes)
+                shifted[width:] = hashes[:-width] << np.uint64(width)
+                hashes += shifted
+                width *= 2
+            self._word_hashes = hashes[self.positions["word"] - 1]
+        return self._word_hashes
+
+
+def count_tokens(text: str) -> int:
+    """Estimated number of embedding model tokens in a text."""
+    return len(BoundaryIndex(text).tokens)
+
+
+class ChunkingStrategy:
+    """
+    Packs text into chunks of at most chunk_size characters that end on the strongest available boundary.
+
+    All boundary offsets are computed once per text, strongest kind first; each chunk end is then a binary search
+    for the last boundary of each kind within the size limit. A boundary is only used if the chunk stays at
+    least half full, otherwise a weaker kind is tried, and as a last resort the chunk is cut at the limit.
+    """
+
+    name = ""
+    boundaries: Tuple[str, ...] = ()
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    @property
+    def window(self) -> int:
+        return WINDOW_CHUNKS * self.chunk_size
+
+    def split(self, text: str, final: bool = True) -> Tuple[List[str], int]:
+        """
+        Chunk a text.
+
+        Args:
+            text (str): Text to chunk.
+            final (bool): Whether the text runs to the end of the document. If not, chunks that could still
+                change with the text that follows are left for the next call.
+
+        Returns:
+            Tuple of the chunks and the offset at which the next call should resume.
+        """
+        index = BoundaryIndex(text)
+        length = len(text)
+        chunks = []
+        start = 0
+        while start < length:
+            limit = self._limit(index, start, length)
+            if not final and limit + LOOKAHEAD > length:
+                break
+            cut = self._last_cut(index, start, length) if limit >= length else self._cut(index, start, limit)
+            chunk = text[start:cut].strip()
+            if chunk:
+                chunks.append(chunk)
+            if cut >= length:
+                return chunks, length
+            start = self._next_start(index, start, cut)
+        return chunks, start
+
+    def iter_chunks(self, blocks: Iterable[str]) -> Iterator[str]:
+        """Chunk a stream of text blocks, splitting about `window` characters at a time."""
+        parts: List[str] = []
+        buffered = 0
+        for block in blocks:
+            parts.append(block)
+            buffered += len(block)
+            if buffered >= self.window:
+                buffer = "".join(parts)
+                chunks, consumed = self.split(buffer, final=False)
+                yield from chunks
+                parts = [buffer[consumed:]]
+                buffered = len(parts[0])
+        chunks, _ = self.split("".join(parts), final=True)
+        yield from chunks
+
+    def _limit(self, index: BoundaryIndex, start: int, length: int) -> int:
+        return start + self.chunk_size
+
+    def _last_cut(self, index: BoundaryIndex, start: int, length: int) -> int:
+        return length
+
+    def _cut(self, index: BoundaryIndex, start: int, limit: int) -> int:
+        floor = start + (limit - start) // 2
+        for kind in self.boundaries:
+            positions = index.positions[kind]
+            i = positions.searchsorted(limit, side="right") - 1
+            if i >= 0 and positions[i] > floor:
+                return int(positions[i])
+        return limit
+
+    def _next_start(self, index: BoundaryIndex, start: int, cut: int) -> int:
+        return self._snap_to_word(index, cut - self.chunk_overlap, start, cut)
+
+    def _snap_to_word(self, index: BoundaryIndex, target: int, start: int, cut: int) -> int:
+        # Start the overlap on a whole word when one begins before the cut
+        if target >= cut:
+            return cut
+        words = index.positions["word"]
+        i = words.searchsorted(target, side="left")
+        if i < len(words) and words[i] < cut:
+            target = int(words[i])
+        return max(target, start + 1)
+
+
+@register_strategy
+class FixedStrategy(ChunkingStrategy):
+    """Fixed character windows, identical to chunk_text."""
+
+    name = "fixed"
+
+    def split(self, text: str, final: bool = True) -> Tuple[List[str], int]:
+        if final:
+            return chunk_text(text, self.chunk_size, self.chunk_overlap), len(text)
+        step = self.chunk_size - self.chunk_overlap
+        chunks = []
+        start = 0
+        while start + self.chunk_size <= len(text):
+            chunks.append(text[start:start + self.chunk_size])
+            start += step
+        return chunks, start
+
+    def iter_chunks(self, blocks: Iterable[str]) -> Iterator[str]:
+        return iter_chunks(blocks, self.chunk_size, self.chunk_overlap)
+
+
+@register_strategy
+class SentenceStrategy(ChunkingStrategy):
+    """Whole sentences packed up to the size limit, preferring paragraph ends."""
+
+    name = "sentence"
+    boundaries = ("paragraph", "sentence", "word")
+
+
+@register_strategy
+class StructureStrategy(ChunkingStrategy):
+    """
+    Section-aware packing for Markdown and HTML.
+
+    Prefers Markdown headings, then blank lines, then line breaks, which is where block elements
+    (headings, paragraphs, list items) end once HTML and Markdown are converted to text.
+    """
+
+    name = "structure"
+    boundaries = ("heading", "paragraph", "line", "sentence", "word")
+
+
+@register_strategy
+class TokenStrategy(ChunkingStrategy):
+    """Sentence packing with chunk_size and chunk_overlap counted in estimated tokens instead of characters."""
+
+    name = "token"
+    boundaries = ("paragraph", "sentence", "word")
+
+    def __init__(self, chunk_size: int = CHUNK_TOKEN_BUDGET, chunk_overlap: int = CHUNK_TOKEN_OVERLAP):
+        # Never exceed what the embedding model can read
+        super().__init__(min(chunk_size, EMBEDDING_CONTEXT_TOKENS), chunk_overlap)
+
+    @property
+    def window(self) -> int:
+        return WINDOW_CHUNKS * self.chunk_size * CHARS_PER_TOKEN
+
+    def _limit(self, index: BoundaryIndex, start: int, length: int) -> int:
+        tokens = index.tokens
+        end = tokens.searchsorted(start, side="left") + self.chunk_size
+        return int(tokens[end]) if end < len(tokens) else length
+
+    def _next_start(self, index: BoundaryIndex, start: int, cut: int) -> int:
+        if self.chunk_overlap == 0:
+            return cut
+        tokens = index.tokens
+        first = max(tokens.searchsorted(cut, side="left") - self.chunk_overlap, 0)
+        return self._snap_to_word(index, int(tokens[first]) if first < len(tokens) else cut, start, cut)
+
+
+@register_strategy
+class ContentDefinedStrategy(ChunkingStrategy):
+    """
+    Content-defined chunking: chunks end where a rolling hash of the preceding text hits a target pattern.
+
+    Cut points are word boundaries whose gear hash falls below a threshold chosen so that chunks average
+    avg_size characters. Because a cut depends only on nearby text, an edit moves at most the boundaries
+    around it and every other chunk comes out byte-identical, so re-ingesting a revised document reuses
+    their embeddings. No cut is taken before min_size; when none occurs before max_size the boundary
+    with the smallest hash in range is used, which is still content-defined. Chunks do not overlap.
+    """
+
+    name = "cdc"
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = 0, min_size: int = CDC_MIN_SIZE, avg_size: int = CDC_AVG_SIZE):
+        super().__init__(chunk_size, 0)
+        if not 0 < min_size < avg_size < chunk_size:
+            raise ValueError(f"Chunk sizes must satisfy 0 < min_size ({min_size}) < avg_size ({avg_size}) < max_size ({chunk_size})")
+        self.min_size = min_size
+        # Cut probability per word boundary, so the expected distance past min_size is avg_size - min_size
+        self.threshold = np.uint64(min(2**64 - 1, 2**64 * MEAN_WORD_GAP // (avg_size - min_size)))
+
+    def _cut_points(self, index: BoundaryIndex) -> np.ndarray:
+        key = ("cut_points", int(self.threshold))
+        if key not in index.cache:
+            index.cache[key] = index.positions["word"][index.word_hashes < self.threshold]
+        return index.cache[key]
+
+    def _last_cut(self, index: BoundaryIndex, start: int, length: int) -> int:
+        # Keep cutting at cut points to the very end, so the tail of a document resynchronizes too
+        cut_points = self._cut_points(index)
+        i = cut_points.searchsorted(start + self.min_size, side="left")
+        return int(cut_points[i]) if i < len(cut_points) else length
+
+    def _cut(self, index: BoundaryIndex, start: int, limit: int) -> int:
+        cut_points = self._cut_points(index)
+        i = cut_points.searchsorted(start + self.min_size, side="left")
+        if i < len(cut_points) and cut_points[i] <= limit:
+            return int(cut_points[i])
+        words = index.positions["word"]
+        first, last = words.searchsorted(start + self.min_size, side="left"), words.searchsorted(limit, side="right")
+        if last > first:
+            return int(words[first + np.argmin(index.word_hashes[first:last])])
+        return limit
+
+
+def get_chunker(file_type: Optional[str] = None, strategy: str = CHUNKING_STRATEGY, **kwargs) -> ChunkingStrategy:
+    """
+    Build the chunking strategy for a document.
+
+    Args:
+        file_type (Optional[str]): MIME type of the document, used when the strategy is "auto".
+        strategy (str): Name of a registered strategy, or "auto".
+        **kwargs: chunk_size and chunk_overlap overrides.
+
+    Returns:
+        ChunkingStrategy: The configured strategy.
+    """
+    if strategy == "auto":
+        strategy = "structure" if file_type in STRUCTURED_FILE_TYPES else "sentence"
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown chunking strategy: {strategy}")
+    return STRATEGIES[strategy](**kwargs)
@@ -0,0 +1,240 @@
+import hashlib
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from config import (
+    DEDUP_INDEX_PATH,
+    DEDUP_THRESHOLD,
+    DEDUP_NUM_PERM,
+    DEDUP_BANDS,
+    DEDUP_SHINGLE_SIZE
+)
+from backend.utils import clean_text
+
+# Smallest prime above 2**32, the modulus of the MinHash permutations
+PRIME = 4294967311
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, using num_perm random linear permutations of 32-bit shingle hashes."""
+
+    def __init__(self, num_perm: int = DEDUP_NUM_PERM, shingle_size: int = DEDUP_SHINGLE_SIZE, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.shingle_size = shingle_size
+        # a, b and the hashes are below 2**32, so a * hash + b never overflows uint64
+        self.a = rng.integers(1, 2**32, size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, 2**32, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, normalized: str) -> np.ndarray:
+        words = normalized.split(" ")
+        shingles = {" ".join(words[i:i + self.shingle_size]) for i in range(max(1, len(words) - self.shingle_size + 1))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+        return ((self.a * hashes + self.b) % np.uint64(PRIME)).min(axis=1).astype(np.uint32)
+
+
+class ChunkDeduplicator:
+    """
+    Corpus-wide index of canonical chunks, used to store exact and near-duplicate chunks as references.
+
+    Chunks are compared after clean_text normalization: first by sha256 (exact duplicates), then through
+    MinHash/LSH buckets whose candidates are kept when their estimated Jaccard similarity reaches the threshold.
+    A canonical chunk is only matched by other documents once its own document is committed, and its vector
+    is deleted only when neither its document nor any reference still uses it.
+    """
+
+    def __init__(self, path: Path = DEDUP_INDEX_PATH, threshold: float = DEDUP_THRESHOLD,
+                 num_perm: int = DEDUP_NUM_PERM, bands: int = DEDUP_BANDS):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.path = Path(path)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS canonical_chunks (
+                chunk_id TEXT PRIMARY KEY,
+                document_id TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                refcount INTEGER NOT NULL DEFAULT 0,
+                orphaned INTEGER NOT NULL DEFAULT 0,
+                committed INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_canonical_text_hash ON canonical_chunks (text_hash);
+            CREATE INDEX IF NOT EXISTS idx_canonical_document ON canonical_chunks (document_id, committed);
+            CREATE TABLE IF NOT EXISTS lsh_buckets (
+                bucket TEXT NOT NULL,
+                chunk_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_lsh_bucket ON lsh_buckets (bucket);
+            CREATE INDEX IF NOT EXISTS idx_lsh_chunk ON lsh_buckets (chunk_id);
+            CREATE TABLE IF NOT EXISTS chunk_references (
+                chunk_id TEXT PRIMARY KEY,
+                canonical_id TEXT NOT NULL,
+                document_id TEXT NOT NULL,
+                committed INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_references_document ON chunk_references (document_id, committed);
+            """
+        )
+        self.connection.commit()
+        logger.info(f"Initialized ChunkDeduplicator at {self.path} (threshold: {self.threshold})")
+
+    def assign(self, document_id: str, chunk_ids: Sequence[str], chunks: Sequence[str]) -> List[Optional[str]]:
+        """
+        Match new chunks of a document against the index.
+
+        Returns:
+            List[Optional[str]]: For each chunk, the canonical chunk it duplicates (it is recorded as a reference and
+            must not be stored), or None when it is new (it is recorded as a pending canonical chunk and must be stored).
+        """
+        results = []
+        with self.lock:
+            for chunk_id, chunk in zip(chunk_ids, chunks):
+                normalized = clean_text(chunk)
+                text_hash = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+                canonical_id = self._find_exact(document_id, text_hash)
+                signature = None
+                if canonical_id is None:
+                    signature = self.hasher.signature(normalized)
+                    canonical_id = self._find_similar(document_id, signature)
+
+                if canonical_id is not None:
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO chunk_references (chunk_id, canonical_id, document_id) VALUES (?, ?, ?)",
+                        (chunk_id, canonical_id, document_id)
+                    )
+                    self.connection.execute("UPDATE canonical_chunks SET refcount = refcount + 1 WHERE chunk_id = ?", (canonical_id,))
+                else:
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO canonical_chunks (chunk_id, document_id, text_hash, signature) VALUES (?, ?, ?, ?)",
+                        (chunk_id, document_id, text_hash, signature.tobytes())
+                    )
+                    self.connection.executemany(
+                        "INSERT INTO lsh_buckets (bucket, chunk_id) VALUES (?, ?)",
+                        [(bucket, chunk_id) for bucket in self._buckets(signature)]
+                    )
+                results.append(canonical_id)
+            self.connection.commit()
+
+        duplicates = sum(1 for canonical_id in results if canonical_id is not None)
+        if duplicates:
+            logger.debug(f"{duplicates} of {len(results)} chunks of document {document_id} are duplicates")
+        return results
+
+    def commit(self, document_id: str):
+        """Make a document's pending canonical chunks and references permanent and visible to other documents."""
+        with self.lock:
+            self.connection.execute("UPDATE canonical_chunks SET committed = 1 WHERE document_id = ? AND committed = 0", (document_id,))
+            self.connection.execute("UPDATE chunk_references SET committed = 1 WHERE document_id = ? AND committed = 0", (document_id,))
+            self.connection.commit()
+
+    def discard(self, document_id: str) -> List[str]:
+        """
+        Drop a document's pending canonical chunks and references after a failed ingestion.
+
+        Returns:
+            List[str]: Previously orphaned canonical chunks that lost their last reference and can now be deleted.
+        """
+        with self.lock:
+            canonical_ids = [row[0] for row in self.connection.execute(
+                "SELECT canonical_id FROM chunk_references WHERE document_id = ? AND committed = 0", (document_id,)
+            )]
+            self.connection.execute("DELETE FROM chunk_references WHERE document_id = ? AND committed = 0", (document_id,))
+            deletable = self._dereference(canonical_ids)
+            pending = [row[0] for row in self.connection.execute(
+                "SELECT chunk_id FROM canonical_chunks WHERE document_id = ? AND committed = 0", (document_id,)
+            )]
+            self._remove_canonical(pending)
+            self.connection.commit()
+        return deletable
+
+    def release(self, chunk_ids: Sequence[str]) -> List[str]:
+        """
+        Release chunks that a document no longer contains.
+
+        Returns:
+            List[str]: The chunks whose vectors can be deleted, i.e. excluding canonical chunks still referenced elsewhere.
+        """
+        deletable = []
+        with self.lock:
+            for chunk_id in chunk_ids:
+                row = self.connection.execute("SELECT canonical_id FROM chunk_references WHERE chunk_id = ?", (chunk_id,)).fetchone()
+                if row is not None:
+                    # References have no vector of their own
+                    self.connection.execute("DELETE FROM chunk_references WHERE chunk_id = ?", (chunk_id,))
+                    deletable.extend(self._dereference([row[0]]))
+                    continue
+                row = self.connection.execute("SELECT refcount FROM canonical_chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+                if row is not None and row[0] > 0:
+                    self.connection.execute("UPDATE canonical_chunks SET orphaned = 1 WHERE chunk_id = ?", (chunk_id,))
+                    continue
+                self._remove_canonical([chunk_id])
+                deletable.append(chunk_id)
+            self.connection.commit()
+        return deletable
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            canonical = self.connection.execute("SELECT COUNT(*) FROM canonical_chunks").fetchone()[0]
+            references = self.connection.execute("SELECT COUNT(*) FROM chunk_references").fetchone()[0]
+        total = canonical + references
+        return {
+            "dedup_canonical_chunks": canonical,
+            "dedup_references": references,
+            "dedup_ratio": round(references / total, 4) if total else 0.0,
+        }
+
+    def _find_exact(self, document_id: str, text_hash: str) -> Optional[str]:
+        row = self.connection.execute(
+            "SELECT chunk_id FROM canonical_chunks WHERE text_hash = ? AND (committed = 1 OR document_id = ?) LIMIT 1",
+            (text_hash, document_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _find_similar(self, document_id: str, signature: np.ndarray) -> Optional[str]:
+        buckets = self._buckets(signature)
+        rows = self.connection.execute(
+            f"SELECT DISTINCT c.chunk_id, c.signature FROM lsh_buckets l JOIN canonical_chunks c ON c.chunk_id = l.chunk_id "
+            f"WHERE l.bucket IN ({','.join('?' * len(buckets))}) AND (c.committed = 1 OR c.document_id = ?)",
+            (*buckets, document_id)
+        ).fetchall()
+        best_id, best_similarity = None, self.threshold
+        for chunk_id, blob in rows:
+            similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == signature))
+            if similarity >= best_similarity:
+                best_id, best_similarity = chunk_id, similarity
+        return best_id
+
+    def _buckets(self, signature: np.ndarray) -> List[str]:
+        return [
+            f"{band}:{hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8).hexdigest()}"
+            for band in range(self.bands)
+        ]
+
+    def _dereference(self, canonical_ids: List[str]) -> List[str]:
+        """Decrement reference counts; returns orphaned canonical chunks left without references, after removing them."""
+        deletable = []
+        for canonical_id in canonical_ids:
+            self.connection.execute("UPDATE canonical_chunks SET refcount = refcount - 1 WHERE chunk_id = ?", (canonical_id,))
+            row = self.connection.execute("SELECT refcount, orphaned FROM canonical_chunks WHERE chunk_id = ?", (canonical_id,)).fetchone()
+            if row is not None and row[0] <= 0 and row[1]:
+                self._remove_canonical([canonical_id])
+                deletable.append(canonical_id)
+        return deletable
+
+    def _remove_canonical(self, chunk_ids: List[str]):
+        self.connection.executemany("DELETE FROM lsh_buckets WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+        self.connection.executemany("DELETE FROM canonical_chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
@@ -0,0 +1,76 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from config import DOCUMENT_REGISTRY_PATH
+
+
+class DocumentRegistry:
+    """
+    Persistent map from each ingested document (by source) to its content hash and chunk IDs.
+
+    Lookups are primary-key reads, so deciding whether a document changed is O(1).
+    """
+
+    def __init__(self, path: Path = DOCUMENT_REGISTRY_PATH):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                source TEXT PRIMARY KEY,
+                document_id TEXT NOT NULL,
+                file_hash TEXT NOT NULL,
+                language TEXT,
+                chunk_ids TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self.connection.commit()
+        logger.info(f"Initialized DocumentRegistry at {self.path}")
+
+    def get(self, source: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT document_id, file_hash, language, chunk_ids, updated_at FROM documents WHERE source = ?",
+                (source,)
+            ).fetchone()
+        if row is None:
+            return None
+        chunk_ids = json.loads(row[3])
+        return {
+            "source": source,
+            "document_id": row[0],
+            "file_hash": row[1],
+            "language": row[2],
+            "chunk_ids": chunk_ids,
+            "chunks_count": len(chunk_ids),
+            "updated_at": row[4],
+        }
+
+    def register(self, source: str, document_id: str, file_hash: str, language: str, chunk_ids: List[str]):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO documents (source, document_id, file_hash, language, chunk_ids, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (source, document_id, file_hash, language, json.dumps(chunk_ids), time.time())
+            )
+            self.connection.commit()
+
+    def remove(self, source: str):
+        with self.lock:
+            self.connection.execute("DELETE FROM documents WHERE source = ?", (source,))
+            self.connection.commit()
+
+    def count(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
@@ -0,0 +1,131 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from config import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Disk-backed, content-addressed embedding cache.
+
+    Vectors are stored as float32 blobs in SQLite, keyed by (model, dimension, sha256 of the text).
+    When the number of entries exceeds ``max_entries`` the least recently used ones are evicted.
+    """
+
+    def __init__(self, path: Path = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimension INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, dimension, text_hash)
+            )
+            """
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)")
+        self.connection.commit()
+        self.entries = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.info(f"Initialized EmbeddingCache at {self.path} with {self.entries} entries (max: {self.max_entries})")
+
+    def get_many(self, model: str, dimension: int, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Return the cached vector for each text, or None where the text is not cached."""
+        hashes = [text_hash(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        unique_hashes = list(dict.fromkeys(hashes))
+
+        with self.lock:
+            # Stay well below SQLite's host parameter limit
+            for i in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.connection.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND dimension = ? AND text_hash IN ({placeholders})",
+                    (model, dimension, *batch)
+                ).fetchall()
+                for row_hash, blob in rows:
+                    found[row_hash] = np.frombuffer(blob, dtype=np.float32)
+
+            if found:
+                now = time.time()
+                self.connection.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND dimension = ? AND text_hash = ?",
+                    [(now, model, dimension, h) for h in found]
+                )
+                self.connection.commit()
+
+            results = [found.get(h) for h in hashes]
+            hits = sum(1 for r in results if r is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+
+        logger.debug(f"Embedding cache lookup: {hits} hits, {len(results) - hits} misses")
+        return results
+
+    def put_many(self, model: str, dimension: int, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        if not texts:
+            return
+        now = time.time()
+        rows = [
+            (model, dimension, text_hash(text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, dimension, text_hash, vector, last_access) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self.connection.commit()
+            self.entries = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if self.entries > self.max_entries:
+                self._evict(self.entries - self.max_entries)
+
+    def _evict(self, count: int):
+        self.connection.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+            (count,)
+        )
+        self.connection.commit()
+        self.entries -= count
+        self.evictions += count
+        logger.info(f"Evicted {count} least recently used embeddings from cache")
+
+    def clear(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM embeddings")
+            self.connection.commit()
+            self.entries = 0
+
+    def get_stats(self) -> Dict[str, float]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "embedding_cache_hits": self.hits,
+                "embedding_cache_misses": self.misses,
+                "embedding_cache_hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "embedding_cache_entries": self.entries,
+                "embedding_cache_evictions": self.evictions,
+            }
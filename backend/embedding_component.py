@@ -1,85 +1,190 @@
 import ollama
-import torch
-from typing import List, Union
-from config import OLLAMA_BASE_URL, EMBEDDING_MODEL, EMBEDDING_DIMENSION, BATCH_SIZE, EMBEDDING_DEVICE
+import numpy as np
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Union
+from config import (
+    OLLAMA_BASE_URL,
+    EMBEDDING_MODEL,
+    EMBEDDING_DIMENSION,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_DEVICE,
+    EMBEDDING_CACHE_ENABLED,
+    MAX_CONCURRENT_REQUESTS,
+    MAX_RETRIES,
+    RETRY_DELAY
+)
 from loguru import logger
+from backend.embedding_cache import EmbeddingCache
 
 class EmbeddingComponent:
-    def __init__(self):
+    def __init__(self, cache: Optional[EmbeddingCache] = None):
         self.client = ollama.Client(host=OLLAMA_BASE_URL)
         self.model = EMBEDDING_MODEL
         self.dimension = EMBEDDING_DIMENSION
-        self.device = torch.device(EMBEDDING_DEVICE if torch.cuda.is_available() else "cpu")
-        logger.info(f"Initialized EmbeddingComponent with model: {self.model}, dimension: {self.dimension} on device: {self.device}")
-
-    def get_embeddings(self, texts: Union[str, List[str]]) -> torch.Tensor:
+        self.device = EMBEDDING_DEVICE
+        self.batch_size = max(1, EMBEDDING_BATCH_SIZE)
+        self.supports_batch = True
+        if cache is None and EMBEDDING_CACHE_ENABLED:
+            cache = EmbeddingCache()
+        self.cache = cache
+        self.max_workers = max(1, MAX_CONCURRENT_REQUESTS)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="embedding")
+        logger.info(f"Initialized EmbeddingComponent with model: {self.model}, dimension: {self.dimension}, batch size: {self.batch_size}, workers: {self.max_workers} on device: {self.device}")
+
+    def get_embeddings(self, texts: Union[str, List[str]]) -> np.ndarray:
         if isinstance(texts, str):
             texts = [texts]
 
+        # Every vector is written once, straight into a contiguous float32 matrix
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        cached = self.cache.get_many(self.model, self.dimension, texts) if self.cache else [None] * len(texts)
+        missing = []
+        for i, embedding in enumerate(cached):
+            if embedding is None:
+                missing.append(i)
+            else:
+                embeddings[i] = embedding
+
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            for i, embedding in zip(missing, self._embed_texts(missing_texts)):
+                embeddings[i] = embedding
+            if self.cache:
+                self.cache.put_many(self.model, self.dimension, missing_texts, embeddings[missing])
+
+        logger.info(f"Created embeddings array of shape {embeddings.shape}")
+        return embeddings
+
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            return self._embed_batch_with_retry(batches[0])
+
+        # Keep up to MAX_CONCURRENT_REQUESTS requests in flight; futures are collected in submission order
+        logger.debug(f"Embedding {len(texts)} texts in {len(batches)} batches with {self.max_workers} workers")
+        futures = [self.executor.submit(self._embed_batch_with_retry, batch) for batch in batches]
         all_embeddings = []
-        for text in texts:
+        for future in futures:
+            all_embeddings.extend(future.result())
+        return all_embeddings
+
+    def _embed_batch_with_retry(self, batch: List[str]) -> List[List[float]]:
+        if self.supports_batch:
             try:
-                logger.debug(f"Sending request to Ollama API for text: {text[:50]}...")
-                logger.debug(f"Using model: {self.model}")
-                logger.debug(f"Ollama base URL: {OLLAMA_BASE_URL}")
-
-                response = self.client.embeddings(model=self.model, prompt=text)
-                logger.debug(f"Raw API response: {response}")
-
-                if isinstance(response, dict):
-                    embedding = response.get("embedding")
-                elif hasattr(response, "embedding"):  
-                    embedding = response.embedding  # Extract the embedding attribute from the object
-                elif isinstance(response, list) and len(response) > 0 and isinstance(response[0], float):
-                    embedding = response  # If response is directly a list of floats, use it
-                else:
-                    logger.error(f"Unexpected response type: {type(response)}")
-                    raise TypeError(f"Expected dict or EmbeddingsResponse object, got {type(response)}")
-
-                # Validate that embedding is a list
-                if not isinstance(embedding, list):
-                    logger.error(f"Invalid embedding format: {embedding}")
-                    raise ValueError("Ollama API did not return a valid embedding list")
-
-                # Handle dimension mismatch
-                if len(embedding) != self.dimension:
-                    logger.warning(f"Embedding dimension mismatch. Expected: {self.dimension}, Got: {len(embedding)}")
-                    if len(embedding) < self.dimension:
-                        embedding += [0] * (self.dimension - len(embedding))  # Pad with zeros
-                    else:
-                        embedding = embedding[:self.dimension]  # Trim excess dimensions
-
-                all_embeddings.append(embedding)
+                embeddings = self._embed_batch(batch)
+                if embeddings is not None:
+                    return embeddings
             except Exception as e:
-                logger.error(f"Error getting embedding for text: {str(e)}", exc_info=True)
-                raise
-
-        embeddings_tensor = torch.tensor(all_embeddings, device=self.device)
-        logger.info(f"Created embeddings tensor of shape {embeddings_tensor.shape}")
-        return embeddings_tensor
+                logger.warning(f"Batch embedding of {len(batch)} texts failed, retrying items individually: {str(e)}")
+        return [self._embed_single_with_retry(text) for text in batch]
 
+    def _embed_single_with_retry(self, text: str) -> List[float]:
+        retries = 0
+        while True:
+            try:
+                return self._embed_single(text)
+            except Exception as e:
+                retries += 1
+                if retries >= MAX_RETRIES:
+                    logger.error(f"Error getting embedding for text after {retries} attempts: {str(e)}", exc_info=True)
+                    raise
+                logger.warning(f"Error getting embedding for text (attempt {retries}/{MAX_RETRIES}): {str(e)}. Retrying in {RETRY_DELAY} seconds...")
+                time.sleep(RETRY_DELAY)
+
+    def _embed_batch(self, batch: List[str]) -> Optional[List[List[float]]]:
+        """
+        Embed several texts with a single request to Ollama's list-input embed endpoint.
 
-    def embed_documents(self, documents: List[str]) -> torch.Tensor:
+        Returns None (and disables batching) when the client or server does not support it.
+        """
+        logger.debug(f"Sending batch of {len(batch)} texts to Ollama embed API using model: {self.model}")
+        try:
+            response = self.client.embed(model=self.model, input=batch)
+        except AttributeError:
+            logger.warning("Installed ollama client has no embed endpoint, falling back to per-text embeddings")
+            self.supports_batch = False
+            return None
+        except ollama.ResponseError as e:
+            if e.status_code in (404, 405, 501):
+                logger.warning(f"Ollama server does not support batched embeddings ({e.status_code}), falling back to per-text embeddings")
+                self.supports_batch = False
+                return None
+            raise
+
+        if isinstance(response, dict):
+            embeddings = response.get("embeddings")
+        else:
+            embeddings = getattr(response, "embeddings", None)
+
+        if not isinstance(embeddings, list) or len(embeddings) != len(batch):
+            logger.error(f"Invalid batch embedding response: {type(response)}")
+            raise ValueError(f"Ollama API returned {len(embeddings) if isinstance(embeddings, list) else 'no'} embeddings for {len(batch)} texts")
+
+        return [self._fit_dimension(list(embedding)) for embedding in embeddings]
+
+    def _embed_single(self, text: str) -> List[float]:
+        logger.debug(f"Sending request to Ollama API for text: {text[:50]}...")
+        logger.debug(f"Using model: {self.model}")
+        logger.debug(f"Ollama base URL: {OLLAMA_BASE_URL}")
+
+        response = self.client.embeddings(model=self.model, prompt=text)
+        logger.debug(f"Raw API response: {response}")
+
+        if isinstance(response, dict):
+            embedding = response.get("embedding")
+        elif hasattr(response, "embedding"):  
+            embedding = response.embedding  # Extract the embedding attribute from the object
+        elif isinstance(response, list) and len(response) > 0 and isinstance(response[0], float):
+            embedding = response  # If response is directly a list of floats, use it
+        else:
+            logger.error(f"Unexpected response type: {type(response)}")
+            raise TypeError(f"Expected dict or EmbeddingsResponse object, got {type(response)}")
+
+        # Validate that embedding is a list
+        if not isinstance(embedding, list):
+            logger.error(f"Invalid embedding format: {embedding}")
+            raise ValueError("Ollama API did not return a valid embedding list")
+
+        return self._fit_dimension(embedding)
+
+    def _fit_dimension(self, embedding: List[float]) -> List[float]:
+        # Handle dimension mismatch
+        if len(embedding) != self.dimension:
+            logger.warning(f"Embedding dimension mismatch. Expected: {self.dimension}, Got: {len(embedding)}")
+            if len(embedding) < self.dimension:
+                embedding += [0] * (self.dimension - len(embedding))  # Pad with zeros
+            else:
+                embedding = embedding[:self.dimension]  # Trim excess dimensions
+        return embedding
+
+    def embed_documents(self, documents: List[str]) -> np.ndarray:
         logger.info(f"Embedding {len(documents)} documents")
         return self.get_embeddings(documents)
 
-    def embed_query(self, query: str) -> torch.Tensor:
+    def embed_query(self, query: str) -> np.ndarray:
         logger.info(f"Embedding query: {query[:50]}...")
         return self.get_embeddings(query)[0]
 
     @staticmethod
-    def cosine_similarity(a: torch.Tensor, b: torch.Tensor) -> torch.Tensor:
+    def cosine_similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
         """
-        Compute cosine similarity between two tensors.
+        Compute cosine similarity between two arrays along the last axis.
 
         Args:
-            a (torch.Tensor): First tensor
-            b (torch.Tensor): Second tensor
+            a (np.ndarray): First array
+            b (np.ndarray): Second array
 
         Returns:
-            torch.Tensor: Cosine similarity
+            np.ndarray: Cosine similarity
         """
-        return torch.nn.functional.cosine_similarity(a, b, dim=-1)
+        a = np.asarray(a, dtype=np.float32)
+        b = np.asarray(b, dtype=np.float32)
+        norms = np.maximum(np.linalg.norm(a, axis=-1) * np.linalg.norm(b, axis=-1), 1e-8)
+        return np.sum(a * b, axis=-1) / norms
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        return self.cache.get_stats() if self.cache else {}
 
     def get_embedding_dim(self) -> int:
         return self.dimension
\ No newline at end of file
@@ -0,0 +1,458 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+from config import FLAT_INDEX_DIR, FLAT_VECTOR_DTYPE, FLAT_BLOCK_ROWS, FLAT_QUANTIZATION, FLAT_RESCORE_FACTOR
+
+# SQLite's default limit on host parameters per statement
+SQL_VARIABLES = 900
+# Rows allocated up front, and the minimum growth, of a collection's vector file
+MIN_CAPACITY = 1024
+# Seconds a writer waits for another process's write to the same collection
+LOCK_TIMEOUT = 30
+QUANTIZATIONS = ("none", "int8", "binary")
+# Set bits per byte, for numpy versions without np.bitwise_count
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+_stores: Dict[Path, "FlatVectorStore"] = {}
+_stores_lock = threading.Lock()
+
+
+def get_flat_vector_store(path: Path = FLAT_INDEX_DIR, dtype: str = FLAT_VECTOR_DTYPE,
+                          quantization: str = FLAT_QUANTIZATION) -> "FlatVectorStore":
+    """Open the flat store at path, shared by every component of the process so they see each other's writes."""
+    path = Path(path).resolve()
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = FlatVectorStore(path, dtype, quantization)
+        return _stores[path]
+
+
+def quantize(vectors: np.ndarray, quantization: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Compress normalized vectors into the codes scanned at query time.
+
+    Args:
+        vectors (np.ndarray): L2-normalized float32 rows.
+        quantization (str): "int8" for per-row scaled int8 components, "binary" for packed sign bits.
+
+    Returns:
+        Tuple[np.ndarray, Optional[np.ndarray]]: Codes, and for int8 the per-row scales that map codes back to components.
+    """
+    if quantization == "binary":
+        return np.packbits(vectors > 0, axis=1), None
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    return np.rint(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def hamming_distances(query_codes: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """Bit differences between every packed query code and every packed row code, shape (queries, rows)."""
+    differences = np.bitwise_xor(query_codes[:, None, :], codes[None, :, :])
+    counts = np.bitwise_count(differences) if hasattr(np, "bitwise_count") else POPCOUNT[differences]
+    return counts.sum(axis=2, dtype=np.int32)
+
+
+class FlatCollection:
+    """
+    Exact nearest-neighbour search over a memory-mapped embedding matrix, with a Chroma-like API.
+
+    Embeddings are L2-normalized on write and stored as rows of `vectors.bin`; a parallel `live.bin` byte mask
+    marks rows in use, and ids, documents and metadata live in an SQLite sidecar keyed by row. Queries scan the
+    matrix in blocks of FLAT_BLOCK_ROWS with one matrix product per block for all query vectors, keeping the
+    running top k with argpartition. Distances are cosine distances, so 1 - distance is the cosine similarity.
+
+    With int8 or binary quantization, the scan reads a compact `codes.bin` instead (int8 rows scored against the
+    full-precision query, or sign bits compared by Hamming distance), keeps rescore_factor * k candidates,
+    and ranks those by their full-precision vectors, which are only read from disk for the candidates.
+    The quantization of a collection is fixed when it is created.
+
+    Several processes may open the same directory (for example API workers). Writes run in an immediate
+    SQLite transaction, which serializes them across processes, and re-read the row counters before
+    allocating rows; reads re-read the counters first, so each process sees rows appended by the others.
+    Renaming and deleting collections still require every other process to be stopped.
+    """
+
+    def __init__(self, store: "FlatVectorStore", name: str, metadata: Optional[Dict[str, Any]] = None,
+                 dtype: str = FLAT_VECTOR_DTYPE, quantization: str = FLAT_QUANTIZATION,
+                 block_rows: int = FLAT_BLOCK_ROWS, rescore_factor: int = FLAT_RESCORE_FACTOR):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {quantization!r}, expected one of {QUANTIZATIONS}")
+        self.store = store
+        self.name = name
+        self.block_rows = block_rows
+        self.rescore_factor = max(1, rescore_factor)
+        self.lock = threading.RLock()
+        self._open(store.path / name, metadata, dtype, quantization)
+
+    def _open(self, directory: Path, metadata: Optional[Dict[str, Any]], dtype: str, quantization: str):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.directory / "records.sqlite3"), timeout=LOCK_TIMEOUT, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                row INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL UNIQUE,
+                document TEXT,
+                metadata TEXT
+            );
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+        settings = dict(self.connection.execute("SELECT key, value FROM settings").fetchall())
+        if not settings:
+            settings = {"dtype": dtype, "quantization": quantization, "dimension": "0", "capacity": "0", "size": "0",
+                        "count": "0", "metadata": json.dumps(metadata)}
+            self.connection.executemany("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", settings.items())
+            self.connection.commit()
+            settings = dict(self.connection.execute("SELECT key, value FROM settings").fetchall())
+        if "count" not in settings:
+            # Collections written before the record count was kept in the settings
+            self.connection.execute("INSERT OR IGNORE INTO settings (key, value) SELECT 'count', COUNT(*) FROM records")
+            self.connection.commit()
+        self.dtype = np.dtype(settings["dtype"])
+        self.quantization = settings.get("quantization", "none")
+        self.metadata = json.loads(settings["metadata"])
+        self.dimension = self.capacity = self.size = self.record_count = 0
+        self.vectors: Optional[np.memmap] = None
+        self.live: Optional[np.memmap] = None
+        self.codes: Optional[np.memmap] = None
+        self.scales: Optional[np.memmap] = None
+        self._refresh()
+
+    def _refresh(self):
+        """Re-read the counters other processes may have changed, and remap the files if they grew."""
+        settings = dict(self.connection.execute(
+            "SELECT key, value FROM settings WHERE key IN ('dimension', 'capacity', 'size', 'count')"
+        ).fetchall())
+        self.dimension = int(settings["dimension"])
+        self.size = int(settings["size"])
+        self.record_count = int(settings["count"])
+        capacity = int(settings["capacity"])
+        if capacity > self.capacity or (capacity and self.vectors is None):
+            self._map(capacity)
+
+    @contextmanager
+    def _write(self) -> Iterator[None]:
+        """Run a mutation as one transaction, holding the collection's write lock across processes."""
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                yield
+                self.connection.commit()
+            except BaseException:
+                self.connection.rollback()
+                raise
+
+    def _map(self, capacity: int):
+        """(Re)map the vector, code and live files with room for capacity rows, growing them if needed."""
+        self.vectors = self._map_file("vectors.bin", self.dtype, capacity, self.dimension)
+        self.live = self._map_file("live.bin", np.uint8, capacity)
+        if self.quantization == "int8":
+            self.codes = self._map_file("codes.bin", np.int8, capacity, self.dimension)
+            self.scales = self._map_file("scales.bin", np.float32, capacity)
+        elif self.quantization == "binary":
+            self.codes = self._map_file("codes.bin", np.uint8, capacity, (self.dimension + 7) // 8)
+        self.capacity = capacity
+
+    def _map_file(self, file_name: str, dtype: Any, capacity: int, width: int = 0) -> np.memmap:
+        path = self.directory / file_name
+        size = capacity * max(width, 1) * np.dtype(dtype).itemsize
+        with open(path, "ab"):
+            pass
+        if os.path.getsize(path) < size:
+            os.truncate(path, size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=(capacity, width) if width else (capacity,))
+
+    def count(self) -> int:
+        with self.lock:
+            self._refresh()
+            return self.record_count
+
+    def add(self, ids: List[str], embeddings: Sequence, documents: Optional[List[str]] = None,
+            metadatas: Optional[List[Dict[str, Any]]] = None):
+        """Insert records whose ids are not stored yet; existing ids are left unchanged, as in Chroma."""
+        self._upsert(ids, embeddings, documents, metadatas, overwrite=False)
+
+    def upsert(self, ids: List[str], embeddings: Sequence, documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Dict[str, Any]]] = None):
+        self._upsert(ids, embeddings, documents, metadatas, overwrite=True)
+
+    def _upsert(self, ids: List[str], embeddings: Sequence, documents: Optional[List[str]],
+                metadatas: Optional[List[Dict[str, Any]]], overwrite: bool):
+        if len(set(ids)) != len(ids):
+            raise ValueError(f"Duplicate ids in upsert to {self.name}")
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms > 0, norms, 1)
+
+        with self._write():
+            existing = self._rows_by_id(ids)
+            if not overwrite and existing:
+                keep = [i for i, chunk_id in enumerate(ids) if chunk_id not in existing]
+                logger.warning(f"Skipped {len(ids) - len(keep)} existing ids when adding to {self.name}")
+                ids, embeddings, existing = [ids[i] for i in keep], embeddings[keep], {}
+                documents = [documents[i] for i in keep] if documents else None
+                metadatas = [metadatas[i] for i in keep] if metadatas else None
+                if not ids:
+                    return
+
+            if self.dimension == 0:
+                self.dimension = embeddings.shape[1]
+                self._set("dimension", self.dimension)
+            elif embeddings.shape[1] != self.dimension:
+                raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match collection dimensionality {self.dimension}")
+
+            new_rows = len(ids) - len(existing)
+            # Rows freed by deletes in any process are reused before the matrix grows
+            free_rows = np.flatnonzero(self.live[:self.size] == 0)[::-1].tolist() if new_rows and self.live is not None else []
+            rows = np.empty(len(ids), dtype=np.int64)
+            for i, chunk_id in enumerate(ids):
+                if chunk_id in existing:
+                    rows[i] = existing[chunk_id]
+                elif free_rows:
+                    rows[i] = free_rows.pop()
+                else:
+                    rows[i] = self.size
+                    self.size += 1
+            if self.size > self.capacity:
+                self._map(max(self.size, 2 * self.capacity, MIN_CAPACITY))
+                self._set("capacity", self.capacity)
+
+            self.vectors[rows] = embeddings.astype(self.dtype)
+            if self.codes is not None:
+                codes, scales = quantize(embeddings, self.quantization)
+                self.codes[rows] = codes
+                self.codes.flush()
+                if scales is not None:
+                    self.scales[rows] = scales
+                    self.scales.flush()
+            self.live[rows] = 1
+            self.vectors.flush()
+            self.live.flush()
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO records (row, chunk_id, document, metadata) VALUES (?, ?, ?, ?)",
+                [(int(row), chunk_id, documents[i] if documents else None, json.dumps(metadatas[i]) if metadatas else None)
+                 for i, (row, chunk_id) in enumerate(zip(rows, ids))]
+            )
+            self.record_count += new_rows
+            self._set("size", self.size)
+            self._set("count", self.record_count)
+
+    def delete(self, ids: Optional[List[str]] = None):
+        with self._write():
+            rows = list(self._rows_by_id(ids or []).values())
+            if not rows:
+                return
+            self.live[rows] = 0
+            self.live.flush()
+            self.connection.executemany("DELETE FROM records WHERE row = ?", [(row,) for row in rows])
+            self.record_count -= len(rows)
+            self._set("count", self.record_count)
+
+    def get(self, ids: Optional[List[str]] = None, include: Sequence[str] = ("metadatas", "documents"),
+            limit: Optional[int] = None, offset: Optional[int] = None) -> Dict[str, Any]:
+        with self.lock:
+            self._refresh()
+            if ids is not None:
+                records = self._records("chunk_id", ids)
+                by_id = {record[1]: record for record in records}
+                records = [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+            else:
+                records = self.connection.execute(
+                    "SELECT row, chunk_id, document, metadata FROM records ORDER BY row LIMIT ? OFFSET ?",
+                    (-1 if limit is None else limit, offset or 0)
+                ).fetchall()
+            rows = [record[0] for record in records]
+            embeddings = self.vectors[rows].astype(np.float32).tolist() if "embeddings" in include and rows else []
+        return {
+            "ids": [record[1] for record in records],
+            "embeddings": embeddings if "embeddings" in include else None,
+            "documents": [record[2] for record in records] if "documents" in include else None,
+            "metadatas": [json.loads(record[3]) if record[3] else None for record in records] if "metadatas" in include else None,
+        }
+
+    def query(self, query_embeddings: Sequence, n_results: int = 10,
+              include: Sequence[str] = ("metadatas", "documents", "distances")) -> Dict[str, Any]:
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = queries.reshape(1, -1) if queries.ndim == 1 else queries
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms > 0, norms, 1)
+
+        with self.lock:
+            # Growing remaps the files, so search the mappings and rows that exist now
+            self._refresh()
+            vectors, codes, scales, live = self.vectors, self.codes, self.scales, self.live
+            size, count = self.size, self.record_count
+        k = min(n_results, count)
+        if k == 0:
+            rows, scores = np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+        elif codes is None:
+            rows, scores = self._search(queries, lambda start, end: self._exact_scores(queries, vectors[start:end]), live, size, k)
+        else:
+            rows, _ = self._search(queries, self._code_scorer(queries, codes, scales), live, size, min(k * self.rescore_factor, count))
+            rows, scores = self._rescore(queries, vectors, rows, k)
+
+        with self.lock:
+            records = {record[0]: record for record in self._records("row", np.unique(rows).tolist())}
+        result = {key: [] for key in ("ids", "documents", "metadatas", "distances")}
+        for query_rows, query_scores in zip(rows, scores):
+            # A row deleted while the query was running has no record left
+            hits = [(records[row], score) for row, score in zip(query_rows.tolist(), query_scores.tolist()) if row in records]
+            result["ids"].append([record[1] for record, _ in hits])
+            result["documents"].append([record[2] for record, _ in hits])
+            result["metadatas"].append([json.loads(record[3]) if record[3] else None for record, _ in hits])
+            result["distances"].append([1.0 - score for _, score in hits])
+        return {key: (value if key == "ids" or key in include else None) for key, value in result.items()}
+
+    @staticmethod
+    def _exact_scores(queries: np.ndarray, block: np.ndarray) -> np.ndarray:
+        return queries @ (block if block.dtype == np.float32 else block.astype(np.float32)).T
+
+    def _code_scorer(self, queries: np.ndarray, codes: np.ndarray, scales: np.ndarray):
+        """Approximate block scores from the quantized codes; only their order matters."""
+        if self.quantization == "binary":
+            query_codes = np.packbits(queries > 0, axis=1)
+            return lambda start, end: -hamming_distances(query_codes, codes[start:end]).astype(np.float32)
+        if len(queries) == 1:
+            # einsum accumulates int8 rows into float32 without materializing a converted copy of the block
+            return lambda start, end: np.einsum("qj,ij->qi", queries, codes[start:end], dtype=np.float32) * scales[start:end]
+        return lambda start, end: (queries @ codes[start:end].astype(np.float32).T) * scales[start:end]
+
+    def _rescore(self, queries: np.ndarray, vectors: np.ndarray, candidates: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Rank each query's candidate rows by their full-precision vectors and keep the best k."""
+        rows = np.empty((len(queries), k), dtype=np.int64)
+        scores = np.empty((len(queries), k), dtype=np.float32)
+        for i, (query, query_candidates) in enumerate(zip(queries, candidates)):
+            # Sorted rows read the memory-mapped file front to back
+            query_candidates = np.sort(query_candidates)
+            exact = self._exact_scores(query[None, :], vectors[query_candidates])[0]
+            top = np.argsort(-exact, kind="stable")[:k]
+            rows[i], scores[i] = query_candidates[top], exact[top]
+        return rows, scores
+
+    def _search(self, queries: np.ndarray, score_block, live: np.ndarray, size: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top k rows for each query by score_block(start, end), which scores all queries against a block of rows; best first."""
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, size, self.block_rows):
+            end = min(start + self.block_rows, size)
+            scores = score_block(start, end)
+            scores[:, live[start:end] == 0] = -np.inf
+            rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            if end - start > k:
+                top = np.argpartition(scores, -k, axis=1)[:, -k:]
+                scores, rows = np.take_along_axis(scores, top, axis=1), np.take_along_axis(rows, top, axis=1)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, rows], axis=1)
+            if best_scores.shape[1] > k:
+                top = np.argpartition(best_scores, -k, axis=1)[:, -k:]
+                best_scores, best_rows = np.take_along_axis(best_scores, top, axis=1), np.take_along_axis(best_rows, top, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def modify(self, name: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None):
+        with self.lock:
+            if metadata is not None:
+                with self._write():
+                    self.metadata = metadata
+                    self._set("metadata", json.dumps(metadata))
+            if name is not None and name != self.name:
+                self.store._rename(self, name)
+
+    def _rename(self, name: str, directory: Path):
+        self.close()
+        self.directory.rename(directory)
+        self.name = name
+        self._open(directory, self.metadata, self.dtype.name, self.quantization)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+            self.vectors = self.live = self.codes = self.scales = None
+
+    def _rows_by_id(self, ids: Sequence[str]) -> Dict[str, int]:
+        return {record[1]: record[0] for record in self._records("chunk_id", ids)}
+
+    def _records(self, column: str, values: Sequence[Any]) -> List[Tuple]:
+        records = []
+        for i in range(0, len(values), SQL_VARIABLES):
+            part = values[i:i + SQL_VARIABLES]
+            records.extend(self.connection.execute(
+                f"SELECT row, chunk_id, document, metadata FROM records WHERE {column} IN ({','.join('?' * len(part))})", part
+            ).fetchall())
+        return records
+
+    def _set(self, key: str, value: Any):
+        self.connection.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, str(value)))
+
+
+class FlatVectorStore:
+    """Client for flat collections, one directory per collection under path, with the Chroma client methods we use."""
+
+    def __init__(self, path: Path = FLAT_INDEX_DIR, dtype: str = FLAT_VECTOR_DTYPE, quantization: str = FLAT_QUANTIZATION):
+        self.path = Path(path)
+        self.dtype = dtype
+        self.quantization = quantization
+        self.lock = threading.Lock()
+        self.collections: Dict[str, FlatCollection] = {}
+        self.path.mkdir(parents=True, exist_ok=True)
+        logger.info(f"Initialized FlatVectorStore at {self.path} ({dtype}, quantization: {quantization})")
+
+    def get_collection(self, name: str) -> FlatCollection:
+        with self.lock:
+            if name not in self.collections:
+                if not (self.path / name / "records.sqlite3").exists():
+                    raise ValueError(f"Collection {name} does not exist.")
+                self.collections[name] = FlatCollection(self, name)
+            return self.collections[name]
+
+    def create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> FlatCollection:
+        with self.lock:
+            if name in self.collections or (self.path / name).exists():
+                raise ValueError(f"Collection {name} already exists.")
+            self.collections[name] = FlatCollection(self, name, metadata, dtype=self.dtype, quantization=self.quantization)
+            return self.collections[name]
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> FlatCollection:
+        try:
+            return self.get_collection(name)
+        except ValueError:
+            return self.create_collection(name, metadata)
+
+    def delete_collection(self, name: str):
+        collection = self.get_collection(name)
+        with self.lock:
+            collection.close()
+            del self.collections[name]
+            shutil.rmtree(collection.directory)
+
+    def list_collections(self) -> List[FlatCollection]:
+        names = [path.name for path in sorted(self.path.iterdir()) if (path / "records.sqlite3").exists()]
+        return [self.get_collection(name) for name in names]
+
+    def heartbeat(self) -> int:
+        return time.time_ns()
+
+    def _rename(self, collection: FlatCollection, name: str):
+        with self.lock:
+            if name in self.collections or (self.path / name).exists():
+                raise ValueError(f"Collection {name} already exists.")
+            del self.collections[collection.name]
+            collection._rename(name, self.path / name)
+            self.collections[name] = collection
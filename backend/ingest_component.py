@@ -1,213 +1,398 @@
-from typing import List, Dict, Any, Optional, Callable
+from typing import List, Dict, Any, Optional, Callable, Iterable, Iterator, Tuple
+from dataclasses import dataclass, field
+from concurrent.futures import Future, wait
 from pathlib import Path
 from loguru import logger
 from tqdm import tqdm
-import torch
-import torch.multiprocessing as mp
-import magic
-import langdetect
+import time
 import shutil
+import hashlib
 import numpy as np
 
+try:
+    import torch  # Optional: only used to free GPU memory
+except ImportError:
+    torch = None
+
 from config import (
-    CHROMA_COLLECTION_NAME,
     SUPPORTED_FILE_TYPES,
-    CHUNK_SIZE,
-    CHUNK_OVERLAP,
+    ALLOWED_EXTENSIONS,
+    INGEST_WORKERS,
     EMBEDDING_DEVICE,
     BATCH_SIZE,
-    SUPPORTED_LANGUAGES
+    EMBEDDING_BATCH_SIZE,
+    MAX_CONCURRENT_REQUESTS,
+    SUPPORTED_LANGUAGES,
+    LANGUAGE_MIN_CONFIDENCE,
+    DEDUP_ENABLED
 )
 from backend.embedding_component import EmbeddingComponent
+from backend.document_registry import DocumentRegistry
+from backend.dedup import ChunkDeduplicator
+from backend.language_detection import LanguageDetector
+from backend.retrieval_cache import IndexGeneration
+from backend.ingest_sink import IngestSink
+from backend.chunking import get_chunker
+from backend.ingest_pipeline import IngestPipeline, summarize_results
 from backend.utils import (
-    read_file,
-    chunk_text,
+    FileInspection,
+    inspect_file,
+    iter_file_blocks,
+    batched,
     get_file_metadata,
-    initialize_chroma_client
+    initialize_vector_store,
+    get_language_collections
 )
 
+@dataclass
+class IngestTask:
+    """State of one document as it moves through ingestion."""
+    file_path: Path
+    source: str
+    metadata: Dict[str, Any]
+    previous: Optional[Dict[str, Any]]
+    document_id: str
+    language: Optional[str] = None
+    chunk_ids: List[str] = field(default_factory=list)
+    written_ids: List[str] = field(default_factory=list)
+    duplicate_count: int = 0
+    inspection: Optional[FileInspection] = None
+
+    @property
+    def unchanged(self) -> bool:
+        return self.previous is not None and self.previous["file_hash"] == self.metadata["file_hash"]
+
+    def close(self):
+        if self.inspection is not None:
+            self.inspection.close()
+            self.inspection = None
+
 class IngestComponent:
-    def __init__(self, embedding_component: EmbeddingComponent):
+    def __init__(self, embedding_component: EmbeddingComponent, registry: Optional[DocumentRegistry] = None,
+                 dedup: Optional[ChunkDeduplicator] = None, language_detector: Optional[LanguageDetector] = None,
+                 generation: Optional[IndexGeneration] = None):
         self.embedding_component = embedding_component
-        self.device = torch.device(EMBEDDING_DEVICE if torch.cuda.is_available() else "cpu")
+        # Bumped after every commit or rollback so cached retrieval results never outlive the index they came from
+        self.generation = generation if generation is not None else IndexGeneration()
+        self.language_detector = language_detector if language_detector is not None else LanguageDetector()
+        self.registry = registry if registry is not None else DocumentRegistry()
+        self.dedup = dedup if dedup is not None or not DEDUP_ENABLED else ChunkDeduplicator()
+        self.last_ingest_summary = {}
+        self.device = EMBEDDING_DEVICE
         try:
             self.chroma_client, self.collections = self._initialize_collections()
+            # Every write and delete goes through one writer thread that batches them into group commits
+            self.sink = IngestSink(self.collections)
             logger.info(f"Initialized IngestComponent with collections: {[col.name for col in self.collections.values()]} on device: {self.device}")
         except Exception as e:
             logger.error(f"Failed to initialize ChromaDB client and collections: {e}", exc_info=True)
             raise
 
     def _initialize_collections(self):
-        client, _ = initialize_chroma_client()
-        collections = {}
-        for lang in SUPPORTED_LANGUAGES:
-            collection_name = f"{CHROMA_COLLECTION_NAME}_{lang}"
-            collections[lang] = client.get_or_create_collection(name=collection_name)
-        return client, collections
+        client = initialize_vector_store()
+        return client, get_language_collections(client)
 
     def _detect_language(self, text: str) -> str:
-        try:
-            return langdetect.detect(text)
-        except:
-            return SUPPORTED_LANGUAGES[0]
+        return self.language_detector.detect(text)
+
+    def _chunk_languages(self, chunks: List[str], document_language: str) -> List[str]:
+        """Language of each chunk; short or mixed chunks detected with low confidence keep the document language."""
+        languages = []
+        for chunk in chunks:
+            language, probability = self.language_detector.detect_with_probability(chunk)
+            confident = probability >= LANGUAGE_MIN_CONFIDENCE and language in self.collections
+            languages.append(language if confident else document_language)
+        return languages
 
-    def _batch_embed(self, chunks: List[str], progress_callback: Optional[Callable] = None) -> List[List[float]]:
+    def _batch_embed(self, chunks: List[str], progress_callback: Optional[Callable] = None) -> np.ndarray:
         logger.debug(f"Starting batch embedding of {len(chunks)} chunks")
-        all_embeddings = []
-        total_batches = (len(chunks) + BATCH_SIZE - 1) // BATCH_SIZE
+        all_embeddings = np.empty((len(chunks), self.embedding_component.get_embedding_dim()), dtype=np.float32)
+        # Hand the embedding component enough texts per call to keep all of its workers busy
+        window = max(BATCH_SIZE, EMBEDDING_BATCH_SIZE * MAX_CONCURRENT_REQUESTS)
+        total_batches = (len(chunks) + window - 1) // window
 
-        for i in range(0, len(chunks), BATCH_SIZE):
-            batch = chunks[i:i + BATCH_SIZE]
-            logger.debug(f"Embedding batch {i//BATCH_SIZE + 1} of {total_batches}")
+        for i in range(0, len(chunks), window):
+            batch = chunks[i:i + window]
+            logger.debug(f"Embedding batch {i//window + 1} of {total_batches}")
             
             if progress_callback:
-                progress_callback(i, f"Embedding batch {i//BATCH_SIZE + 1}/{total_batches}")
-            
-            embeddings = self.embedding_component.embed_documents(batch)
+                progress_callback(i, f"Embedding batch {i//window + 1}/{total_batches}")
             
-            # Ensure embeddings are on CPU and converted to Python lists
-            if isinstance(embeddings, torch.Tensor):
-                embeddings = embeddings.cpu().numpy().tolist()
-            elif isinstance(embeddings, np.ndarray):
-                embeddings = embeddings.tolist()
-            
-            all_embeddings.extend(embeddings)
+            all_embeddings[i:i + len(batch)] = self.embedding_component.embed_documents(batch)
             
             if progress_callback:
-                progress_callback(len(all_embeddings), f"Embedded {len(all_embeddings)}/{len(chunks)} chunks")
+                progress_callback(i + len(batch), f"Embedded {i + len(batch)}/{len(chunks)} chunks")
 
         logger.debug(f"Batch embedding complete. Total embeddings: {len(all_embeddings)}")
         return all_embeddings
 
-    def _batch_ingest(self, chunks, ids, metadatas, progress_callback: Optional[Callable] = None):
+    def _batch_ingest(self, chunks, ids, metadatas, progress_callback: Optional[Callable] = None) -> Future:
         logger.debug(f"Starting batch ingest of {len(chunks)} chunks")
         
         if progress_callback:
             progress_callback(0, "Generating embeddings")
         
         embeddings = self._batch_embed(chunks, progress_callback)
-        
-        try:
-            if progress_callback:
-                progress_callback(len(chunks), "Storing in database")
-            
-            lang = metadatas[0]["language"]
-            collection = self.collections.get(lang, self.collections[SUPPORTED_LANGUAGES[0]])
-            logger.debug(f"Adding to collection {collection.name}")
-            
-            collection.add(
-                ids=ids,
-                embeddings=embeddings,
-                documents=chunks,
-                metadatas=metadatas
-            )
-            
-            logger.info(f"Successfully ingested batch of {len(chunks)} chunks into {lang} collection")
-            
-            if progress_callback:
-                progress_callback(len(chunks), "Complete")
-                
-        except Exception as e:
-            logger.error(f"Failed to ingest batch: {e}", exc_info=True)
-            if progress_callback:
-                progress_callback(-1, f"Error: {str(e)}")
-            raise
-        finally:
-            self.clear_cache()
+        return self._store_batch(chunks, ids, embeddings, metadatas, progress_callback)
 
-    def ingest_file(self, file_path: str, progress_callback: Optional[Callable] = None) -> Dict[str, Any]:
-        logger.info(f"Ingesting file {file_path}")
+    def _store_batch(self, chunks, ids, embeddings: np.ndarray, metadatas, progress_callback: Optional[Callable] = None) -> Future:
+        """Hand a batch to the ingestion sink; the returned future completes once its group commit is written."""
+        if progress_callback:
+            progress_callback(len(chunks), "Storing in database")
 
-        try:
-            if progress_callback:
-                progress_callback(0, "Validating file")
+        languages = [metadata["language"] for metadata in metadatas]
 
-            file_path = Path(file_path)
-            if not file_path.exists():
-                logger.error(f"File not found: {file_path}")
-                raise FileNotFoundError(f"File not found: {file_path}")
+        def on_stored(future: Future):
+            if future.exception() is None:
+                counts = {lang: languages.count(lang) for lang in dict.fromkeys(languages)}
+                logger.info(f"Successfully ingested batch of {len(chunks)} chunks into collections {counts}")
+            else:
+                logger.error(f"Failed to ingest batch: {future.exception()}")
+                if progress_callback:
+                    progress_callback(-1, f"Error: {str(future.exception())}")
 
-            file_type = magic.from_file(str(file_path), mime=True)
-            if file_type not in SUPPORTED_FILE_TYPES:
-                logger.error(f"Unsupported file type: {file_type}")
-                raise ValueError(f"Unsupported file type: {file_type}")
+        return self.sink.submit(languages, ids, embeddings, chunks, metadatas, callback=on_stored)
 
-            if progress_callback:
-                progress_callback(0, "Reading file")
+    def _wait_for_writes(self, futures: List[Future]):
+        """Block until every submitted batch is committed, raising the first write error."""
+        wait(futures)
+        for future in futures:
+            future.result()
 
-            content = read_file(file_path)
-            logger.debug(f"File content read. Length: {len(content)}")
+    def _delete_chunks(self, chunk_ids: List[str]):
+        if not chunk_ids:
+            return
+        # Queued behind pending writes, so chunks still buffered in the sink are removed too
+        self.sink.delete(chunk_ids).result()
+        logger.debug(f"Deleted {len(chunk_ids)} chunks")
 
-            if progress_callback:
-                progress_callback(0, "Chunking text")
+    def _prepare_task(self, file_path: Path, source: Optional[str] = None) -> IngestTask:
+        """
+        Inspect a file once (MIME type, hash, mapped content) and look up its previous version in the registry.
+
+        The returned task keeps the inspection open so content is decoded from the same buffer; close it when done.
+        """
+        if not file_path.exists():
+            logger.error(f"File not found: {file_path}")
+            raise FileNotFoundError(f"File not found: {file_path}")
+
+        inspection = inspect_file(file_path)
+        if inspection.file_type not in SUPPORTED_FILE_TYPES:
+            inspection.close()
+            logger.error(f"Unsupported file type: {inspection.file_type}")
+            raise ValueError(f"Unsupported file type: {inspection.file_type}")
+
+        source = source or str(file_path.resolve())
+        task = self._new_task(file_path, source, get_file_metadata(file_path, inspection), self.registry.get(source))
+        task.inspection = inspection
+        return task
+
+    def _new_task(self, file_path: Path, source: str, metadata: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> IngestTask:
+        metadata["source"] = source
+        metadata["filename"] = Path(source).name
+        return IngestTask(
+            file_path=file_path,
+            source=source,
+            metadata=metadata,
+            previous=previous,
+            document_id=hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+        )
+
+    def _iter_chunk_batches(self, task: IngestTask, chunk_stream: Optional[Iterable[str]] = None) -> Iterator[Tuple[List[str], List[str], List[Dict[str, Any]]]]:
+        """
+        Read, chunk and label a document lazily, one BATCH_SIZE batch at a time.
+
+        Chunk IDs are derived from the document and the chunk text, so a chunk that is identical in the previous
+        version keeps its ID. Such chunks are only recorded in task.chunk_ids; they are neither yielded nor
+        embedded again, and keep the metadata of the version that wrote them. The same goes for duplicates
+        of chunks elsewhere in the corpus, which are recorded as references to the canonical chunk.
+        New chunks are labelled with their own language, so mixed-language documents are split across collections.
 
-            chunks = chunk_text(content, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-            logger.debug(f"Text chunked into {len(chunks)} parts")
+        Args:
+            task (IngestTask): Document being ingested.
+            chunk_stream (Optional[Iterable[str]]): Already extracted chunks; read from the file when omitted.
 
-            metadata = get_file_metadata(file_path)
-            lang = self._detect_language(content)
-            logger.debug(f"Detected language: {lang}")
+        Yields:
+            Tuple of (chunks, ids, metadatas) for the next batch of new chunks.
+        """
+        if chunk_stream is None:
+            chunk_stream = get_chunker(task.metadata["file_type"]).iter_chunks(iter_file_blocks(task.file_path, task.inspection))
+        existing_ids = set(task.previous["chunk_ids"]) if task.previous else set()
+        occurrences: Dict[str, int] = {}
+        offset = 0
+        for chunks in batched(chunk_stream, BATCH_SIZE):
+            if task.language is None:
+                task.language = self._detect_language(" ".join(chunks))
+                logger.debug(f"Detected language: {task.language}")
+            new_chunks, new_ids, metadatas = [], [], []
+            for i, chunk in enumerate(chunks):
+                chunk_id = self._chunk_id(task, chunk, occurrences)
+                task.chunk_ids.append(chunk_id)
+                if chunk_id in existing_ids:
+                    continue
+                new_chunks.append(chunk)
+                new_ids.append(chunk_id)
+                metadatas.append({**task.metadata, "chunk_index": offset + i})
+            offset += len(chunks)
+            if new_chunks and self.dedup is not None:
+                canonical_ids = self.dedup.assign(task.document_id, new_ids, new_chunks)
+                keep = [i for i, canonical_id in enumerate(canonical_ids) if canonical_id is None]
+                task.duplicate_count += len(new_ids) - len(keep)
+                new_chunks = [new_chunks[i] for i in keep]
+                new_ids = [new_ids[i] for i in keep]
+                metadatas = [metadatas[i] for i in keep]
+            if new_chunks:
+                for metadata, language in zip(metadatas, self._chunk_languages(new_chunks, task.language)):
+                    metadata["language"] = language
+                yield new_chunks, new_ids, metadatas
 
-            ids = [f"{file_path.stem}_{i}" for i in range(len(chunks))]
-            metadatas = [{**metadata, "chunk_index": i, "language": lang} for i in range(len(chunks))]
+    @staticmethod
+    def _chunk_id(task: IngestTask, chunk: str, occurrences: Dict[str, int]) -> str:
+        """Content-addressed chunk ID; repeats of the same text within a document are numbered."""
+        digest = hashlib.sha256(chunk.encode("utf-8")).hexdigest()[:16]
+        count = occurrences.get(digest, 0)
+        occurrences[digest] = count + 1
+        return f"{task.document_id}_{digest}" if count == 0 else f"{task.document_id}_{digest}_{count}"
 
-            logger.debug("Starting batch ingest")
-            self._batch_ingest(chunks, ids, metadatas, progress_callback)
+    def _unchanged_result(self, task: IngestTask) -> Dict[str, Any]:
+        logger.info(f"File {task.source} is unchanged since last ingestion, skipping")
+        return {
+            **task.metadata,
+            "language": task.previous["language"],
+            "chunks_count": task.previous["chunks_count"],
+            "status": "unchanged"
+        }
 
-            logger.info(f"Successfully ingested file {file_path}")
-            return {
-                **metadata, 
-                "language": lang, 
-                "chunks_count": len(chunks),
-                "status": "success"
-            }
+    def _commit_task(self, task: IngestTask) -> Dict[str, Any]:
+        """Point the registry at the newly written version, then remove the stale chunks."""
+        task.language = task.language or SUPPORTED_LANGUAGES[0]
+        self.registry.register(task.source, task.document_id, task.metadata["file_hash"], task.language, task.chunk_ids)
+        if self.dedup is not None:
+            self.dedup.commit(task.document_id)
+        if task.previous:
+            current_ids = set(task.chunk_ids)
+            stale_ids = [chunk_id for chunk_id in task.previous["chunk_ids"] if chunk_id not in current_ids]
+            # Canonical chunks that other documents still reference are kept
+            self._delete_chunks(self.dedup.release(stale_ids) if self.dedup is not None else stale_ids)
+            logger.info(f"Replaced {len(stale_ids)} stale chunks of {task.source}, "
+                        f"reused {len(task.chunk_ids) - len(task.written_ids) - task.duplicate_count} unchanged chunks")
+        self.generation.bump()
+
+        logger.info(f"Successfully ingested file {task.file_path}")
+        return {
+            **task.metadata,
+            "language": task.language,
+            "chunks_count": len(task.chunk_ids),
+            "reused_chunks": len(task.chunk_ids) - len(task.written_ids) - task.duplicate_count,
+            "duplicate_chunks": task.duplicate_count,
+            "dedup_ratio": round(task.duplicate_count / len(task.chunk_ids), 4) if task.chunk_ids else 0.0,
+            "status": "updated" if task.previous else "success"
+        }
+
+    def _rollback_task(self, task: IngestTask):
+        """Remove the chunks written for a failed version; reused ones still belong to the registered version."""
+        orphaned_ids = self.dedup.discard(task.document_id) if self.dedup is not None else []
+        self._delete_chunks(task.written_ids + orphaned_ids)
+        if task.written_ids or orphaned_ids:
+            self.generation.bump()
+        task.chunk_ids = []
+        task.written_ids = []
+        task.duplicate_count = 0
+
+    def ingest_file(self, file_path: str, progress_callback: Optional[Callable] = None, source: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Ingest a file, skipping it when its content is unchanged since the last ingestion.
+
+        Args:
+            file_path (str): Path to the file.
+            progress_callback (Optional[Callable]): Called with (count, message) as ingestion advances.
+            source (Optional[str]): Stable document identity, e.g. the original upload name. Defaults to the resolved path.
+        """
+        logger.info(f"Ingesting file {file_path}")
+
+        task = None
+        try:
+            if progress_callback:
+                progress_callback(0, "Validating file")
+
+            task = self._prepare_task(Path(file_path), source)
+            if task.unchanged:
+                if progress_callback:
+                    progress_callback(task.previous["chunks_count"], "Complete")
+                return self._unchanged_result(task)
+
+            if progress_callback:
+                progress_callback(0, "Reading and chunking file")
+
+            # Pages are read, chunked, embedded and written in bounded batches so memory stays flat;
+            # the next batch is embedded while the sink commits the previous one
+            try:
+                writes = []
+                for chunks, ids, metadatas in self._iter_chunk_batches(task):
+                    writes.append(self._batch_ingest(chunks, ids, metadatas, progress_callback))
+                    task.written_ids.extend(ids)
+                self._wait_for_writes(writes)
+            except Exception:
+                self._rollback_task(task)
+                raise
+            logger.debug(f"Text chunked and stored in {len(task.chunk_ids)} parts")
+
+            result = self._commit_task(task)
+            if progress_callback:
+                progress_callback(len(task.chunk_ids), "Complete")
+            return result
         except Exception as e:
             logger.error(f"Error ingesting file {file_path}: {str(e)}", exc_info=True)
             if progress_callback:
                 progress_callback(-1, f"Error: {str(e)}")
             raise
         finally:
+            if task is not None:
+                task.close()
             self.clear_cache()
 
-    def ingest_directory(self, directory_path: str, num_gpus: int = 1, progress_callback: Optional[Callable] = None) -> List[Dict[str, Any]]:
+    def ingest_directory(self, directory_path: str, workers: int = INGEST_WORKERS, progress_callback: Optional[Callable] = None) -> List[Dict[str, Any]]:
+        """
+        Ingest every supported file under a directory using all available cores.
+
+        Text extraction and chunking run in `workers` processes; embedding and writes stay in this process.
+        A failing file is reported in its result without stopping the others.
+        """
         directory_path = Path(directory_path)
         if not directory_path.is_dir():
             raise NotADirectoryError(f"Not a directory: {directory_path}")
 
-        logger.info(f"Ingesting files from directory: {directory_path}")
+        logger.info(f"Ingesting files from directory: {directory_path} with {workers} workers")
+        started = time.perf_counter()
 
-        file_paths = [file_path for file_path in directory_path.rglob("*") 
-                     if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_FILE_TYPES]
+        # Cheap extension filter here; the workers sniff the actual MIME type
+        file_paths = [file_path for file_path in sorted(directory_path.rglob("*"))
+                     if file_path.is_file() and file_path.suffix.lower().lstrip(".") in ALLOWED_EXTENSIONS]
         logger.info(f"Found {len(file_paths)} files to ingest")
 
         if progress_callback:
             progress_callback(0, f"Found {len(file_paths)} files to process")
 
-        if num_gpus > 1 and torch.cuda.device_count() > 1:
-            # Multi-GPU processing
-            with mp.Pool(num_gpus) as pool:
-                results = []
-                for i, result in enumerate(pool.imap(self.ingest_file, file_paths)):
-                    results.append(result)
-                    if progress_callback:
-                        progress_callback(i + 1, f"Processed {i + 1}/{len(file_paths)} files")
-        else:
-            results = []
-            for i, file_path in enumerate(tqdm(file_paths, desc="Ingesting files", unit="file")):
-                try:
-                    result = self.ingest_file(str(file_path))
-                    results.append(result)
-                    if progress_callback:
-                        progress_callback(i + 1, f"Processed {i + 1}/{len(file_paths)} files")
-                except Exception as e:
-                    logger.error(f"Error ingesting file {file_path}: {e}", exc_info=True)
-                    results.append({"status": "failed", "file": str(file_path), "error": str(e)})
-                finally:
-                    self.clear_cache()
+        with tqdm(total=len(file_paths), desc="Ingesting files", unit="file") as progress_bar:
+            def on_progress(done: int, message: str):
+                progress_bar.update(done - progress_bar.n)
+                if progress_callback:
+                    progress_callback(done, message)
+
+            pipeline = IngestPipeline(self, workers=workers)
+            results = pipeline.run(file_paths, on_progress) if file_paths else []
+
+        self.last_ingest_summary = summarize_results(results, time.perf_counter() - started, pipeline.get_stats())
+        self.clear_cache()
 
         logger.info(f"Finished ingesting {len(file_paths)} files from {directory_path}")
         return results
 
+    def close(self):
+        """Write out everything still queued in the sink and stop its writer thread."""
+        self.sink.close()
+        logger.info("IngestComponent closed")
+
     def check_chroma_health(self):
         try:
             self.chroma_client.heartbeat()
@@ -227,6 +412,7 @@ class IngestComponent:
             
             stats["total_documents"] = total_documents
             stats["total_chunks"] = total_documents
+            stats["registered_documents"] = self.registry.count()
             
             logger.info(f"Collection stats: {stats}")
             return stats
@@ -242,6 +428,6 @@ class IngestComponent:
             except Exception as e:
                 logger.error(f"Error deleting cache {pycache_dir}: {e}", exc_info=True)
 
-        if torch.cuda.is_available():
+        if torch is not None and torch.cuda.is_available():
             torch.cuda.empty_cache()
             logger.info("GPU cache cleared.")
\ No newline at end of file
@@ -0,0 +1,315 @@
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from importlib.machinery import ModuleSpec
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from config import (
+    INGEST_WORKERS,
+    INGEST_QUEUE_SIZE,
+    INGEST_STREAMING_THRESHOLD,
+    SUPPORTED_FILE_TYPES
+)
+from backend.chunking import get_chunker
+from backend.utils import inspect_file, iter_file_blocks, get_file_metadata
+
+# Markers passed between stages alongside chunk batches
+_BATCH = "batch"
+_END = "end"
+_ERROR = "error"
+_DONE = object()
+
+
+def parse_file(file_path: str, known_hash: Optional[str] = None) -> Tuple[Dict[str, Any], Optional[List[str]]]:
+    """
+    Inspect, extract and chunk one file from a single memory-mapped read.
+
+    Runs in a worker process, so it must stay a picklable module-level function.
+    Returns the file metadata and its chunks, or None for the chunks when the hash equals known_hash.
+    """
+    path = Path(file_path)
+    with inspect_file(path) as inspection:
+        if inspection.file_type not in SUPPORTED_FILE_TYPES:
+            raise ValueError(f"Unsupported file type: {inspection.file_type}")
+        metadata = get_file_metadata(path, inspection)
+        if metadata["file_hash"] == known_hash:
+            return metadata, None
+        chunks = list(get_chunker(inspection.file_type).iter_chunks(iter_file_blocks(path, inspection)))
+    return metadata, chunks
+
+
+_main_module_lock = threading.Lock()
+
+
+@contextmanager
+def _main_module_not_rerun():
+    """
+    Make a starting worker skip re-running the parent's __main__ module.
+
+    Spawned and forkserver children run the parent's main script again (as __mp_main__) so that objects pickled
+    from it resolve. Parse workers are only ever sent parse_file, and re-running main.py or api.py would redo all
+    their module-level work in every worker; a main module named "__main__" is the one case multiprocessing leaves alone.
+    """
+    main_module = sys.modules["__main__"]
+    with _main_module_lock:
+        spec = getattr(main_module, "__spec__", None)
+        main_module.__spec__ = ModuleSpec("__main__", None)
+        try:
+            yield
+        finally:
+            main_module.__spec__ = spec
+
+
+class _ParseWorker:
+    """Process start hook shared by the parse worker classes below."""
+
+    def start(self):
+        with _main_module_not_rerun():
+            super().start()
+
+
+class _SpawnParseWorker(_ParseWorker, multiprocessing.context.SpawnProcess):
+    pass
+
+
+class _SpawnWorkerContext(multiprocessing.context.SpawnContext):
+    Process = _SpawnParseWorker
+
+
+if hasattr(multiprocessing.context, "ForkServerContext"):
+    class _ForkServerParseWorker(_ParseWorker, multiprocessing.context.ForkServerProcess):
+        pass
+
+    class _ForkServerWorkerContext(multiprocessing.context.ForkServerContext):
+        Process = _ForkServerParseWorker
+
+
+def worker_context() -> multiprocessing.context.BaseContext:
+    """
+    Start method for the parse workers.
+
+    The pipeline runs next to embedding, sink and API threads, and a forked child can inherit a lock another
+    thread held at fork time (loguru's handler lock, for one) and block on it forever. Workers are therefore
+    started from a clean forkserver process where available, and spawned otherwise, without re-running the
+    parent's main script.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = _ForkServerWorkerContext()
+        context.set_forkserver_preload([__name__])
+        return context
+    return _SpawnWorkerContext()
+
+
+def summarize_results(results: List[Dict[str, Any]], elapsed: float, stage_stats: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the end-of-run report for a bulk ingestion."""
+    statuses = [result.get("status") for result in results]
+    chunks = sum(result.get("chunks_count", 0) for result in results if result.get("status") in ("success", "updated"))
+    duplicates = sum(result.get("duplicate_chunks", 0) for result in results)
+    return {
+        "files": len(results),
+        "ingested": statuses.count("success"),
+        "updated": statuses.count("updated"),
+        "unchanged": statuses.count("unchanged"),
+        "failed": statuses.count("failed"),
+        "chunks": chunks,
+        "duplicate_chunks": duplicates,
+        "dedup_ratio": round(duplicates / chunks, 4) if chunks else 0.0,
+        "elapsed_seconds": round(elapsed, 2),
+        "stages": stage_stats,
+        "failures": [{"file": result.get("file"), "error": result.get("error")} for result in results if result.get("status") == "failed"],
+    }
+
+
+class StageStats:
+    """Items processed and time spent working (not waiting) by one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.batches = 0
+        self.chunks = 0
+        self.busy_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, chunks: int, seconds: float, batches: int = 1):
+        with self.lock:
+            self.batches += batches
+            self.chunks += chunks
+            self.busy_seconds += seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "chunks": self.chunks,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "chunks_per_second": round(self.chunks / self.busy_seconds, 1) if self.busy_seconds else 0.0,
+        }
+
+
+class IngestPipeline:
+    """
+    Staged bulk ingestion: a pool of parse workers, one embedding stage and one store writer.
+
+    Stages are connected by bounded queues, so a slow stage applies backpressure to the ones before it
+    while every resource (CPU for parsing, Ollama for embedding, Chroma for writing) stays busy.
+    Text extraction and chunking run in worker processes; everything that touches Chroma stays in this process.
+    """
+
+    def __init__(self, ingest_component, workers: int = INGEST_WORKERS, queue_size: int = INGEST_QUEUE_SIZE):
+        self.ingest_component = ingest_component
+        self.workers = max(1, workers)
+        self.embed_queue = queue.Queue(maxsize=queue_size)
+        self.store_queue = queue.Queue(maxsize=queue_size)
+        self.stats = {name: StageStats(name) for name in ("parse", "embed", "store")}
+        self.results: Dict[int, Dict[str, Any]] = {}
+        self.results_lock = threading.Lock()
+        self.progress_callback: Optional[Callable] = None
+        self.total_files = 0
+        self.process_pool: Optional[ProcessPoolExecutor] = None
+        self.summary: Dict[str, Any] = {}
+
+    def run(self, file_paths: List[Path], progress_callback: Optional[Callable] = None) -> List[Dict[str, Any]]:
+        self.progress_callback = progress_callback
+        self.total_files = len(file_paths)
+        started = time.perf_counter()
+
+        embed_thread = threading.Thread(target=self._embed_stage, name="ingest-embed", daemon=True)
+        store_thread = threading.Thread(target=self._store_stage, name="ingest-store", daemon=True)
+        embed_thread.start()
+        store_thread.start()
+
+        # Each parse thread hands the CPU-bound work to the process pool and feeds the embed queue with the result
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=worker_context()) as self.process_pool:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest-parse") as parse_pool:
+                for index, file_path in enumerate(file_paths):
+                    parse_pool.submit(self._parse_stage, index, Path(file_path))
+        self.process_pool = None
+
+        self.embed_queue.put(_DONE)
+        embed_thread.join()
+        store_thread.join()
+
+        results = [self.results[index] for index in range(len(file_paths))]
+        self.summary = summarize_results(results, time.perf_counter() - started, self.get_stats())
+        logger.info(f"Pipeline ingestion summary: {self.summary}")
+        return results
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    def _finish(self, index: int, result: Dict[str, Any]):
+        with self.results_lock:
+            self.results[index] = result
+            done = len(self.results)
+        if self.progress_callback:
+            self.progress_callback(done, f"Processed {done}/{self.total_files} files")
+
+    def _parse_stage(self, index: int, file_path: Path):
+        task = None
+        try:
+            parse_seconds = 0.0
+            if file_path.stat().st_size > INGEST_STREAMING_THRESHOLD:
+                # Very large files are streamed in this thread so their chunks never pile up in memory
+                task = self.ingest_component._prepare_task(file_path)
+                chunks = None
+            else:
+                # The worker opens the file once for MIME type, hash and content, and skips parsing unchanged files
+                source = str(file_path.resolve())
+                previous = self.ingest_component.registry.get(source)
+                started = time.perf_counter()
+                metadata, chunks = self.process_pool.submit(
+                    parse_file, str(file_path), previous["file_hash"] if previous else None
+                ).result()
+                parse_seconds = time.perf_counter() - started
+                task = self.ingest_component._new_task(file_path, source, metadata, previous)
+
+            if task.unchanged:
+                self._finish(index, self.ingest_component._unchanged_result(task))
+                return
+
+            batches = self.ingest_component._iter_chunk_batches(task, chunks)
+            while True:
+                started = time.perf_counter()
+                batch = next(batches, None)
+                if batch is None:
+                    break
+                self.stats["parse"].record(len(batch[0]), time.perf_counter() - started + parse_seconds)
+                parse_seconds = 0.0
+                self.embed_queue.put((_BATCH, index, task, batch))
+            self.embed_queue.put((_END, index, task, None))
+        except Exception as e:
+            logger.error(f"Error parsing file {file_path}: {e}", exc_info=True)
+            if task is None:
+                self._finish(index, {"status": "failed", "file": str(file_path), "error": str(e)})
+            else:
+                self.embed_queue.put((_ERROR, index, task, e))
+        finally:
+            if task is not None:
+                task.close()
+
+    def _embed_stage(self):
+        failed = set()
+        while True:
+            item = self.embed_queue.get()
+            if item is _DONE:
+                self.store_queue.put(_DONE)
+                return
+
+            kind, index, task, payload = item
+            if kind != _BATCH:
+                self.store_queue.put(item)
+                continue
+            if index in failed:
+                continue
+
+            chunks, ids, metadatas = payload
+            try:
+                started = time.perf_counter()
+                embeddings = self.ingest_component._batch_embed(chunks)
+                self.stats["embed"].record(len(chunks), time.perf_counter() - started)
+                self.store_queue.put((_BATCH, index, task, (chunks, ids, embeddings, metadatas)))
+            except Exception as e:
+                # Drop the rest of this document's batches; the store stage rolls back what was written
+                logger.error(f"Error embedding batch of {task.file_path}: {e}", exc_info=True)
+                failed.add(index)
+                self.store_queue.put((_ERROR, index, task, e))
+
+    def _store_stage(self):
+        # Batches are handed to the ingestion sink without waiting; a document is committed once all its writes land
+        failed = set()
+        writes: Dict[int, List] = {}
+        while True:
+            item = self.store_queue.get()
+            if item is _DONE:
+                return
+
+            kind, index, task, payload = item
+            if index in failed:
+                continue
+
+            try:
+                if kind == _BATCH:
+                    chunks, ids, embeddings, metadatas = payload
+                    started = time.perf_counter()
+                    writes.setdefault(index, []).append(self.ingest_component._store_batch(chunks, ids, embeddings, metadatas))
+                    task.written_ids.extend(ids)
+                    self.stats["store"].record(len(chunks), time.perf_counter() - started)
+                elif kind == _END:
+                    started = time.perf_counter()
+                    self.ingest_component._wait_for_writes(writes.pop(index, []))
+                    self.stats["store"].record(0, time.perf_counter() - started, batches=0)
+                    self._finish(index, self.ingest_component._commit_task(task))
+                else:
+                    raise payload
+            except Exception as e:
+                logger.error(f"Error ingesting file {task.file_path}: {e}", exc_info=True)
+                failed.add(index)
+                writes.pop(index, None)
+                self.ingest_component._rollback_task(task)
+                self._finish(index, {"status": "failed", "file": str(task.file_path), "error": str(e)})
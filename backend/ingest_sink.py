@@ -0,0 +1,243 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from loguru import logger
+
+from config import SINK_MAX_BATCH_SIZE, SINK_MAX_DELAY, SINK_QUEUE_SIZE, SUPPORTED_LANGUAGES
+
+_STOP = object()
+
+
+@dataclass
+class _Write:
+    languages: List[str]
+    ids: List[str]
+    embeddings: np.ndarray
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    future: Future
+
+
+@dataclass
+class _Delete:
+    ids: List[str]
+    future: Future
+
+
+class IngestSink:
+    """
+    Single writer for all vector store mutations.
+
+    Chunk batches submitted by any number of ingestion tasks are accumulated and flushed as group commits
+    (one upsert per collection, with every chunk routed to its own language's collection) once SINK_MAX_BATCH_SIZE chunks are pending or the oldest pending write is
+    SINK_MAX_DELAY seconds old. Deletes go through the same queue, so they are applied after earlier writes.
+    The queue holds at most queue_size operations; submitting to a full queue blocks, which throttles ingestion
+    to the write rate. A failure anywhere in a flush fails the futures of its writes, never the writer thread.
+    """
+
+    def __init__(self, collections: Dict[str, Any], max_batch_size: int = SINK_MAX_BATCH_SIZE, max_delay: float = SINK_MAX_DELAY,
+                 queue_size: int = SINK_QUEUE_SIZE):
+        self.collections = collections
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_delay = max_delay
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.closed = False
+        self.lock = threading.Lock()
+        self.pending_chunks = 0
+        self.flushes = 0
+        self.chunks_written = 0
+        self.total_flush_seconds = 0.0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.thread = threading.Thread(target=self._run, name="ingest-sink", daemon=True)
+        self.thread.start()
+
+    def submit(self, language: Union[str, Sequence[str]], ids: List[str], embeddings: np.ndarray, documents: List[str],
+               metadatas: List[Dict[str, Any]], callback: Optional[Callable[[Future], None]] = None) -> Future:
+        """
+        Queue a batch of chunks for the next group commit.
+
+        Args:
+            language (Union[str, Sequence[str]]): Collection language of the whole batch, or of each chunk.
+
+        Returns:
+            Future: Resolves to the number of chunks written once they are committed, or to the write error.
+        """
+        future = Future()
+        if callback:
+            future.add_done_callback(callback)
+        with self.lock:
+            self.pending_chunks += len(ids)
+        languages = [language] * len(ids) if isinstance(language, str) else list(language)
+        self._put(_Write(languages, ids, embeddings, documents, metadatas, future))
+        return future
+
+    def delete(self, ids: List[str], callback: Optional[Callable[[Future], None]] = None) -> Future:
+        """Queue the removal of chunks from every collection, after all previously submitted writes."""
+        future = Future()
+        if callback:
+            future.add_done_callback(callback)
+        self._put(_Delete(ids, future))
+        return future
+
+    def close(self):
+        """Flush pending writes and stop the writer thread; later submissions fail immediately."""
+        if self.closed:
+            return
+        self.closed = True
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+        self._fail_queued()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "sink_queue_depth": self.pending_chunks,
+                "sink_flushes": self.flushes,
+                "sink_chunks_written": self.chunks_written,
+                "sink_last_flush_ms": round(self.last_flush_seconds * 1000, 1),
+                "sink_avg_flush_ms": round(self.total_flush_seconds * 1000 / self.flushes, 1) if self.flushes else 0.0,
+                "sink_max_flush_ms": round(self.max_flush_seconds * 1000, 1),
+            }
+
+    def _put(self, item: Union[_Write, _Delete]):
+        self.queue.put(item)
+        # Anything queued after the writer stopped would never complete
+        if self.closed and not self.thread.is_alive():
+            self._fail_queued()
+
+    def _fail_queued(self, error: Optional[Exception] = None):
+        error = error or RuntimeError("Ingestion sink is closed")
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if isinstance(item, (_Write, _Delete)):
+                self._fail([item], error)
+
+    def _fail(self, items: List[Union[_Write, _Delete]], error: Exception):
+        for item in items:
+            if item.future.done():
+                continue
+            item.future.set_exception(error)
+            if isinstance(item, _Write):
+                with self.lock:
+                    self.pending_chunks -= len(item.ids)
+
+    def _run(self):
+        pending: List[_Write] = []
+        try:
+            self._loop(pending)
+        except Exception as e:
+            # Unreachable in normal operation; fail every waiter rather than leave it blocked forever
+            logger.error(f"Ingestion sink stopped unexpectedly: {e}", exc_info=True)
+            self.closed = True
+            self._fail(pending, e)
+            self._fail_queued(e)
+
+    def _loop(self, pending: List[_Write]):
+        pending_count = 0
+        oldest = 0.0
+        while True:
+            timeout = max(0.0, oldest + self.max_delay - time.monotonic()) if pending else None
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP or isinstance(item, _Delete):
+                self._flush(pending)
+                pending.clear()
+                pending_count = 0
+                if item is _STOP:
+                    return
+                self._apply_delete(item)
+                continue
+
+            if item is not None:
+                if not pending:
+                    oldest = time.monotonic()
+                pending.append(item)
+                pending_count += len(item.ids)
+
+            if pending and (pending_count >= self.max_batch_size or time.monotonic() - oldest >= self.max_delay):
+                self._flush(pending)
+                pending.clear()
+                pending_count = 0
+
+    def _flush(self, writes: List[_Write]):
+        if not writes:
+            return
+        started = time.perf_counter()
+        try:
+            written, errors = self._group_commit(writes)
+        except Exception as e:
+            logger.error(f"Group commit of {len(writes)} batches failed: {e}", exc_info=True)
+            written, errors = 0, {id(write): e for write in writes}
+
+        # A batch split across collections completes once all of its parts are written
+        for write in writes:
+            if id(write) in errors:
+                write.future.set_exception(errors[id(write)])
+            else:
+                write.future.set_result(len(write.ids))
+
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.pending_chunks -= sum(len(write.ids) for write in writes)
+            self.flushes += 1
+            self.chunks_written += written
+            self.total_flush_seconds += elapsed
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+
+    def _group_commit(self, writes: List[_Write]) -> Tuple[int, Dict[int, Exception]]:
+        """Upsert the writes, one collection at a time; returns the chunks written and the error of each failed write."""
+        by_language: Dict[str, List[Tuple[_Write, np.ndarray]]] = {}
+        for write in writes:
+            languages = np.asarray(write.languages)
+            for language in dict.fromkeys(write.languages):
+                by_language.setdefault(language, []).append((write, np.flatnonzero(languages == language)))
+
+        written = 0
+        errors: Dict[int, Exception] = {}
+        for language, group in by_language.items():
+            try:
+                collection = self.collections.get(language, self.collections[SUPPORTED_LANGUAGES[0]])
+                ids = [write.ids[i] for write, rows in group for i in rows]
+                documents = [write.documents[i] for write, rows in group for i in rows]
+                metadatas = [write.metadatas[i] for write, rows in group for i in rows]
+                parts = [write.embeddings if len(rows) == len(write.ids) else write.embeddings[rows] for write, rows in group]
+                embeddings = np.concatenate(parts) if len(parts) > 1 else parts[0]
+                for i in range(0, len(ids), self.max_batch_size):
+                    collection.upsert(
+                        ids=ids[i:i + self.max_batch_size],
+                        embeddings=embeddings[i:i + self.max_batch_size].tolist(),  # Chroma only accepts nested lists
+                        documents=documents[i:i + self.max_batch_size],
+                        metadatas=metadatas[i:i + self.max_batch_size]
+                    )
+                written += len(ids)
+                logger.debug(f"Group commit of {len(ids)} chunks from {len(group)} batches into {collection.name}")
+            except Exception as e:
+                logger.error(f"Group commit of {language} chunks failed: {e}", exc_info=True)
+                for write, _ in group:
+                    errors.setdefault(id(write), e)
+        return written, errors
+
+    def _apply_delete(self, delete: _Delete):
+        try:
+            # Chunks may live in any language collection
+            for collection in self.collections.values():
+                for i in range(0, len(delete.ids), self.max_batch_size):
+                    collection.delete(ids=delete.ids[i:i + self.max_batch_size])
+            delete.future.set_result(len(delete.ids))
+        except Exception as e:
+            logger.error(f"Error deleting {len(delete.ids)} chunks: {e}", exc_info=True)
+            delete.future.set_exception(e)
@@ -0,0 +1,110 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from langdetect.detector_factory import DetectorFactory, PROFILES_DIRECTORY
+from langdetect.lang_detect_exception import LangDetectException
+from loguru import logger
+
+from config import (
+    SUPPORTED_LANGUAGES,
+    LANGUAGE_DETECTION_SEED,
+    LANGUAGE_SAMPLE_SIZE,
+    LANGUAGE_CACHE_SIZE
+)
+
+# Evenly spaced windows a long text is sampled from
+SAMPLE_WINDOWS = 4
+
+
+class LanguageDetector:
+    """
+    Deterministic language detection over the supported languages only.
+
+    Uses langdetect's n-gram profiles, but loads just the profiles of SUPPORTED_LANGUAGES into a private
+    factory with a fixed seed, so results are reproducible and scoring is cheaper. Long texts are sampled
+    and results are cached by a digest of the sample, so repeated queries and chunks are detected once.
+    """
+
+    def __init__(self, languages: Sequence[str] = SUPPORTED_LANGUAGES, sample_size: int = LANGUAGE_SAMPLE_SIZE,
+                 cache_size: int = LANGUAGE_CACHE_SIZE, seed: int = LANGUAGE_DETECTION_SEED):
+        self.languages = list(languages)
+        self.default_language = self.languages[0]
+        self.sample_size = sample_size
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.factory = DetectorFactory()
+        self.factory.load_json_profile([
+            (Path(PROFILES_DIRECTORY) / language).read_text(encoding="utf-8") for language in self.languages
+        ])
+        self.factory.set_seed(seed)
+        logger.info(f"Initialized LanguageDetector for languages: {self.languages}")
+
+    def detect(self, text: str) -> str:
+        return self.detect_with_probability(text)[0]
+
+    def detect_with_probability(self, text: str) -> Tuple[str, float]:
+        """
+        Detect the language of a text.
+
+        Returns:
+            Tuple[str, float]: The most likely supported language and its probability. Text without any
+            detectable feature gets the default language with probability 0.
+        """
+        sample = self._sample(text)
+        # Keyed by digest so cached document chunks cost a few bytes each
+        key = hashlib.blake2b(sample.encode("utf-8"), digest_size=16).digest()
+        with self.lock:
+            result = self.cache.get(key)
+            if result is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+
+        result = self._detect(sample)
+        with self.lock:
+            self.cache[key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return result
+
+    def detect_batch(self, texts: Sequence[str]) -> List[str]:
+        """Detect the language of several texts, detecting each distinct text once."""
+        languages: Dict[str, str] = {}
+        for text in texts:
+            if text not in languages:
+                languages[text] = self.detect(text)
+        return [languages[text] for text in texts]
+
+    def get_stats(self) -> Dict[str, float]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "language_cache_hits": self.hits,
+                "language_cache_misses": self.misses,
+                "language_cache_hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _sample(self, text: str) -> str:
+        text = text.strip()
+        if len(text) <= self.sample_size:
+            return text
+        window = self.sample_size // SAMPLE_WINDOWS
+        step = (len(text) - window) // (SAMPLE_WINDOWS - 1)
+        return " ".join(text[i * step:i * step + window] for i in range(SAMPLE_WINDOWS))
+
+    def _detect(self, sample: str) -> Tuple[str, float]:
+        try:
+            detector = self.factory.create()
+            detector.append(sample)
+            best = detector.get_probabilities()[0]
+            return best.lang, best.prob
+        except (LangDetectException, IndexError):
+            return self.default_language, 0.0
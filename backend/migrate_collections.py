@@ -0,0 +1,117 @@
+"""
+Offline migration of the language collections to the configured HNSW settings.
+
+An HNSW index cannot change its distance space, construction_ef or M in place, so each outdated collection
+is copied (ids, embeddings, documents and metadata; nothing is re-embedded) into a new collection created
+with hnsw_metadata(), which then takes over the original name. Stop the application before running it:
+running components keep handles to the old collections.
+
+Usage:
+    python -m backend.migrate_collections [--languages en fr] [--force] [--dry-run] [--keep-backup]
+"""
+import argparse
+import time
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from config import SUPPORTED_LANGUAGES, SINK_MAX_BATCH_SIZE
+from backend.utils import initialize_vector_store, hnsw_metadata, language_collection_name
+
+
+def is_outdated(collection: Any, expected: Dict[str, Any]) -> bool:
+    current = collection.metadata or {}
+    return any(current.get(key) != value for key, value in expected.items())
+
+
+def copy_collection(source: Any, target: Any, batch_size: int = SINK_MAX_BATCH_SIZE) -> int:
+    """Copy every record of source into target, batch_size records at a time; returns the number copied."""
+    copied = 0
+    total = source.count()
+    while copied < total:
+        page = source.get(limit=batch_size, offset=copied, include=["embeddings", "documents", "metadatas"])
+        if not page["ids"]:
+            break
+        target.add(ids=page["ids"], embeddings=page["embeddings"], documents=page["documents"], metadatas=page["metadatas"])
+        copied += len(page["ids"])
+        logger.debug(f"Copied {copied}/{total} records from {source.name}")
+    return copied
+
+
+def migrate_collection(client: Any, lang: str, expected: Dict[str, Any], force: bool = False, dry_run: bool = False,
+                       keep_backup: bool = False, batch_size: int = SINK_MAX_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Rebuild one language collection with the expected HNSW settings.
+
+    The copy is verified before the swap, so a failure leaves the original collection untouched.
+    With keep_backup, the original is kept as `<name>_backup`.
+    """
+    name = language_collection_name(lang)
+    try:
+        collection = client.get_collection(name=name)
+    except ValueError:
+        logger.info(f"Collection {name} does not exist yet; it will be created with {expected}")
+        return {"collection": name, "status": "missing"}
+
+    if not force and not is_outdated(collection, expected):
+        return {"collection": name, "status": "up_to_date", "records": collection.count()}
+    if dry_run:
+        return {"collection": name, "status": "outdated", "records": collection.count(), "metadata": collection.metadata}
+
+    started = time.perf_counter()
+    staging_name, backup_name = f"{name}_migrating", f"{name}_backup"
+    for stale_name in (staging_name, backup_name):
+        _delete_if_exists(client, stale_name)
+
+    staging = client.create_collection(name=staging_name, metadata=expected)
+    try:
+        copied = copy_collection(collection, staging, batch_size)
+        if staging.count() != collection.count():
+            raise RuntimeError(f"Copied {staging.count()} of {collection.count()} records")
+    except Exception:
+        client.delete_collection(staging_name)
+        raise
+
+    collection.modify(name=backup_name)
+    staging.modify(name=name)
+    if not keep_backup:
+        client.delete_collection(backup_name)
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Migrated {copied} records of {name} to {expected} in {elapsed:.1f}s")
+    return {"collection": name, "status": "migrated", "records": copied, "seconds": round(elapsed, 2)}
+
+
+def migrate(languages: Optional[List[str]] = None, force: bool = False, dry_run: bool = False,
+            keep_backup: bool = False, batch_size: int = SINK_MAX_BATCH_SIZE, client: Any = None) -> List[Dict[str, Any]]:
+    if client is None:
+        client = initialize_vector_store()
+    expected = hnsw_metadata()
+    return [migrate_collection(client, lang, expected, force, dry_run, keep_backup, batch_size)
+            for lang in (languages or SUPPORTED_LANGUAGES)]
+
+
+def _delete_if_exists(client: Any, name: str):
+    try:
+        client.delete_collection(name)
+        logger.warning(f"Deleted leftover collection {name} from an interrupted migration")
+    except ValueError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild language collections with the configured HNSW settings")
+    parser.add_argument("--languages", nargs="+", choices=SUPPORTED_LANGUAGES, help="Collections to migrate (default: all)")
+    parser.add_argument("--force", action="store_true", help="Rebuild even when the settings already match")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which collections are outdated")
+    parser.add_argument("--keep-backup", action="store_true", help="Keep each original collection as <name>_backup")
+    parser.add_argument("--batch-size", type=int, default=SINK_MAX_BATCH_SIZE, help="Records copied per request")
+    args = parser.parse_args()
+
+    print(f"Target HNSW settings: {hnsw_metadata()}")
+    for result in migrate(args.languages, args.force, args.dry_run, args.keep_backup, args.batch_size):
+        print(", ".join(f"{key}: {value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
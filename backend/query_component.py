@@ -1,8 +1,7 @@
+import time
 import ollama
-import torch
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from loguru import logger
-import langdetect
 
 from config import (
     OLLAMA_BASE_URL,
@@ -16,25 +15,51 @@ from config import (
 )
 from backend.embedding_component import EmbeddingComponent
 from backend.retrieval_component import RetrievalComponent
+from backend.answer_cache import AnswerCache
+from backend.single_flight import SingleFlight
+from backend.query_plan import QueryPlan
+from backend.utils import clean_text
+
+GENERATION_ERROR_RESPONSE = "I apologize, but I encountered an error while trying to generate a response."
 
 class QueryComponent:
-    def __init__(self, embedding_component: EmbeddingComponent, retrieval_component: RetrievalComponent):
+    def __init__(self, embedding_component: EmbeddingComponent, retrieval_component: RetrievalComponent,
+                 answer_cache: Optional[AnswerCache] = None, single_flight: Optional[SingleFlight] = None):
         self.embedding_component = embedding_component
         self.retrieval_component = retrieval_component
+        self.answer_cache = answer_cache
+        self.single_flight = single_flight if single_flight is not None else SingleFlight()
         self.ollama_client = ollama.Client(host=OLLAMA_BASE_URL)
-        self.device = torch.device(EMBEDDING_DEVICE if torch.cuda.is_available() else "cpu")
+        self.device = EMBEDDING_DEVICE
         logger.info(f"Initialized QueryComponent with LLM model: {LLM_MODEL} on device: {self.device}")
 
     def process_query(self, query: str, model: str = None) -> Dict[str, Any]:
-        """Processes a query and retrieves relevant information."""
+        """Processes a query; concurrent calls with the same normalized query and model share one execution."""
+        selected_model = model if model else LLM_MODEL
+        result = self.single_flight.do((clean_text(query), selected_model),
+                                       lambda: self._process_query(query, selected_model))
+        return {**result, "query": query}
+
+    def _process_query(self, query: str, selected_model: str) -> Dict[str, Any]:
         try:
             logger.info(f"Processing query: {query}")
-            relevant_chunks = self.retrieval_component.retrieve(query, k=TOP_K_RESULTS)
-            response = self._generate_response(query, relevant_chunks, model=model)
+            plan = self.retrieval_component.plan(query)
+            relevant_chunks, cached_response, generation = self._retrieve_context(plan, selected_model)
+            if cached_response is None:
+                with plan.stage("generate"):
+                    response = self._generate_response(query, relevant_chunks, model=selected_model, language=plan.language)
+                if response != GENERATION_ERROR_RESPONSE:
+                    self._store_answer(plan, selected_model, response, relevant_chunks, generation)
+            else:
+                response = cached_response
+            logger.debug(f"Query stage timings (ms): {plan.timings}")
             return {
                 "query": query,
                 "response": response,
                 "relevant_chunks": relevant_chunks,
+                "language": plan.language,
+                "timings": plan.timings,
+                "cached": cached_response is not None,
                 "error": None
             }
         except Exception as e:
@@ -46,8 +71,111 @@ class QueryComponent:
                 "error": f"Error processing query: {str(e)}"
             }
 
-    def _generate_response(self, query: str, relevant_chunks: List[Dict[str, Any]], model: str = None) -> str:
+    def stream_query(self, query: str, model: str = None) -> Iterator[Dict[str, Any]]:
+        """
+        Processes a query, yielding events as soon as they are available.
+
+        Yields a "chunks" event with the retrieved context before generation starts, one "token" event per
+        generated fragment, then a "done" event with the stage timings; failures end the stream with an
+        "error" event. Each event is a dict with "event" and "data" keys.
+        """
+        selected_model = model if model else LLM_MODEL
+        started = time.perf_counter()
+        try:
+            logger.info(f"Streaming query: {query}")
+            plan = self.retrieval_component.plan(query)
+            relevant_chunks, cached_response, generation = self._retrieve_context(plan, selected_model)
+            yield {"event": "chunks", "data": {
+                "query": query,
+                "relevant_chunks": relevant_chunks,
+                "language": plan.language,
+                "cached": cached_response is not None
+            }}
+
+            if cached_response is not None:
+                plan.timings["first_token"] = round((time.perf_counter() - started) * 1000, 3)
+                yield {"event": "token", "data": {"token": cached_response}}
+            else:
+                tokens = []
+                with plan.stage("generate"):
+                    for token in self._stream_response(query, relevant_chunks, model=selected_model, language=plan.language):
+                        if not tokens:
+                            plan.timings["first_token"] = round((time.perf_counter() - started) * 1000, 3)
+                        tokens.append(token)
+                        yield {"event": "token", "data": {"token": token}}
+                self._store_answer(plan, selected_model, "".join(tokens), relevant_chunks, generation)
+            logger.debug(f"Streamed query stage timings (ms): {plan.timings}")
+            yield {"event": "done", "data": {"timings": plan.timings}}
+        except Exception as e:
+            logger.error(f"Error streaming query: {str(e)}", exc_info=True)
+            yield {"event": "error", "data": {"error": f"Error processing query: {str(e)}"}}
+
+    def _retrieve_context(self, plan: QueryPlan, selected_model: str) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[int]]:
+        """
+        Context chunks for the plan and, on an answer cache hit, the cached response.
+
+        Also returns the index generation read before retrieval, so an answer generated while an ingestion
+        commits is cached under the older generation and never served after the change.
+        """
+        generation = None
+        if self.answer_cache is not None:
+            generation = self.answer_cache.generation.current()
+            with plan.stage("answer_cache"):
+                try:
+                    cached = self.answer_cache.lookup(plan.embedding, selected_model, plan.language,
+                                                      self.retrieval_component.retrieve_by_id)
+                except Exception as e:
+                    # The cache is only a shortcut; answer normally when it cannot be checked
+                    logger.warning(f"Answer cache lookup failed, retrieving instead: {e}", exc_info=True)
+                    cached = None
+            if cached is not None:
+                logger.info(f"Answering from the cache entry for: {cached['query']}")
+                return cached["relevant_chunks"], cached["response"], generation
+        return self.retrieval_component.retrieve_plan(plan, k=TOP_K_RESULTS), None, generation
+
+    def _store_answer(self, plan: QueryPlan, selected_model: str, response: str, relevant_chunks: List[Dict[str, Any]],
+                      generation: Optional[int]):
+        if self.answer_cache is not None and relevant_chunks and response:
+            self.answer_cache.store(plan.embedding, selected_model, plan.language, plan.query, response, relevant_chunks,
+                                    generation=generation)
+
+    def _generate_response(self, query: str, relevant_chunks: List[Dict[str, Any]], model: str = None,
+                           language: Optional[str] = None) -> str:
         """Generates a response based on retrieved relevant chunks."""
+        prompt = self._build_prompt(query, relevant_chunks, language)
+
+        # Use provided model or fall back to default from config
+        selected_model = model if model else LLM_MODEL
+
+        try:
+            logger.info(f"Sending request to Ollama API with model: {selected_model}")
+            response = self.ollama_client.generate(model=selected_model, prompt=prompt, options=self._generation_options())
+            logger.debug(f"Received response from Ollama API: {response}")
+            return response['response']
+        except Exception as e:
+            logger.error(f"Error generating response: {str(e)}", exc_info=True)
+            return GENERATION_ERROR_RESPONSE
+
+    def _stream_response(self, query: str, relevant_chunks: List[Dict[str, Any]], model: str = None,
+                         language: Optional[str] = None) -> Iterator[str]:
+        """Yields the response fragments as Ollama generates them; errors propagate to the caller."""
+        prompt = self._build_prompt(query, relevant_chunks, language)
+        selected_model = model if model else LLM_MODEL
+        logger.info(f"Streaming request to Ollama API with model: {selected_model}")
+        for part in self.ollama_client.generate(model=selected_model, prompt=prompt, options=self._generation_options(),
+                                                stream=True):
+            if part['response']:
+                yield part['response']
+
+    @staticmethod
+    def _generation_options() -> Dict[str, Any]:
+        return {
+            "max_tokens": LLM_MAX_TOKENS,
+            "temperature": TEMPERATURE,
+            "top_p": TOP_P,
+        }
+
+    def _build_prompt(self, query: str, relevant_chunks: List[Dict[str, Any]], language: Optional[str] = None) -> str:
         context_parts = []
         for chunk in relevant_chunks:
             context_parts.append(f"Content: {chunk['chunk']}")
@@ -74,38 +202,20 @@ class QueryComponent:
         Context:
         {context}
 
+        Detected query language: {language or "unknown"}
+
         User Question: {query}
 
         Assistant:
         """
 
         logger.debug(f"Generated prompt: {prompt}")
+        return prompt
 
-        # Use provided model or fall back to default from config
-        selected_model = model if model else LLM_MODEL
-
-        try:
-            logger.info(f"Sending request to Ollama API with model: {selected_model}")
-            response = self.ollama_client.generate(
-                model=selected_model,
-                prompt=prompt,
-                options={
-                    "max_tokens": LLM_MAX_TOKENS,
-                    "temperature": TEMPERATURE,
-                    "top_p": TOP_P,
-                }
-            )
-            logger.debug(f"Received response from Ollama API: {response}")
-            return response['response']
-        except Exception as e:
-            logger.error(f"Error generating response: {str(e)}", exc_info=True)
-            return "I apologize, but I encountered an error while trying to generate a response."
-
-
-    @torch.no_grad()
     def semantic_search(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
-        query_lang = self._detect_language(query)
-        logger.info(f"Performing semantic search for query in {query_lang}")
-        query_embedding = self.embedding_component.embed_query(query).to(self.device)
-        return self.retrieval_component.retrieve(query, n_results)
+        plan = self.retrieval_component.plan(query)
+        logger.info(f"Performing semantic search for query in {plan.language}")
+        results = self.retrieval_component.retrieve_plan(plan, n_results)
+        logger.debug(f"Semantic search stage timings (ms): {plan.timings}")
+        return results
 
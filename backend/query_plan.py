@@ -0,0 +1,72 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from backend.utils import clean_text
+
+
+class QueryPlan:
+    """
+    State of one query as it moves through retrieval, caching and generation.
+
+    The normalized text, language and embedding are computed at most once, on first use, so every stage
+    shares them. Each stage's wall time is accumulated in timings, in milliseconds.
+    """
+
+    def __init__(self, query: str, embedding_component: Any, language_detector: Any):
+        self.query = query
+        self.embedding_component = embedding_component
+        self.language_detector = language_detector
+        self.timings: Dict[str, float] = {}
+        self._normalized_text: Optional[str] = None
+        self._language: Optional[str] = None
+        self._embedding: Optional[np.ndarray] = None
+
+    @classmethod
+    def batch(cls, queries: List[str], embedding_component: Any, language_detector: Any) -> List["QueryPlan"]:
+        """Plans for several queries, embedded in one batch and detected together; each records the batch timings."""
+        plans = [cls(query, embedding_component, language_detector) for query in queries]
+        if not plans:
+            return plans
+        started = time.perf_counter()
+        embeddings = embedding_component.embed_documents(queries)
+        embed_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        languages = language_detector.detect_batch(queries)
+        language_ms = (time.perf_counter() - started) * 1000
+        for plan, embedding, language in zip(plans, embeddings, languages):
+            plan._embedding, plan._language = embedding, language
+            plan.timings.update(embed=round(embed_ms, 3), language=round(language_ms, 3))
+        return plans
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(self.timings.get(name, 0.0) + (time.perf_counter() - started) * 1000, 3)
+
+    @property
+    def normalized_text(self) -> str:
+        """Whitespace-collapsed, lowercased query, for keys that should not depend on formatting."""
+        if self._normalized_text is None:
+            with self.stage("normalize"):
+                self._normalized_text = clean_text(self.query)
+        return self._normalized_text
+
+    @property
+    def language(self) -> str:
+        if self._language is None:
+            with self.stage("language"):
+                self._language = self.language_detector.detect(self.query)
+        return self._language
+
+    @property
+    def embedding(self) -> np.ndarray:
+        if self._embedding is None:
+            with self.stage("embed"):
+                self._embedding = self.embedding_component.embed_query(self.query)
+        return self._embedding
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from config import (
+    RETRIEVAL_CACHE_PATH,
+    RETRIEVAL_CACHE_SIZE,
+    RETRIEVAL_CACHE_SHARED_SIZE,
+    RETRIEVAL_CACHE_TTL
+)
+
+# Shared entries are pruned once every this many writes
+PRUNE_INTERVAL = 100
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(str(path), check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class IndexGeneration:
+    """
+    Counter of committed changes to the vector index, stored in SQLite so every process sees the same value.
+
+    Ingestion bumps it after each commit or rollback; caches include it in their keys, so results computed
+    before the change are never served after it.
+    """
+
+    def __init__(self, path: Path = RETRIEVAL_CACHE_PATH):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.connection = _connect(self.path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS index_generation (id INTEGER PRIMARY KEY CHECK (id = 1), value INTEGER NOT NULL)")
+        self.connection.execute("INSERT OR IGNORE INTO index_generation (id, value) VALUES (1, 0)")
+        self.connection.commit()
+
+    def current(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT value FROM index_generation WHERE id = 1").fetchone()[0]
+
+    def bump(self) -> int:
+        with self.lock:
+            self.connection.execute("UPDATE index_generation SET value = value + 1 WHERE id = 1")
+            self.connection.commit()
+            value = self.connection.execute("SELECT value FROM index_generation WHERE id = 1").fetchone()[0]
+        logger.debug(f"Index generation bumped to {value}")
+        return value
+
+
+class RetrievalCache:
+    """
+    Two-level cache of retrieval results, keyed by (normalized query, k, routing mode, index generation).
+
+    Lookups go to an in-process LRU of `max_entries` first, then to an SQLite table shared by every worker
+    using the same path. Entries expire after `ttl` seconds, and entries of older index generations are
+    never matched and are pruned from the shared table.
+    """
+
+    def __init__(self, path: Path = RETRIEVAL_CACHE_PATH, max_entries: int = RETRIEVAL_CACHE_SIZE,
+                 max_shared_entries: int = RETRIEVAL_CACHE_SHARED_SIZE, ttl: float = RETRIEVAL_CACHE_TTL,
+                 generation: Optional[IndexGeneration] = None):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_shared_entries = max_shared_entries
+        self.ttl = ttl
+        self.generation = generation if generation is not None else IndexGeneration(self.path)
+        self.memory: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.connection = _connect(self.path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS retrieval_cache (
+                key TEXT PRIMARY KEY,
+                generation INTEGER NOT NULL,
+                results TEXT NOT NULL,
+                expires REAL NOT NULL
+            )
+            """
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_retrieval_cache_expires ON retrieval_cache (expires)")
+        self.connection.commit()
+        logger.info(f"Initialized RetrievalCache at {self.path} (size: {self.max_entries}, ttl: {self.ttl}s)")
+
+    def key(self, normalized_query: str, k: int, mode: str) -> str:
+        """Cache key for the current index generation."""
+        parts = json.dumps([normalized_query, k, mode, self.generation.current()])
+        return hashlib.sha256(parts.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and entry[0] > now:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            row = self.connection.execute("SELECT results, expires FROM retrieval_cache WHERE key = ? AND expires > ?", (key, now)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            results = json.loads(row[0])
+            self._remember(key, row[1], results)
+            self.shared_hits += 1
+            return results
+
+    def put(self, key: str, results: List[Dict[str, Any]]):
+        expires = time.time() + self.ttl
+        with self.lock:
+            self._remember(key, expires, results)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO retrieval_cache (key, generation, results, expires) VALUES (?, ?, ?, ?)",
+                (key, self.generation.current(), json.dumps(results), expires)
+            )
+            self.writes += 1
+            if self.writes % PRUNE_INTERVAL == 0:
+                self._prune()
+            self.connection.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "retrieval_cache_hits": self.hits,
+                "retrieval_cache_shared_hits": self.shared_hits,
+                "retrieval_cache_misses": self.misses,
+                "retrieval_cache_hit_rate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+                "index_generation": self.generation.current(),
+            }
+
+    def _remember(self, key: str, expires: float, results: List[Dict[str, Any]]):
+        self.memory[key] = (expires, results)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _prune(self):
+        """Drop expired and superseded shared entries, then the soonest to expire beyond max_shared_entries."""
+        self.connection.execute("DELETE FROM retrieval_cache WHERE expires <= ? OR generation < ?", (time.time(), self.generation.current()))
+        self.connection.execute(
+            "DELETE FROM retrieval_cache WHERE key IN (SELECT key FROM retrieval_cache ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+            (self.max_shared_entries,)
+        )
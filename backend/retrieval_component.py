@@ -1,21 +1,40 @@
-import torch
-from typing import List, Dict, Any
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
 from loguru import logger
-from backend.utils import initialize_chroma_client
-import langdetect
+import numpy as np
+from backend.utils import initialize_vector_store, get_language_collections
 
 from config import (
     TOP_K_RESULTS,
     EMBEDDING_DEVICE,
-    CHROMA_COLLECTION_NAME,
-    SUPPORTED_LANGUAGES
+    RETRIEVAL_ROUTING,
+    ROUTING_MIN_SCORE,
+    RETRIEVAL_WORKERS,
+    RETRIEVAL_CACHE_ENABLED
 )
 from backend.embedding_component import EmbeddingComponent
+from backend.language_detection import LanguageDetector
+from backend.query_plan import QueryPlan
+from backend.retrieval_cache import RetrievalCache
 
 class RetrievalComponent:
-    def __init__(self, embedding_component: EmbeddingComponent):
+    def __init__(self, embedding_component: EmbeddingComponent, language_detector: Optional[LanguageDetector] = None,
+                 routing: bool = RETRIEVAL_ROUTING, routing_min_score: float = ROUTING_MIN_SCORE,
+                 cache: Optional[RetrievalCache] = None):
         self.embedding_component = embedding_component
-        self.device = torch.device(EMBEDDING_DEVICE if torch.cuda.is_available() else "cpu")
+        self.language_detector = language_detector if language_detector is not None else LanguageDetector()
+        self.cache = cache if cache is not None or not RETRIEVAL_CACHE_ENABLED else RetrievalCache()
+        self.device = EMBEDDING_DEVICE
+        self.routing = routing
+        self.routing_min_score = routing_min_score
+        self.stats_lock = threading.Lock()
+        self.routed_queries = 0
+        self.routing_hits = 0
+        self.routing_fallbacks = 0
+        # Shared by all requests, so a fan-out takes as long as the slowest collection rather than their sum
+        self.executor = ThreadPoolExecutor(max_workers=max(1, RETRIEVAL_WORKERS), thread_name_prefix="retrieval")
         try:
             self.chroma_client, self.collections = self._initialize_collections()
             logger.info(f"Initialized RetrievalComponent with collections: {[col.name for col in self.collections.values()]} on device: {self.device}")
@@ -24,96 +43,123 @@ class RetrievalComponent:
             raise
 
     def _initialize_collections(self):
-        client, _ = initialize_chroma_client()
-        collections = {}
-        for lang in SUPPORTED_LANGUAGES:
-            collection_name = f"{CHROMA_COLLECTION_NAME}_{lang}"
-            collections[lang] = client.get_or_create_collection(name=collection_name)
-        return client, collections
-
-    def _detect_language(self, text: str) -> str:
-        try:
-            return langdetect.detect(text)
-        except:
-            return SUPPORTED_LANGUAGES[0]
+        client = initialize_vector_store()
+        return client, get_language_collections(client)
+
+    def _query_collection(self, lang: str, query_embedding: np.ndarray, k: int) -> List[Dict[str, Any]]:
+        results = self.collections[lang].query(
+            query_embeddings=[query_embedding.tolist()],
+            n_results=k,
+            include=["metadatas", "documents", "distances"]
+        )
+        return [{
+            'chunk_id': results['ids'][0][i],
+            'chunk': results['documents'][0][i],
+            'metadata': results['metadatas'][0][i],
+            'similarity_score': 1 - results['distances'][0][i],
+            'language': lang
+        } for i in range(len(results['ids'][0]))]
+
+    def _search(self, query_embedding: np.ndarray, query_lang: str, k: int) -> List[Dict[str, Any]]:
+        """
+        Top k chunks for a query.
+
+        With routing, only the query language's collection is searched when it returns k results whose best
+        score reaches routing_min_score; otherwise the remaining collections are searched as well and the
+        results are merged by score, the query language only breaking ties. Without routing, chunks in the
+        query language come first.
+        """
+        languages = list(self.collections)
+        all_results = []
+        fell_back = False
+        if self.routing and query_lang in self.collections:
+            all_results = self._query_collection(query_lang, query_embedding, k)
+            confident = len(all_results) >= k and all_results[0]['similarity_score'] >= self.routing_min_score
+            with self.stats_lock:
+                self.routed_queries += 1
+                if confident:
+                    self.routing_hits += 1
+                else:
+                    self.routing_fallbacks += 1
+            if confident:
+                return all_results
+            logger.debug(f"Routed search in {query_lang} was not conclusive, searching the other collections")
+            languages.remove(query_lang)
+            fell_back = True
+
+        futures = [self.executor.submit(self._query_collection, lang, query_embedding, k) for lang in languages]
+        for future in futures:
+            all_results.extend(future.result())
+
+        if fell_back:
+            # The query language's chunks scored too low, so better matches in other languages must win
+            return heapq.nlargest(k, all_results, key=lambda x: (x['similarity_score'], x['language'] == query_lang))
+        # Query-language chunks first, each group by score
+        return heapq.nlargest(k, all_results, key=lambda x: (x['language'] == query_lang, x['similarity_score']))
+
+    def plan(self, query: str) -> QueryPlan:
+        """Query plan that embeds and detects the query at most once for all stages."""
+        return QueryPlan(query, self.embedding_component, self.language_detector)
 
     def find_similar_chunks(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        try:
-            query_embedding = self.embedding_component.embed_query(query)
-            query_lang = self._detect_language(query)
+        return self.retrieve_plan(self.plan(query), k)
 
-            all_results = []
-            for lang, collection in self.collections.items():
-                results = collection.query(
-                    query_embeddings=[query_embedding.tolist()],
-                    n_results=k,
-                    include=["metadatas", "documents", "distances"]
-                )
-                for i in range(len(results['ids'][0])):
-                    all_results.append({
-                        'chunk_id': results['ids'][0][i],
-                        'chunk': results['documents'][0][i],
-                        'metadata': results['metadatas'][0][i],
-                        'similarity_score': 1 - results['distances'][0][i],
-                        'language': lang
-                    })
-
-            all_results.sort(key=lambda x: x['similarity_score'], reverse=True)
-
-            prioritized_results = [r for r in all_results if r['language'] == query_lang] + \
-                                  [r for r in all_results if r['language'] != query_lang]
-
-            return prioritized_results[:k]
+    def retrieve_plan(self, plan: QueryPlan, k: int = 5) -> List[Dict[str, Any]]:
+        try:
+            key = None
+            if self.cache is not None:
+                with plan.stage("cache"):
+                    key = self._cache_key(plan, k)
+                    cached = self.cache.get(key)
+                if cached is not None:
+                    return cached
+
+            query_embedding, query_lang = plan.embedding, plan.language
+            with plan.stage("retrieve"):
+                results = self._search(query_embedding, query_lang, k)
+            if key is not None:
+                self.cache.put(key, results)
+            return results
 
         except Exception as e:
             logger.error(f"Error finding similar chunks: {str(e)}", exc_info=True)
             return []
 
-    @torch.no_grad()
     def retrieve(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
         return self.find_similar_chunks(query, k)
 
     def batch_retrieve(self, queries: List[str], k: int = TOP_K_RESULTS) -> List[List[Dict[str, Any]]]:
         logger.info(f"Batch retrieving top {k} results for {len(queries)} queries")
-        query_embeddings = self.embedding_component.embed_documents(queries)
-        
-        batch_retrieved_chunks = []
-        for i, query in enumerate(queries):
-            query_lang = self._detect_language(query)
-            all_results = []
-            
-            for lang, collection in self.collections.items():
-                results = collection.query(
-                    query_embeddings=[query_embeddings[i].cpu().numpy().tolist()],
-                    n_results=k,
-                    include=["documents", "metadatas", "distances"]
-                )
-                for j in range(len(results['ids'][0])):
-                    all_results.append({
-                        "chunk_id": results['ids'][0][j],
-                        "chunk": results['documents'][0][j],
-                        "metadata": results['metadatas'][0][j],
-                        "similarity_score": 1 - results['distances'][0][j],
-                        "language": lang
-                    })
-            
-            all_results.sort(key=lambda x: x['similarity_score'], reverse=True)
-            prioritized_results = [r for r in all_results if r['language'] == query_lang] + \
-                                  [r for r in all_results if r['language'] != query_lang]
-            
-            batch_retrieved_chunks.append(prioritized_results[:k])
-
-        return batch_retrieved_chunks
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(queries)
+        keys: List[Optional[str]] = [None] * len(queries)
+        if self.cache is not None:
+            for i, query in enumerate(queries):
+                keys[i] = self._cache_key(self.plan(query), k)
+                results[i] = self.cache.get(keys[i])
+
+        # Only the queries missing from the cache are embedded, in one batch
+        missing = [i for i, result in enumerate(results) if result is None]
+        plans = QueryPlan.batch([queries[i] for i in missing], self.embedding_component, self.language_detector)
+        for i, plan in zip(missing, plans):
+            results[i] = self._search(plan.embedding, plan.language, k)
+            if keys[i] is not None:
+                self.cache.put(keys[i], results[i])
+        return results
+
+    def _cache_key(self, plan: QueryPlan, k: int) -> str:
+        mode = f"routed:{self.routing_min_score}" if self.routing else "fanout"
+        return self.cache.key(plan.normalized_text, k, mode)
 
     def retrieve_by_id(self, chunk_ids: List[str]) -> List[Dict[str, Any]]:
         logger.info(f"Retrieving {len(chunk_ids)} chunks by ID")
 
+        futures = {
+            lang: self.executor.submit(collection.get, ids=chunk_ids, include=["documents", "metadatas"])
+            for lang, collection in self.collections.items()
+        }
         retrieved_chunks = []
-        for lang, collection in self.collections.items():
-            results = collection.get(
-                ids=chunk_ids,
-                include=["documents", "metadatas"]
-            )
+        for lang, future in futures.items():
+            results = future.result()
             for i in range(len(results['ids'])):
                 retrieved_chunks.append({
                     "chunk_id": results['ids'][i],
@@ -124,6 +170,17 @@ class RetrievalComponent:
 
         return retrieved_chunks
 
+    def get_routing_stats(self) -> Dict[str, Any]:
+        with self.stats_lock:
+            routed = self.routed_queries
+            return {
+                "routed_queries": routed,
+                "routing_hits": self.routing_hits,
+                "routing_fallbacks": self.routing_fallbacks,
+                "routing_hit_rate": round(self.routing_hits / routed, 4) if routed else 0.0,
+                "routing_fallback_rate": round(self.routing_fallbacks / routed, 4) if routed else 0.0,
+            }
+
     def get_collection_stats(self) -> Dict[str, int]:
         try:
             stats = {}
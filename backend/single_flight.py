@@ -0,0 +1,57 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+from loguru import logger
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it is in flight wait for and receive
+    the same result (or exception). The key is released as soon as the call finishes, so later calls run again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls: Dict[Hashable, Future] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.calls[key] = future
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            logger.debug(f"Waiting for in-flight call {key}")
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            calls = self.executions + self.coalesced
+            return {
+                "single_flight_executions": self.executions,
+                "single_flight_coalesced": self.coalesced,
+                "single_flight_in_flight": len(self.calls),
+                "single_flight_coalesced_rate": round(self.coalesced / calls, 4) if calls else 0.0,
+            }
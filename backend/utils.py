@@ -1,6 +1,11 @@
 import os
+import io
+import mmap
+import codecs
 import hashlib
-from typing import List, Dict, Any
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import List, Dict, Any, BinaryIO, Iterable, Iterator, Optional, Union
 from pathlib import Path
 import magic
 from bs4 import BeautifulSoup
@@ -11,61 +16,206 @@ from loguru import logger
 import chromadb
 import time
 import sqlite3
-from config import CHUNK_SIZE, CHUNK_OVERLAP, CHROMA_PERSIST_DIRECTORY, CHROMA_COLLECTION_NAME, MAX_RETRIES, RETRY_DELAY
+from config import CHUNK_SIZE, CHUNK_OVERLAP, CHROMA_PERSIST_DIRECTORY, CHROMA_COLLECTION_NAME, MAX_RETRIES, RETRY_DELAY, READ_BLOCK_SIZE, MIME_SNIFF_BYTES
+from config import SUPPORTED_LANGUAGES, HNSW_SPACE, EF_CONSTRUCTION, M_CONSTRUCTION, EF_SEARCH, VECTOR_STORE_TYPE
+from backend.flat_vector_store import get_flat_vector_store
 
-def read_file(file_path: Path) -> str:
+class BufferStream(io.RawIOBase):
+    """Seekable, read-only binary stream over a buffer (e.g. an mmap) that never copies it."""
+
+    def __init__(self, buffer: Any):
+        self._view = memoryview(buffer)
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        count = max(0, min(len(target), len(self._view) - self._position))
+        target[:count] = self._view[self._position:self._position + count]
+        self._position += count
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, offset)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+@dataclass
+class FileInspection:
+    """
+    Everything ingestion needs to know about a file, computed from a single memory-mapped read.
+
+    The buffer stays mapped until close() so content can be decoded from it without reopening the file.
+    """
+    path: Path
+    file_type: str
+    file_hash: str
+    file_size: int
+    created_at: float
+    modified_at: float
+    buffer: Any
+
+    streams: List[BufferStream] = field(default_factory=list)
+
+    def stream(self) -> BinaryIO:
+        """Return a new seekable binary stream over the mapped buffer."""
+        stream = BufferStream(self.buffer)
+        self.streams.append(stream)
+        return stream
+
+    def close(self):
+        for stream in self.streams:
+            stream.close()
+        self.streams = []
+        if isinstance(self.buffer, mmap.mmap) and not self.buffer.closed:
+            self.buffer.close()
+
+    def __enter__(self) -> "FileInspection":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def inspect_file(file_path: Path) -> FileInspection:
+    """
+    Open a file once, memory-map it and compute its MIME type and sha256 from the mapped buffer.
+
+    Args:
+        file_path (Path): Path to the file.
+
+    Returns:
+        FileInspection: Inspection result; close it (or use it as a context manager) when done.
+    """
+    file_path = Path(file_path)
+    with open(file_path, 'rb') as file:
+        stats = os.fstat(file.fileno())
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if stats.st_size else b""
+
+    file_type = magic.from_buffer(bytes(buffer[:MIME_SNIFF_BYTES]), mime=True)
+    file_hash = hashlib.sha256(buffer).hexdigest()
+    logger.debug(f"Inspected {file_path}: type {file_type}, {stats.st_size} bytes")
+    return FileInspection(
+        path=file_path,
+        file_type=file_type,
+        file_hash=file_hash,
+        file_size=stats.st_size,
+        created_at=stats.st_ctime,
+        modified_at=stats.st_mtime,
+        buffer=buffer
+    )
+
+def read_file(file_path: Path, inspection: Optional[FileInspection] = None) -> str:
     """
     Read the content of a file based on its type.
 
     Args:
         file_path (Path): Path to the file.
+        inspection (Optional[FileInspection]): Existing inspection of the file, reused instead of reopening it.
 
     Returns:
         str: Content of the file.
     """
+    return ''.join(iter_file_blocks(file_path, inspection))
+
+def iter_file_blocks(file_path: Path, inspection: Optional[FileInspection] = None) -> Iterator[str]:
+    """
+    Lazily read the content of a file as consecutive text blocks (pages, paragraphs or fixed-size reads).
+
+    Joining the blocks gives the same text as reading the whole file at once.
+
+    Args:
+        file_path (Path): Path to the file.
+        inspection (Optional[FileInspection]): Existing inspection of the file, reused instead of reopening it.
+
+    Yields:
+        str: Next block of text.
+    """
+    if inspection is None:
+        with inspect_file(file_path) as inspection:
+            yield from iter_file_blocks(file_path, inspection)
+        return
+
     logger.debug(f"Attempting to read file: {file_path}")
-    file_type = magic.from_file(str(file_path), mime=True)
-    logger.debug(f"File type detected: {magic.from_file(str(file_path), mime=True)}")
+    file_type = inspection.file_type
+    logger.debug(f"File type detected: {file_type}")
 
     try:
         if file_type == 'text/plain':
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read()
+            yield from iter_text_blocks(inspection.buffer)
         elif file_type == 'application/pdf':
-            return read_pdf(file_path)
+            yield from iter_pdf_pages(inspection.stream())
         elif file_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
-            return read_docx(file_path)
+            yield from iter_docx_paragraphs(inspection.stream())
         elif file_type == 'text/html':
-            return read_html(file_path)
+            yield html_to_text(str(inspection.buffer, 'utf-8'))
         elif file_type == 'text/markdown':
-            return read_markdown(file_path)
+            yield markdown_to_text(str(inspection.buffer, 'utf-8'))
         else:
             raise ValueError(f"Unsupported file type: {file_type}")
     except Exception as e:
         logger.error(f"Error reading file {file_path}: {str(e)}", exc_info=True)
         raise
 
+def iter_text_blocks(buffer: Any, block_size: int = READ_BLOCK_SIZE) -> Iterator[str]:
+    # Same decoding and newline handling as open(..., 'r', encoding='utf-8'), without copying the file
+    decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), translate=True)
+    with memoryview(buffer) as view:
+        for start in range(0, len(view), block_size):
+            block = decoder.decode(view[start:start + block_size])
+            if block:
+                yield block
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+def iter_pdf_pages(source: Union[Path, BinaryIO]) -> Iterator[str]:
+    reader = PyPDF2.PdfReader(source)
+    for i, page in enumerate(reader.pages):
+        yield page.extract_text() if i == 0 else ' ' + page.extract_text()
+
+def iter_docx_paragraphs(source: Union[Path, BinaryIO]) -> Iterator[str]:
+    doc = Document(source)
+    for i, paragraph in enumerate(doc.paragraphs):
+        yield paragraph.text if i == 0 else ' ' + paragraph.text
+
+def html_to_text(html: str) -> str:
+    return BeautifulSoup(html, 'html.parser').get_text()
+
+def markdown_to_text(md_text: str) -> str:
+    return html_to_text(markdown.markdown(md_text))
+
 def read_pdf(file_path: Path) -> str:
-    with open(file_path, 'rb') as file:
-        reader = PyPDF2.PdfReader(file)
-        return ' '.join(page.extract_text() for page in reader.pages)
+    return ''.join(iter_pdf_pages(file_path))
 
 def read_docx(file_path: Path) -> str:
-    doc = Document(file_path)
-    return ' '.join(paragraph.text for paragraph in doc.paragraphs)
+    return ''.join(iter_docx_paragraphs(file_path))
 
 def read_html(file_path: Path) -> str:
     with open(file_path, 'r', encoding='utf-8') as file:
-        soup = BeautifulSoup(file, 'html.parser')
-        return soup.get_text()
+        return html_to_text(file.read())
 
 def read_markdown(file_path: Path) -> str:
     with open(file_path, 'r', encoding='utf-8') as file:
-        md_text = file.read()
-        html = markdown.markdown(md_text)
-        return BeautifulSoup(html, 'html.parser').get_text()
+        return markdown_to_text(file.read())
 
 def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> List[str]:
+    if chunk_overlap >= chunk_size:
+        raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
 
     chunks = []
     start = 0
@@ -79,26 +229,59 @@ def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHU
 
     return chunks
 
-def get_file_metadata(file_path: Path) -> Dict[str, Any]:
+def iter_chunks(blocks: Iterable[str], chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> Iterator[str]:
+    """
+    Incrementally chunk a stream of text blocks.
+
+    Produces exactly the chunks that chunk_text would produce for the concatenated blocks,
+    including overlaps that span block boundaries, while only buffering about one chunk of text.
+    """
+    if chunk_overlap >= chunk_size:
+        raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+
+    step = chunk_size - chunk_overlap
+    buffer = ""
+    for block in blocks:
+        buffer += block
+        start = 0
+        while start + chunk_size <= len(buffer):
+            yield buffer[start:start + chunk_size]
+            start += step
+        buffer = buffer[start:]
+
+    start = 0
+    while start < len(buffer):
+        yield buffer[start:start + chunk_size]
+        start += step
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def get_file_metadata(file_path: Path, inspection: Optional[FileInspection] = None) -> Dict[str, Any]:
+
+    if inspection is None:
+        with inspect_file(file_path) as inspection:
+            return get_file_metadata(file_path, inspection)
 
-    stats = file_path.stat()
     return {
         "filename": file_path.name,
         "file_path": str(file_path),
-        "file_type": magic.from_file(str(file_path), mime=True),
-        "file_size": stats.st_size,
-        "created_at": stats.st_ctime,
-        "modified_at": stats.st_mtime,
-        "file_hash": get_file_hash(file_path)
+        "file_type": inspection.file_type,
+        "file_size": inspection.file_size,
+        "created_at": inspection.created_at,
+        "modified_at": inspection.modified_at,
+        "file_hash": inspection.file_hash
     }
 
 def get_file_hash(file_path: Path) -> str:
 
-    sha256_hash = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
-    return sha256_hash.hexdigest()
+    with inspect_file(file_path) as inspection:
+        return inspection.file_hash
 
 def clean_text(text: str) -> str:
 
@@ -128,3 +311,51 @@ def initialize_chroma_client():
                 logger.error("Max retries reached. Unable to initialize ChromaDB.", exc_info=True)
                 raise
 
+
+def initialize_vector_store() -> Any:
+    """Client of the configured VECTOR_STORE_TYPE: the persistent Chroma client, or the in-process flat store."""
+    if VECTOR_STORE_TYPE == "flat":
+        return get_flat_vector_store()
+    client, _ = initialize_chroma_client()
+    return client
+
+def hnsw_metadata() -> Dict[str, Any]:
+    """HNSW index settings for the language collections, as Chroma collection metadata."""
+    return {
+        "hnsw:space": HNSW_SPACE,
+        "hnsw:construction_ef": EF_CONSTRUCTION,
+        "hnsw:M": M_CONSTRUCTION,
+        "hnsw:search_ef": EF_SEARCH,
+    }
+
+def language_collection_name(lang: str) -> str:
+    return f"{CHROMA_COLLECTION_NAME}_{lang}"
+
+def get_language_collections(client: Any) -> Dict[str, Any]:
+    """
+    Get or create the collection of every supported language.
+
+    New collections are created with hnsw_metadata(). Existing ones keep their settings, since an HNSW index
+    cannot change its space or graph parameters in place; a mismatch is logged and fixed by running
+    `python -m backend.migrate_collections`.
+
+    Returns:
+        Dict[str, Any]: Collection per language.
+    """
+    expected = hnsw_metadata()
+    collections = {}
+    for lang in SUPPORTED_LANGUAGES:
+        name = language_collection_name(lang)
+        try:
+            collection = client.get_collection(name=name)
+        except ValueError:
+            collections[lang] = client.create_collection(name=name, metadata=expected)
+            logger.info(f"Created collection {name} with {expected}")
+            continue
+        current = collection.metadata or {}
+        outdated = {key: current.get(key) for key, value in expected.items() if current.get(key) != value}
+        if outdated:
+            logger.warning(f"Collection {name} has outdated HNSW settings {outdated}; "
+                           f"run `python -m backend.migrate_collections` to rebuild it with {expected}")
+        collections[lang] = collection
+    return collections
@@ -0,0 +1,94 @@
+"""
+Microbenchmark for the chunking strategies on large synthetic documents.
+
+Compares each strategy (boundaries precomputed once per text) with a naive splitter that rescans every
+chunk window with the structure strategy's boundary patterns, and reports throughput, chunk count and
+mean chunk length.
+
+Usage:
+    python -m benchmarks.chunking_benchmark --size-mb 20
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.chunking import get_chunker, STRATEGIES  # noqa: E402
+from config import CHUNK_SIZE, CHUNK_OVERLAP  # noqa: E402
+
+WORDS = ("retrieval augmented generation document embedding vector index query answer model chunk "
+         "sentence paragraph section token context window overlap boundary").split()
+
+
+def make_document(size: int, seed: int = 0) -> str:
+    """Markdown-like text with headings, paragraphs and sentences of varying length."""
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    while total < size:
+        section = [f"# Section {len(parts)}\n"]
+        for _ in range(rng.randint(2, 6)):
+            sentences = (" ".join(rng.choices(WORDS, k=rng.randint(5, 30))).capitalize() + "."
+                         for _ in range(rng.randint(2, 8)))
+            section.append(" ".join(sentences) + "\n\n")
+        parts.append("".join(section))
+        total += len(parts[-1])
+    return "".join(parts)[:size]
+
+
+# The structure strategy's boundary kinds, strongest first, as patterns matching the whitespace before a boundary
+NAIVE_BOUNDARIES = [re.compile(p) for p in (r"\n\s*(?=#)", r"\n[ \t]*\n\s*", r"\n\s*", r"(?<=[.!?])[\"')\]]*\s+", r"\s+")]
+
+
+def naive_structure_split(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+    """Per-chunk scanning baseline: rescan each window with every boundary pattern to find its end."""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            window = text[start:end + 1]
+            for pattern in NAIVE_BOUNDARIES:
+                cuts = [match.end() for match in pattern.finditer(window) if chunk_size // 2 < match.end() <= chunk_size]
+                if cuts:
+                    end = start + cuts[-1]
+                    break
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - chunk_overlap, start + 1)
+    return chunks
+
+
+def run(name: str, split, text: str, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = split(text)
+        best = min(best, time.perf_counter() - started)
+    megabytes = len(text) / 2**20
+    mean_length = sum(len(chunk) for chunk in chunks) / max(len(chunks), 1)
+    print(f"{name:<16} {best:8.3f} s {megabytes / best:8.1f} MB/s {len(chunks):>9} chunks {mean_length:8.1f} chars/chunk")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunking strategies")
+    parser.add_argument("--size-mb", type=float, default=20, help="Size of the synthetic document in MB")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per strategy; the best time is reported")
+    args = parser.parse_args()
+
+    text = make_document(int(args.size_mb * 2**20))
+    print(f"Document: {len(text) / 2**20:.1f} MB, chunk size {CHUNK_SIZE}, overlap {CHUNK_OVERLAP}")
+    run("naive-structure", naive_structure_split, text, args.repeat)
+    for name in STRATEGIES:
+        chunker = get_chunker(strategy=name)
+        run(name, lambda t: chunker.split(t)[0], text, args.repeat)
+        run(f"{name}-stream", lambda t: list(chunker.iter_chunks([t[i:i + 2**20] for i in range(0, len(t), 2**20)])), text, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
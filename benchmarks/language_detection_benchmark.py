@@ -0,0 +1,88 @@
+"""
+Microbenchmark for language detection of queries and document texts.
+
+Compares langdetect.detect (all 55 profiles, unseeded, full text) with LanguageDetector (supported languages
+only, fixed seed, sampled text), both cold and with its cache warm, and reports how often repeated runs of
+each disagree with themselves.
+
+Usage:
+    python -m benchmarks.language_detection_benchmark --queries 2000
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import langdetect  # noqa: E402
+
+from backend.language_detection import LanguageDetector  # noqa: E402
+
+SENTENCES = {
+    "en": ["What are the payment terms of the contract", "How do I reset my password",
+           "Summarize the quarterly report", "Which documents mention the budget"],
+    "fr": ["Quelles sont les conditions de paiement du contrat", "Comment réinitialiser mon mot de passe",
+           "Résume le rapport trimestriel", "Quels documents mentionnent le budget"],
+    "es": ["Cuáles son las condiciones de pago del contrato", "Cómo restablezco mi contraseña",
+           "Resume el informe trimestral", "Qué documentos mencionan el presupuesto"],
+}
+
+
+def make_texts(count: int, repeat_ratio: float, seed: int = 0):
+    """Short queries in the supported languages, a fraction of them repeated as real traffic would."""
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        if texts and rng.random() < repeat_ratio:
+            texts.append(rng.choice(texts))
+            continue
+        lang = rng.choice(list(SENTENCES))
+        texts.append(f"{rng.choice(SENTENCES[lang])} {i}?")
+    return texts
+
+
+def langdetect_detect(text: str) -> str:
+    try:
+        return langdetect.detect(text)
+    except langdetect.LangDetectException:
+        return "en"
+
+
+def run(name: str, detect, texts):
+    started = time.perf_counter()
+    results = [detect(text) for text in texts]
+    elapsed = time.perf_counter() - started
+    print(f"{name:<22} {elapsed:8.3f} s {len(texts) / elapsed:10.0f} texts/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark language detection")
+    parser.add_argument("--queries", type=int, default=2000, help="Number of queries to detect")
+    parser.add_argument("--repeat-ratio", type=float, default=0.3, help="Fraction of queries repeating an earlier one")
+    parser.add_argument("--document-kb", type=int, default=200, help="Size of the long document in KB")
+    args = parser.parse_args()
+
+    texts = make_texts(args.queries, args.repeat_ratio)
+    print(f"{len(texts)} queries, {len(set(texts))} distinct")
+    baseline = run("langdetect.detect", langdetect_detect, texts)
+    baseline_again = [langdetect_detect(text) for text in texts]
+
+    detector = LanguageDetector()
+    detected = run("LanguageDetector cold", detector.detect, texts)
+    run("LanguageDetector warm", detector.detect, texts)
+    detected_again = LanguageDetector().detect_batch(texts)
+
+    print(f"Self-disagreement: langdetect {sum(a != b for a, b in zip(baseline, baseline_again))}, "
+          f"LanguageDetector {sum(a != b for a, b in zip(detected, detected_again))}")
+    print(f"Agreement between detectors: {sum(a == b for a, b in zip(baseline, detected)) / len(texts):.1%}")
+
+    document = " ".join(make_texts(args.document_kb * 25, 0.0, seed=1))[:args.document_kb * 1024]
+    run("langdetect.detect doc", langdetect_detect, [document])
+    run("LanguageDetector doc", LanguageDetector().detect, [document])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Recall and latency benchmark for the flat vector store's quantized storage modes.
+
+Builds a flat collection per mode (none, int8, binary) from the same clustered synthetic embeddings, runs the
+same queries with several rescore factors, and reports recall@k against exact float32 search, query latency
+and the bytes scanned per vector.
+
+Usage:
+    python -m benchmarks.quantization_benchmark --vectors 200000 --dimension 768
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.flat_vector_store import FlatVectorStore  # noqa: E402
+
+SCAN_BYTES = {"none": lambda d: 4 * d, "int8": lambda d: d + 4, "binary": lambda d: (d + 7) // 8}
+
+
+def make_embeddings(count: int, centers: np.ndarray, seed: int = 0) -> np.ndarray:
+    """Normalized vectors scattered around topic centers, like embeddings of a document corpus."""
+    rng = np.random.default_rng(seed)
+    clusters, dimension = centers.shape
+    vectors = centers[rng.integers(0, clusters, count)] + rng.normal(scale=0.7, size=(count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build(directory: Path, quantization: str, embeddings: np.ndarray, batch_size: int = 10000):
+    collection = FlatVectorStore(directory / quantization, quantization=quantization).create_collection("bench")
+    for start in range(0, len(embeddings), batch_size):
+        batch = embeddings[start:start + batch_size]
+        collection.upsert(ids=[str(i) for i in range(start, start + len(batch))], embeddings=batch)
+    return collection
+
+
+def run(collection, queries: np.ndarray, k: int, truth: list, query_batch: int):
+    started = time.perf_counter()
+    found = []
+    for start in range(0, len(queries), query_batch):
+        found.extend(collection.query(query_embeddings=queries[start:start + query_batch], n_results=k, include=[])["ids"])
+    elapsed = time.perf_counter() - started
+    recall = np.mean([len(set(ids) & expected) / k for ids, expected in zip(found, truth)])
+    return recall, elapsed * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized flat vector search")
+    parser.add_argument("--vectors", type=int, default=200000, help="Number of stored vectors")
+    parser.add_argument("--dimension", type=int, default=768, help="Embedding dimension")
+    parser.add_argument("--clusters", type=int, default=1000, help="Topic clusters in the synthetic corpus")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--query-batch", type=int, default=1, help="Queries per query() call")
+    parser.add_argument("-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--rescore-factors", type=int, nargs="+", default=[1, 4, 10], help="Candidates per result to rescore")
+    args = parser.parse_args()
+
+    centers = np.random.default_rng(0).normal(size=(args.clusters, args.dimension)).astype(np.float32)
+    embeddings = make_embeddings(args.vectors, centers, seed=1)
+    queries = make_embeddings(args.queries, centers, seed=2)
+    exact = np.argsort(-(queries @ embeddings.T), axis=1)[:, :args.k]
+    truth = [{str(i) for i in row} for row in exact]
+
+    print(f"{args.vectors} vectors x {args.dimension} dims, {args.queries} queries, recall@{args.k} vs exact float32 search")
+    with tempfile.TemporaryDirectory() as directory:
+        for quantization in ("none", "int8", "binary"):
+            collection = build(Path(directory), quantization, embeddings)
+            for factor in ([1] if quantization == "none" else args.rescore_factors):
+                collection.rescore_factor = factor
+                recall, latency = run(collection, queries, args.k, truth, args.query_batch)
+                print(f"{quantization:<7} rescore x{factor:<3} recall {recall:.3f} {latency:8.2f} ms/query "
+                      f"{SCAN_BYTES[quantization](args.dimension):>5} B/vector scanned")
+
+
+if __name__ == "__main__":
+    main()
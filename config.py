@@ -1,5 +1,4 @@
 import os
-import torch
 from pathlib import Path
 import logging
 
@@ -22,8 +21,18 @@ OLLAMA_BASE_URL = "http://localhost:11434"
 
 # Embedding model configuration
 EMBEDDING_MODEL = "nomic-embed-text" 
-EMBEDDING_DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+try:
+    import torch  # Optional: only used to detect and free GPU memory
+    EMBEDDING_DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+except ImportError:
+    EMBEDDING_DEVICE = "cpu"
 EMBEDDING_DIMENSION = 768
+EMBEDDING_CONTEXT_TOKENS = 2048  # Ollama's default context window for the embedding model
+
+# Persistent embedding cache, keyed by (model, dimension, sha256 of chunk text)
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_PATH = PROCESSED_DATA_DIR / "embedding_cache.sqlite3"
+EMBEDDING_CACHE_MAX_ENTRIES = 500_000  # ~1.5 GB of 768-dim float32 vectors
 
 # LLM configuration for query processing
 LLM_MODEL = "llama3.2" 
@@ -32,19 +41,60 @@ TEMPERATURE = 0.7
 TOP_P = 0.9
 
 # Vector store configuration
-VECTOR_STORE_TYPE = "chroma" 
+VECTOR_STORE_TYPE = "chroma"  # chroma (HNSW), or flat for exact search over a memory-mapped matrix
+FLAT_INDEX_DIR = INDEX_DIR / "flat"
+FLAT_VECTOR_DTYPE = "float32"  # float16 halves the flat store's size at a small precision cost
+FLAT_BLOCK_ROWS = 16384  # Rows scored per matrix product when searching the flat store
+FLAT_QUANTIZATION = "none"  # none, int8 (4x smaller scan) or binary (32x smaller, Hamming distance) for new flat collections
+FLAT_RESCORE_FACTOR = 4  # Quantized scans keep this many candidates per result, reranked with full-precision vectors
 CHROMA_PERSIST_DIRECTORY = INDEX_DIR / "chroma"
 CHROMA_COLLECTION_NAME = "buildragwithpython"
 
 # Retrieval configuration
 TOP_K_RESULTS = 100
+HNSW_SPACE = "cosine"  # Distance of the language collections; similarity_score = 1 - distance
+RETRIEVAL_ROUTING = True  # Query the detected-language collection first and fan out only when needed
+ROUTING_MIN_SCORE = 0.5  # Fan out to the other collections when the best routed score is below this
 EF_CONSTRUCTION = 200 
 M_CONSTRUCTION = 16
+EF_SEARCH = 128  # Candidate list size at query time; higher improves recall at the cost of latency
+
+# Retrieval result cache, shared by API workers through SQLite and invalidated by every ingestion commit
+RETRIEVAL_CACHE_ENABLED = True
+RETRIEVAL_CACHE_PATH = PROCESSED_DATA_DIR / "retrieval_cache.sqlite3"
+RETRIEVAL_CACHE_SIZE = 1024  # Results kept in each process's memory
+RETRIEVAL_CACHE_SHARED_SIZE = 50_000  # Results kept in the shared SQLite table
+RETRIEVAL_CACHE_TTL = 300  # Seconds a cached result may be served
+
+# Semantic answer cache: paraphrased queries reuse a generated answer while its context chunks still exist
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_THRESHOLD = 0.95  # Minimum cosine similarity between the query embeddings
+ANSWER_CACHE_SIZE = 1000  # Answers kept in each process's memory
+ANSWER_CACHE_TTL = 3600  # Seconds a cached answer may be served
 
 
 # Ingestion configuration
+CHUNKING_STRATEGY = "auto"  # fixed, sentence, token, structure, cdc, or auto (structure for HTML/Markdown, sentence otherwise)
 CHUNK_SIZE = 1000
-CHUNK_OVERLAP = 200
+CHUNK_OVERLAP = 100  # Chunks end on sentence/paragraph boundaries, so less overlap is needed than with fixed windows
+CHUNK_TOKEN_BUDGET = 256  # Estimated tokens per chunk for the token strategy, capped by EMBEDDING_CONTEXT_TOKENS
+CHUNK_TOKEN_OVERLAP = 32
+CDC_MIN_SIZE = 256  # Content-defined chunking: smallest chunk, in characters (CHUNK_SIZE is the largest)
+CDC_AVG_SIZE = 640  # Content-defined chunking: target average chunk size, in characters
+DOCUMENT_REGISTRY_PATH = PROCESSED_DATA_DIR / "document_registry.sqlite3"
+READ_BLOCK_SIZE = 2**20  # Bytes decoded at a time when streaming plain text files
+MIME_SNIFF_BYTES = 2**20  # Leading bytes handed to libmagic (its own default read size)
+INGEST_WORKERS = os.cpu_count() or 1  # Parse/chunk worker processes for directory ingestion
+INGEST_STREAMING_THRESHOLD = 256 * 2**20  # Larger files are streamed in-process instead of parsed by a worker
+INGEST_QUEUE_SIZE = 8  # Chunk batches buffered between pipeline stages
+
+# Near-duplicate chunk elimination: duplicates reference a canonical chunk instead of being embedded and stored
+DEDUP_ENABLED = True
+DEDUP_INDEX_PATH = PROCESSED_DATA_DIR / "dedup_index.sqlite3"
+DEDUP_THRESHOLD = 0.95  # Minimum estimated Jaccard similarity of word shingles to count as a duplicate
+DEDUP_NUM_PERM = 128  # MinHash permutations per chunk
+DEDUP_BANDS = 16  # LSH bands (of DEDUP_NUM_PERM // DEDUP_BANDS rows each) used to find candidates
+DEDUP_SHINGLE_SIZE = 3  # Words per shingle
 
 # Frontend configuration
 FRONTEND_HOST = "localhost"
@@ -79,6 +129,11 @@ SUPPORTED_FILE_TYPES = [
 # Performance tuning
 MAX_CONCURRENT_REQUESTS = 10
 BATCH_SIZE = 128
+EMBEDDING_BATCH_SIZE = 32  # Texts sent per request to Ollama's embed endpoint
+SINK_MAX_BATCH_SIZE = 1024  # Chunks per group commit to the vector store
+SINK_MAX_DELAY = 0.25  # Seconds a pending write may wait for others to join its group commit
+SINK_QUEUE_SIZE = 64  # Batches queued for the sink before submitters block
+RETRIEVAL_WORKERS = 8  # Threads shared by all requests for concurrent per-collection queries
 
 # Error handling and retry configuration
 MAX_RETRIES = 3
@@ -105,3 +160,9 @@ API_BASE_URL = "http://localhost:5004"
 
 # Supported languages configuration
 SUPPORTED_LANGUAGES = ['en', 'fr', 'es']
+
+# Language detection (restricted to SUPPORTED_LANGUAGES)
+LANGUAGE_DETECTION_SEED = 0  # Fixed seed so the same text always gets the same language
+LANGUAGE_SAMPLE_SIZE = 2000  # Characters sampled, spread evenly over long texts
+LANGUAGE_CACHE_SIZE = 10000  # Detection results kept in memory, least recently used evicted
+LANGUAGE_MIN_CONFIDENCE = 0.8  # Chunks detected with lower probability are stored under their document's language
@@ -0,0 +1,19 @@
+import json
+from typing import Any, Dict, Iterator, Tuple
+
+import requests
+
+
+def iter_sse_events(response: requests.Response) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yields (event, data) pairs from a streamed Server-Sent Events response."""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line:
+            field, _, value = line.partition(":")
+            if field == "event":
+                event = value.strip()
+            elif field == "data":
+                data_lines.append(value[1:] if value.startswith(" ") else value)
+        elif data_lines:
+            yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
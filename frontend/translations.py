@@ -104,6 +104,7 @@ TRANSLATIONS = {
         "no_ingested_files": "No files ingested yet.",
         "select_model": "Select Model",
         "no_models_available": "No models available. Please ensure Ollama is running.",
+        "generating_response": "{} relevant passages retrieved. Generating response...",
     },
     "fr": {
         "menu": "Menu",
@@ -209,6 +210,7 @@ TRANSLATIONS = {
         "no_ingested_files": "Aucun fichier ingéré pour le moment.",
         "select_model": "Sélectionner le modèle",
         "no_models_available": "Aucun modèle disponible. Veuillez vous assurer qu'Ollama est en cours d'exécution.",
+        "generating_response": "{} passages pertinents trouvés. Génération de la réponse...",
     },
     "es": {
         "menu": "Menú",
@@ -315,6 +317,7 @@ TRANSLATIONS = {
         "no_ingested_files": "No files ingested yet.",
         "select_model": "Seleccionar modelo",
         "no_models_available": "No hay modelos disponibles. Asegúrese de que Ollama esté ejecutándose.",
+        "generating_response": "{} fragmentos relevantes encontrados. Generando respuesta...",
     }
 }
 
@@ -1,12 +1,17 @@
 import os
+import atexit
+import argparse
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
-from config import SUPPORTED_FILE_TYPES, LLM_MODEL
+from config import SUPPORTED_FILE_TYPES, LLM_MODEL, INGEST_WORKERS, RETRIEVAL_CACHE_ENABLED, ANSWER_CACHE_ENABLED
 from backend.embedding_component import EmbeddingComponent
 from backend.ingest_component import IngestComponent
 from backend.retrieval_component import RetrievalComponent
 from backend.query_component import QueryComponent
+from backend.language_detection import LanguageDetector
+from backend.retrieval_cache import IndexGeneration, RetrievalCache
+from backend.answer_cache import AnswerCache
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -19,23 +24,40 @@ class RAGApplication:
     def __init__(self):
         logger.info("Initializing RAG Application")
         self.embedding_component = EmbeddingComponent()
-        self.ingest_component = IngestComponent(self.embedding_component)
-        self.retrieval_component = RetrievalComponent(self.embedding_component)
-        self.query_component = QueryComponent(self.embedding_component, self.retrieval_component)
-
-    def ingest_document(self, file_path: str):
+        # One detector shared by ingestion and retrieval, so queries and documents are detected the same way
+        self.language_detector = LanguageDetector()
+        # Ingestion commits bump the generation that retrieval and answer cache entries are checked against
+        self.index_generation = IndexGeneration()
+        self.ingest_component = IngestComponent(self.embedding_component, language_detector=self.language_detector,
+                                                 generation=self.index_generation)
+        self.retrieval_component = RetrievalComponent(
+            self.embedding_component, language_detector=self.language_detector,
+            cache=RetrievalCache(generation=self.index_generation) if RETRIEVAL_CACHE_ENABLED else None
+        )
+        self.query_component = QueryComponent(
+            self.embedding_component, self.retrieval_component,
+            answer_cache=AnswerCache(generation=self.index_generation) if ANSWER_CACHE_ENABLED else None
+        )
+        # Pending sink writes are flushed on interpreter exit, before daemon threads are stopped
+        atexit.register(self.close)
+
+    def close(self):
+        """Flush pending ingestion writes and stop the sink's writer thread."""
+        self.ingest_component.close()
+
+    def ingest_document(self, file_path: str, source: Optional[str] = None):
         """Handles document ingestion."""
         try:
-            self.ingest_component.ingest_file(file_path)
+            self.ingest_component.ingest_file(file_path, source=source)
             logger.info(f"File ingested successfully: {file_path}")
         except Exception as e:
             logger.error(f"Error ingesting document: {str(e)}", exc_info=True)
             raise Exception(f"Error ingesting document: {str(e)}")
 
-    def ingest_directory(self, directory_path: str) -> List[Dict[str, Any]]:
+    def ingest_directory(self, directory_path: str, workers: int = INGEST_WORKERS) -> List[Dict[str, Any]]:
         """Handles batch ingestion of documents in a directory."""
         logger.info(f"Ingesting documents from directory: {directory_path}")
-        return self.ingest_component.ingest_directory(directory_path)
+        return self.ingest_component.ingest_directory(directory_path, workers=workers)
 
     def process_query(self, query: str) -> Dict[str, Any]:
         """Processes a user query and retrieves relevant information."""
@@ -67,6 +89,14 @@ class RAGApplication:
             "embedding_model": self.embedding_component.model,
             "llm_model": LLM_MODEL,
             "supported_file_types": SUPPORTED_FILE_TYPES,
+            **self.embedding_component.get_cache_stats(),
+            **self.ingest_component.sink.get_stats(),
+            **self.language_detector.get_stats(),
+            **self.retrieval_component.get_routing_stats(),
+            **(self.retrieval_component.cache.get_stats() if self.retrieval_component.cache is not None else {}),
+            **self.query_component.single_flight.get_stats(),
+            **(self.query_component.answer_cache.get_stats() if self.query_component.answer_cache is not None else {}),
+            **(self.ingest_component.dedup.get_stats() if self.ingest_component.dedup is not None else {}),
         }
 
 def print_menu():
@@ -79,7 +109,18 @@ def print_menu():
     print("5. Get system statistics")
     print("6. Exit")
 
-def main():
+def print_ingest_summary(summary: Dict[str, Any]):
+    """Prints the report of a directory ingestion."""
+    print(f"Files: {summary['files']} | ingested: {summary['ingested']} | updated: {summary['updated']} | "
+          f"unchanged: {summary['unchanged']} | failed: {summary['failed']}")
+    print(f"Chunks: {summary['chunks']} in {summary['elapsed_seconds']}s | duplicates: {summary['duplicate_chunks']} "
+          f"(dedup ratio {summary['dedup_ratio']:.1%})")
+    for stage, stats in summary["stages"].items():
+        print(f"  {stage}: {stats['chunks']} chunks, {stats['chunks_per_second']} chunks/s")
+    for failure in summary["failures"]:
+        print(f"  FAILED {failure['file']}: {failure['error']}")
+
+def main(rag_app: RAGApplication, workers: int = INGEST_WORKERS):
 
     while True:
         print_menu()
@@ -97,8 +138,9 @@ def main():
         elif choice == '2':
             dir_path = input("Enter the path to the directory: ")
             try:
-                results = rag_app.ingest_directory(dir_path)
+                results = rag_app.ingest_directory(dir_path, workers=workers)
                 print(f"Ingested {len(results)} documents")
+                print_ingest_summary(rag_app.ingest_component.last_ingest_summary)
             except Exception as e:
                 logger.error(f"Error ingesting directory: {e}", exc_info=True)
                 print(f"Error ingesting directory: {str(e)}")
@@ -133,4 +175,16 @@ def main():
         else:
             print("Invalid choice. Please try again.")
 
-rag_app = RAGApplication()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ScriptumAI RAG application")
+    parser.add_argument("--ingest-dir", help="Ingest every supported file in this directory and exit")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS,
+                        help=f"Worker processes for text extraction and chunking (default: {INGEST_WORKERS})")
+    args = parser.parse_args()
+
+    rag_app = RAGApplication()
+    if args.ingest_dir:
+        rag_app.ingest_directory(args.ingest_dir, workers=args.workers)
+        print_ingest_summary(rag_app.ingest_component.last_ingest_summary)
+    else:
+        main(rag_app, args.workers)
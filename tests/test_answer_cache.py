@@ -0,0 +1,149 @@
+import pytest
+import numpy as np
+from unittest.mock import Mock, patch
+from backend.answer_cache import AnswerCache
+from backend.query_component import QueryComponent, GENERATION_ERROR_RESPONSE
+from backend.query_plan import QueryPlan
+from backend.retrieval_cache import IndexGeneration
+from backend.ingest_component import IngestComponent
+from backend.embedding_component import EmbeddingComponent
+from backend.document_registry import DocumentRegistry
+from backend.dedup import ChunkDeduplicator
+
+CHUNKS = [
+    {"chunk_id": "doc_a", "chunk": "Refunds are issued within 14 days.", "metadata": {"source": "faq.txt"}, "language": "en", "similarity_score": 0.9},
+    {"chunk_id": "doc_b", "chunk": "Contact support to request a refund.", "metadata": {"source": "faq.txt"}, "language": "en", "similarity_score": 0.8},
+]
+
+def stored_chunks(chunk_ids):
+    by_id = {chunk["chunk_id"]: {key: value for key, value in chunk.items() if key != "similarity_score"} for chunk in CHUNKS}
+    return [by_id[chunk_id] for chunk_id in chunk_ids if chunk_id in by_id]
+
+def embedding(*values):
+    return np.array(values, dtype=np.float32)
+
+@pytest.fixture
+def generation(tmp_path):
+    return IndexGeneration(tmp_path / "cache.sqlite3")
+
+@pytest.fixture
+def cache(generation):
+    return AnswerCache(threshold=0.95, max_entries=2, ttl=60, generation=generation)
+
+def test_paraphrase_within_threshold_is_served(cache):
+    cache.store(embedding(1, 0, 0), "llama", "en", "How do refunds work?", "Within 14 days.", CHUNKS)
+
+    cached = cache.lookup(embedding(0.98, 0.1, 0), "llama", "en", stored_chunks)
+
+    assert cached["response"] == "Within 14 days."
+    assert [chunk["chunk_id"] for chunk in cached["relevant_chunks"]] == ["doc_a", "doc_b"]
+    assert cached["relevant_chunks"][0]["similarity_score"] == 0.9
+    assert cache.get_stats()["answer_cache_hits"] == 1
+
+def test_dissimilar_query_or_other_model_or_language_misses(cache):
+    cache.store(embedding(1, 0, 0), "llama", "en", "How do refunds work?", "Within 14 days.", CHUNKS)
+
+    assert cache.lookup(embedding(0, 1, 0), "llama", "en", stored_chunks) is None
+    assert cache.lookup(embedding(1, 0, 0), "mistral", "en", stored_chunks) is None
+    assert cache.lookup(embedding(1, 0, 0), "llama", "fr", stored_chunks) is None
+    assert cache.get_stats()["answer_cache_misses"] == 3
+
+def test_entry_is_dropped_when_a_context_chunk_changed(cache):
+    cache.store(embedding(1, 0, 0), "llama", "en", "How do refunds work?", "Within 14 days.", CHUNKS)
+    fetch = Mock(return_value=stored_chunks(["doc_a"]))
+
+    assert cache.lookup(embedding(1, 0, 0), "llama", "en", fetch) is None
+    assert cache.lookup(embedding(1, 0, 0), "llama", "en", fetch) is None
+    fetch.assert_called_once_with(["doc_a", "doc_b"])
+    assert cache.get_stats()["answer_cache_invalidations"] == 1
+
+def test_expired_entries_are_not_served(generation):
+    cache = AnswerCache(threshold=0.95, max_entries=2, ttl=0, generation=generation)
+    cache.store(embedding(1, 0, 0), "llama", "en", "How do refunds work?", "Within 14 days.", CHUNKS)
+
+    assert cache.lookup(embedding(1, 0, 0), "llama", "en", stored_chunks) is None
+    assert cache.get_stats()["answer_cache_entries"] == 0
+
+def test_answer_generated_before_an_index_change_is_not_served(cache, generation):
+    before = generation.current()
+    generation.bump()
+    cache.store(embedding(1, 0, 0), "llama", "en", "How do refunds work?", "Within 14 days.", CHUNKS, generation=before)
+
+    assert cache.lookup(embedding(1, 0, 0), "llama", "en", stored_chunks) is None
+    assert cache.get_stats()["answer_cache_invalidations"] == 1
+
+def test_ingesting_new_content_invalidates_cached_answers(cache, generation, tmp_path):
+    cache.store(embedding(1, 0, 0), "llama", "en", "How do refunds work?", "Within 14 days.", CHUNKS)
+    assert cache.lookup(embedding(1, 0, 0), "llama", "en", stored_chunks) is not None
+
+    with patch('chromadb.PersistentClient') as mock_client:
+        mock_client.return_value.get_collection.return_value = Mock()
+        embedding_component = Mock(spec=EmbeddingComponent)
+        embedding_component.get_embedding_dim.return_value = 3
+        embedding_component.embed_documents.side_effect = lambda texts: np.zeros((len(texts), 3), dtype=np.float32)
+        ingest_component = IngestComponent(embedding_component, registry=DocumentRegistry(tmp_path / "registry.sqlite3"),
+                                           dedup=ChunkDeduplicator(tmp_path / "dedup.sqlite3"), generation=generation)
+    path = tmp_path / "refund_policy.txt"
+    path.write_text("Refunds for annual plans are now issued within 30 days.")
+    assert ingest_component.ingest_file(str(path))["status"] == "success"
+    ingest_component.close()
+
+    assert cache.lookup(embedding(1, 0, 0), "llama", "en", stored_chunks) is None
+
+def test_least_recently_used_entry_is_replaced(cache):
+    cache.store(embedding(1, 0, 0), "llama", "en", "first", "A", CHUNKS)
+    cache.store(embedding(0, 1, 0), "llama", "en", "second", "B", CHUNKS)
+    cache.lookup(embedding(1, 0, 0), "llama", "en", stored_chunks)
+    cache.store(embedding(0, 0, 1), "llama", "en", "third", "C", CHUNKS)
+
+    assert cache.lookup(embedding(1, 0, 0), "llama", "en", stored_chunks)["response"] == "A"
+    assert cache.lookup(embedding(0, 1, 0), "llama", "en", stored_chunks) is None
+    assert cache.lookup(embedding(0, 0, 1), "llama", "en", stored_chunks)["response"] == "C"
+
+@pytest.fixture
+def retrieval_component():
+    embedding_component = Mock()
+    embedding_component.embed_query.side_effect = lambda query: embedding(1, 0, 0) if "refund" in query.lower() else embedding(0, 1, 0)
+    language_detector = Mock()
+    language_detector.detect.return_value = "en"
+    mock = Mock()
+    mock.plan.side_effect = lambda query: QueryPlan(query, embedding_component, language_detector)
+    mock.retrieve_plan.return_value = CHUNKS
+    mock.retrieve_by_id.side_effect = stored_chunks
+    return mock
+
+@patch('backend.query_component.ollama.Client')
+def test_process_query_reuses_answer_for_paraphrase(mock_ollama_client, retrieval_component, cache):
+    generate = mock_ollama_client.return_value.generate
+    generate.return_value = {"response": "Within 14 days."}
+    query_component = QueryComponent(Mock(), retrieval_component, answer_cache=cache)
+
+    first = query_component.process_query("How do refunds work?")
+    second = query_component.process_query("What is the refund process?")
+
+    assert first["cached"] is False and second["cached"] is True
+    assert second["response"] == "Within 14 days."
+    assert "answer_cache" in second["timings"] and "generate" not in second["timings"]
+    generate.assert_called_once()
+    retrieval_component.retrieve_plan.assert_called_once()
+
+@patch('backend.query_component.ollama.Client')
+def test_lookup_failure_falls_back_to_retrieval(mock_ollama_client, retrieval_component, cache):
+    mock_ollama_client.return_value.generate.return_value = {"response": "Within 14 days."}
+    query_component = QueryComponent(Mock(), retrieval_component, answer_cache=cache)
+    query_component.process_query("How do refunds work?")
+    retrieval_component.retrieve_by_id.side_effect = Exception("collection unavailable")
+
+    result = query_component.process_query("What is the refund process?")
+
+    assert result["error"] is None and result["cached"] is False
+    assert result["response"] == "Within 14 days."
+    assert retrieval_component.retrieve_plan.call_count == 2
+
+@patch('backend.query_component.ollama.Client')
+def test_failed_generation_is_not_cached(mock_ollama_client, retrieval_component, cache):
+    mock_ollama_client.return_value.generate.side_effect = Exception("Ollama unavailable")
+    query_component = QueryComponent(Mock(), retrieval_component, answer_cache=cache)
+
+    assert query_component.process_query("How do refunds work?")["response"] == GENERATION_ERROR_RESPONSE
+    assert cache.get_stats()["answer_cache_entries"] == 0
@@ -0,0 +1,72 @@
+import pytest
+from backend.chunking import get_chunker, ContentDefinedStrategy, FixedStrategy, SentenceStrategy, StructureStrategy, TokenStrategy, count_tokens
+from backend.utils import chunk_text
+from config import EMBEDDING_CONTEXT_TOKENS
+
+SENTENCES = " ".join(f"Sentence number {i} talks about topic {i % 7}." for i in range(400))
+
+def test_chunk_text_rejects_overlap_not_smaller_than_size():
+    with pytest.raises(ValueError):
+        chunk_text("text", chunk_size=10, chunk_overlap=10)
+
+def test_fixed_strategy_matches_chunk_text():
+    chunker = FixedStrategy(chunk_size=100, chunk_overlap=20)
+    blocks = [SENTENCES[i:i + 333] for i in range(0, len(SENTENCES), 333)]
+    assert chunker.split(SENTENCES)[0] == chunk_text(SENTENCES, 100, 20)
+    assert list(chunker.iter_chunks(blocks)) == chunk_text(SENTENCES, 100, 20)
+
+def test_sentence_strategy_keeps_sentences_whole():
+    chunks, _ = SentenceStrategy(chunk_size=200, chunk_overlap=0).split(SENTENCES)
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert all(chunk.startswith("Sentence") and chunk.endswith(".") for chunk in chunks)
+    assert " ".join(chunks) == SENTENCES
+
+def test_overlap_starts_on_a_word():
+    chunks, _ = SentenceStrategy(chunk_size=200, chunk_overlap=30).split(SENTENCES)
+    words = set(SENTENCES.split())
+    assert all(chunk.split()[0] in words for chunk in chunks)
+
+def test_structure_strategy_prefers_sections():
+    text = "# Intro\nShort intro.\n\n# Usage\n" + "Run the tool. " * 12 + "\n\n# Notes\nDone."
+    chunks, _ = StructureStrategy(chunk_size=200, chunk_overlap=0).split(text)
+    assert chunks[0] == "# Intro\nShort intro.\n\n# Usage\n" + ("Run the tool. " * 12).strip()
+    assert chunks[1] == "# Notes\nDone."
+
+def test_token_strategy_respects_token_budget():
+    chunker = TokenStrategy(chunk_size=50, chunk_overlap=5)
+    chunks, _ = chunker.split(SENTENCES)
+    assert all(count_tokens(chunk) <= 50 for chunk in chunks)
+    assert TokenStrategy(chunk_size=10**6, chunk_overlap=0).chunk_size == EMBEDDING_CONTEXT_TOKENS
+
+def test_long_word_is_cut_at_the_limit():
+    chunks, _ = SentenceStrategy(chunk_size=100, chunk_overlap=10).split("x" * 250)
+    assert [len(chunk) for chunk in chunks] == [100, 100, 70]
+
+def test_streaming_matches_whole_text():
+    chunker = SentenceStrategy(chunk_size=120, chunk_overlap=20)
+    text = SENTENCES * 5
+    blocks = [text[i:i + 1000] for i in range(0, len(text), 1000)]
+    assert list(chunker.iter_chunks(blocks)) == chunker.split(text)[0]
+
+def test_content_defined_chunks_survive_an_edit():
+    chunker = ContentDefinedStrategy(chunk_size=400, min_size=100, avg_size=250)
+    before, _ = chunker.split(SENTENCES)
+    edited = SENTENCES[:5000] + "an inserted typo " + SENTENCES[5000:]
+    after, _ = chunker.split(edited)
+    # Chunks are cut at word starts, so the separating space is stripped from the min_size prefix
+    assert all(99 <= len(chunk) <= 400 for chunk in before[:-1])
+    assert len(set(after) - set(before)) <= 2
+    assert list(chunker.iter_chunks([SENTENCES[i:i + 3000] for i in range(0, len(SENTENCES), 3000)])) == before
+
+def test_content_defined_chunking_validates_sizes():
+    with pytest.raises(ValueError):
+        ContentDefinedStrategy(chunk_size=400, min_size=300, avg_size=250)
+
+def test_get_chunker():
+    assert isinstance(get_chunker("text/markdown", strategy="auto"), StructureStrategy)
+    assert isinstance(get_chunker("text/plain", strategy="auto"), SentenceStrategy)
+    assert isinstance(get_chunker(strategy="fixed", chunk_size=10, chunk_overlap=2), FixedStrategy)
+    with pytest.raises(ValueError):
+        get_chunker(strategy="unknown")
+    with pytest.raises(ValueError):
+        get_chunker(strategy="sentence", chunk_size=10, chunk_overlap=10)
@@ -0,0 +1,55 @@
+import pytest
+from backend.dedup import ChunkDeduplicator, MinHasher
+
+BOILERPLATE = ("This email and any attachments are confidential and intended solely for the addressee. "
+               "If you have received it in error, please notify the sender and delete it from your system. ")
+
+@pytest.fixture
+def dedup(tmp_path):
+    return ChunkDeduplicator(tmp_path / "dedup.sqlite3", threshold=0.8)
+
+def test_minhash_estimates_similarity():
+    hasher = MinHasher()
+    a = hasher.signature("the quick brown fox jumps over the lazy dog " * 5)
+    b = hasher.signature("the quick brown fox jumps over the lazy dog " * 5 + "again")
+    c = hasher.signature("completely different words about vector databases and embeddings")
+    assert (a == b).mean() > 0.8
+    assert (a == c).mean() < 0.2
+
+def test_exact_duplicate_after_normalization_references_canonical(dedup):
+    assert dedup.assign("doc1", ["doc1_a"], [BOILERPLATE]) == [None]
+    dedup.commit("doc1")
+    assert dedup.assign("doc2", ["doc2_a"], ["  " + BOILERPLATE.upper()]) == ["doc1_a"]
+    assert dedup.get_stats()["dedup_references"] == 1
+
+def test_near_duplicate_references_canonical(dedup):
+    dedup.assign("doc1", ["doc1_a"], [BOILERPLATE * 3])
+    dedup.commit("doc1")
+    assert dedup.assign("doc2", ["doc2_a"], [BOILERPLATE * 3 + "Thanks."]) == ["doc1_a"]
+    assert dedup.assign("doc2", ["doc2_b"], ["An unrelated paragraph about quarterly results."]) == [None]
+
+def test_uncommitted_chunks_are_not_shared_across_documents(dedup):
+    dedup.assign("doc1", ["doc1_a"], [BOILERPLATE])
+    assert dedup.assign("doc2", ["doc2_a"], [BOILERPLATE]) == [None]
+    # Within a document, pending canonical chunks are matched
+    assert dedup.assign("doc1", ["doc1_b"], [BOILERPLATE]) == ["doc1_a"]
+
+def test_referenced_canonical_is_kept_until_last_reference_is_released(dedup):
+    dedup.assign("doc1", ["doc1_a"], [BOILERPLATE])
+    dedup.commit("doc1")
+    dedup.assign("doc2", ["doc2_a"], [BOILERPLATE])
+    dedup.commit("doc2")
+
+    assert dedup.release(["doc1_a"]) == []
+    assert dedup.release(["doc2_a"]) == ["doc1_a"]
+    assert dedup.get_stats()["dedup_canonical_chunks"] == 0
+
+def test_discard_drops_pending_entries(dedup):
+    dedup.assign("doc1", ["doc1_a"], [BOILERPLATE])
+    dedup.commit("doc1")
+    dedup.assign("doc2", ["doc2_a", "doc2_b"], [BOILERPLATE, "Pending canonical text of the second document."])
+
+    assert dedup.discard("doc2") == []
+    assert dedup.get_stats() == {"dedup_canonical_chunks": 1, "dedup_references": 0, "dedup_ratio": 0.0}
+    # With its last reference gone, the released canonical chunk can be deleted right away
+    assert dedup.release(["doc1_a"]) == ["doc1_a"]
@@ -1,7 +1,8 @@
 import pytest
-import torch
+import numpy as np
 from unittest.mock import Mock, patch
 from backend.embedding_component import EmbeddingComponent
+from backend.embedding_cache import EmbeddingCache
 
 @pytest.fixture
 def mock_ollama_client():
@@ -13,12 +14,17 @@ def mock_ollama_client():
                 {'embedding': [0.4, 0.5, 0.6]}
             ]
         }
+        mock_instance.embed.side_effect = lambda model, input: {
+            'embeddings': [[0.1, 0.2, 0.3] for _ in input]
+        }
         mock_client.return_value = mock_instance
         yield mock_client
 
 @pytest.fixture
-def embedding_component(mock_ollama_client):
-    return EmbeddingComponent()
+def embedding_component(mock_ollama_client, tmp_path):
+    component = EmbeddingComponent(cache=EmbeddingCache(tmp_path / "embedding_cache.sqlite3"))
+    component.dimension = 3  # Match the mocked model output
+    return component
 
 def test_embedding_component_initialization(embedding_component):
     assert embedding_component is not None
@@ -28,25 +34,73 @@ def test_embedding_component_initialization(embedding_component):
 def test_embed_query(embedding_component):
     query = "What is RAG?"
     embedding = embedding_component.embed_query(query)
-    assert isinstance(embedding, torch.Tensor)
-    assert embedding.dim() == 1  # Should be a 1D tensor
+    assert isinstance(embedding, np.ndarray)
+    assert embedding.ndim == 1  # Should be a 1D array
     assert embedding.shape[0] == 3  # Based on our mock data
 
 def test_embed_documents(embedding_component):
     documents = ["This is document 1.", "This is document 2."]
     embeddings = embedding_component.embed_documents(documents)
-    assert isinstance(embeddings, torch.Tensor)
-    assert embeddings.dim() == 2  # Should be a 2D tensor
+    assert isinstance(embeddings, np.ndarray)
+    assert embeddings.dtype == np.float32
+    assert embeddings.flags['C_CONTIGUOUS']
+    assert embeddings.ndim == 2  # Should be a 2D array
     assert embeddings.shape == (2, 3)  # 2 documents, 3-dimensional embeddings
 
+def test_embed_documents_uses_batched_endpoint(embedding_component):
+    documents = [f"This is document {i}." for i in range(5)]
+    embedding_component.batch_size = 2
+    embedding_component.embed_documents(documents)
+    assert embedding_component.client.embed.call_count == 3
+    embedding_component.client.embeddings.assert_not_called()
+
+def test_embed_documents_falls_back_without_batch_support(embedding_component):
+    embedding_component.client.embed.side_effect = AttributeError("embed")
+    embedding_component.client.embeddings.return_value = {'embedding': [0.1, 0.2, 0.3]}
+    embeddings = embedding_component.embed_documents(["doc 1", "doc 2"])
+    assert embeddings.shape[0] == 2
+    assert embedding_component.supports_batch is False
+    assert embedding_component.client.embeddings.call_count == 2
+
+def test_embed_documents_reuses_cached_embeddings(embedding_component):
+    documents = ["cached document", "another document"]
+    embedding_component.embed_documents(documents)
+    embedding_component.client.embed.reset_mock()
+    embeddings = embedding_component.embed_documents(documents)
+    assert embeddings.shape == (2, 3)
+    embedding_component.client.embed.assert_not_called()
+    assert embedding_component.get_cache_stats()["embedding_cache_hits"] == 2
+
+def test_concurrent_batches_preserve_order(embedding_component):
+    embedding_component.client.embed.side_effect = lambda model, input: {
+        'embeddings': [[float(text.split()[-1]), 0.0, 0.0] for text in input]
+    }
+    embedding_component.batch_size = 2
+    documents = [f"document {i}" for i in range(9)]
+    embeddings = embedding_component.embed_documents(documents)
+    assert embeddings[:, 0].tolist() == list(range(9))
+
+@patch('backend.embedding_component.time.sleep')
+def test_failed_batch_is_retried_per_item(mock_sleep, embedding_component):
+    embedding_component.client.embed.side_effect = Exception("Batch failed")
+    embedding_component.client.embeddings.side_effect = [
+        Exception("Transient error"),
+        {'embedding': [0.1, 0.2, 0.3]},
+        {'embedding': [0.4, 0.5, 0.6]},
+    ]
+    embeddings = embedding_component.embed_documents(["doc 1", "doc 2"])
+    assert embeddings.shape == (2, 3)
+    assert embedding_component.client.embeddings.call_count == 3
+    mock_sleep.assert_called_once()
+
 def test_cosine_similarity(embedding_component):
-    vec1 = torch.tensor([1.0, 0.0, 0.0])
-    vec2 = torch.tensor([0.0, 1.0, 0.0])
+    vec1 = np.array([1.0, 0.0, 0.0])
+    vec2 = np.array([0.0, 1.0, 0.0])
     similarity = embedding_component.cosine_similarity(vec1, vec2)
-    assert isinstance(similarity, torch.Tensor)
+    assert isinstance(similarity, np.floating)
     assert similarity.item() == pytest.approx(0.0)  # Orthogonal vectors should have similarity 0
 
-    vec3 = torch.tensor([1.0, 0.0, 0.0])
+    vec3 = np.array([1.0, 0.0, 0.0])
     similarity = embedding_component.cosine_similarity(vec1, vec3)
     assert similarity.item() == pytest.approx(1.0)  # Identical vectors should have similarity 1
 
@@ -0,0 +1,36 @@
+import pytest
+import numpy as np
+from backend.embedding_cache import EmbeddingCache
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(tmp_path / "embedding_cache.sqlite3", max_entries=3)
+
+def test_miss_then_hit(cache):
+    assert cache.get_many("model", 3, ["hello"]) == [None]
+    cache.put_many("model", 3, ["hello"], [[0.1, 0.2, 0.3]])
+    result = cache.get_many("model", 3, ["hello"])[0]
+    assert result.dtype == np.float32
+    assert np.allclose(result, [0.1, 0.2, 0.3])
+    stats = cache.get_stats()
+    assert stats["embedding_cache_hits"] == 1
+    assert stats["embedding_cache_misses"] == 1
+
+def test_key_includes_model_and_dimension(cache):
+    cache.put_many("model", 3, ["hello"], [[0.1, 0.2, 0.3]])
+    assert cache.get_many("other-model", 3, ["hello"]) == [None]
+    assert cache.get_many("model", 4, ["hello"]) == [None]
+
+def test_lru_eviction(cache):
+    cache.put_many("model", 1, ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+    cache.get_many("model", 1, ["a"])  # "b" is now the least recently used entry
+    cache.put_many("model", 1, ["d"], [[4.0]])
+    results = cache.get_many("model", 1, ["a", "b", "c", "d"])
+    assert results[1] is None
+    assert all(r is not None for i, r in enumerate(results) if i != 1)
+    assert cache.get_stats()["embedding_cache_entries"] == 3
+
+def test_persistence(tmp_path):
+    path = tmp_path / "embedding_cache.sqlite3"
+    EmbeddingCache(path).put_many("model", 2, ["persist"], [[1.0, 2.0]])
+    assert EmbeddingCache(path).get_many("model", 2, ["persist"])[0] is not None
@@ -0,0 +1,145 @@
+import multiprocessing
+import pytest
+import numpy as np
+from backend.flat_vector_store import FlatVectorStore
+
+@pytest.fixture
+def store(tmp_path):
+    return FlatVectorStore(tmp_path / "flat")
+
+@pytest.fixture
+def embeddings():
+    return np.random.default_rng(0).normal(size=(3000, 16)).astype(np.float32)
+
+def fill(collection, embeddings):
+    ids = [f"chunk_{i}" for i in range(len(embeddings))]
+    collection.upsert(ids=ids, embeddings=embeddings.tolist(), documents=[f"text {i}" for i in ids],
+                      metadatas=[{"chunk_index": i} for i in range(len(ids))])
+    return ids
+
+def exact_top_k(embeddings, query, k):
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:k].tolist()
+
+def test_query_returns_exact_top_k_for_batched_queries(store, embeddings):
+    collection = store.create_collection("docs_en")
+    collection.block_rows = 700  # Several blocks, the last one partial
+    ids = fill(collection, embeddings)
+    queries = embeddings[[3, 1500]] + 0.1
+
+    results = collection.query(query_embeddings=queries.tolist(), n_results=5)
+
+    for query, found in zip(queries, results["ids"]):
+        assert found == [ids[i] for i in exact_top_k(embeddings, query, 5)]
+    assert results["metadatas"][0][0] == {"chunk_index": 3}
+    assert results["distances"][0] == sorted(results["distances"][0])
+
+def test_upsert_replaces_and_delete_frees_rows(store, embeddings):
+    collection = store.create_collection("docs_en")
+    fill(collection, embeddings[:10])
+    collection.upsert(ids=["chunk_0"], embeddings=[embeddings[20].tolist()], documents=["updated"], metadatas=[{}])
+    collection.delete(ids=["chunk_1", "chunk_2"])
+
+    assert collection.count() == 8
+    assert collection.get(ids=["chunk_0", "chunk_1"])["documents"] == ["updated"]
+    assert collection.query(query_embeddings=[embeddings[20].tolist()], n_results=1)["ids"] == [["chunk_0"]]
+    assert "chunk_1" not in collection.query(query_embeddings=[embeddings[1].tolist()], n_results=8)["ids"][0]
+
+    collection.upsert(ids=["new"], embeddings=[embeddings[1].tolist()])
+    assert collection.size == 10  # Reused a freed row
+
+def test_collection_persists_and_is_shared(tmp_path, embeddings):
+    collection = FlatVectorStore(tmp_path / "flat", dtype="float16").create_collection("docs_en", metadata={"hnsw:space": "cosine"})
+    fill(collection, embeddings)
+
+    reopened = FlatVectorStore(tmp_path / "flat").get_collection("docs_en")
+    assert reopened.count() == len(embeddings)
+    assert reopened.metadata == {"hnsw:space": "cosine"}
+    assert reopened.vectors.dtype == np.float16
+    assert reopened.query(query_embeddings=[embeddings[42].tolist()], n_results=1)["ids"] == [["chunk_42"]]
+
+def test_pages_rename_and_delete_collection(store, embeddings):
+    collection = store.create_collection("docs_en_migrating")
+    fill(collection, embeddings[:5])
+    page = collection.get(limit=2, offset=2, include=["embeddings"])
+    assert page["ids"] == ["chunk_2", "chunk_3"]
+    assert np.allclose(np.linalg.norm(page["embeddings"], axis=1), 1.0)
+
+    collection.modify(name="docs_en")
+    assert store.get_collection("docs_en").count() == 5
+    with pytest.raises(ValueError):
+        store.get_collection("docs_en_migrating")
+    store.delete_collection("docs_en")
+    assert store.list_collections() == []
+
+def test_dimension_mismatch_is_rejected(store):
+    collection = store.create_collection("docs_en")
+    collection.upsert(ids=["a"], embeddings=[[1.0, 0.0]])
+    with pytest.raises(ValueError):
+        collection.upsert(ids=["b"], embeddings=[[1.0, 0.0, 0.0]])
+
+@pytest.mark.parametrize("quantization", ["int8", "binary"])
+def test_quantized_search_rescores_with_full_precision(tmp_path, quantization):
+    # Clustered, like real embeddings, with enough dimensions for sign codes to rank candidates
+    rng = np.random.default_rng(0)
+    embeddings = (rng.normal(size=(100, 64))[rng.integers(0, 100, 3000)] + rng.normal(scale=0.5, size=(3000, 64))).astype(np.float32)
+    collection = FlatVectorStore(tmp_path / "flat", quantization=quantization).create_collection("docs_en")
+    collection.rescore_factor = 20
+    ids = fill(collection, embeddings)
+    queries = embeddings[:20] + np.random.default_rng(1).normal(scale=0.3, size=(20, 64)).astype(np.float32)
+
+    results = collection.query(query_embeddings=queries.tolist(), n_results=5)
+
+    recall = np.mean([len(set(found) & {ids[i] for i in exact_top_k(embeddings, query, 5)}) / 5
+                      for query, found in zip(queries, results["ids"])])
+    assert recall >= 0.9
+    # Returned distances are the exact ones, not the quantized estimates
+    exact = 1 - np.dot(embeddings[0] / np.linalg.norm(embeddings[0]), queries[0] / np.linalg.norm(queries[0]))
+    assert results["ids"][0][0] == "chunk_0"
+    assert results["distances"][0][0] == pytest.approx(exact, abs=1e-5)
+    assert collection.codes.shape[1] == (64 if quantization == "int8" else 8)
+
+def test_unknown_quantization_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        FlatVectorStore(tmp_path / "flat", quantization="pq").create_collection("docs_en")
+
+def upsert_from_worker(path, worker, count):
+    """Runs in a separate process: upserts count records in small batches, one transaction each."""
+    collection = FlatVectorStore(path).get_collection("docs_en")
+    for start in range(0, count, 10):
+        ids = [f"w{worker}_{i}" for i in range(start, start + 10)]
+        collection.upsert(ids=ids, embeddings=[[worker + 1.0, i + 1.0] for i in range(start, start + 10)])
+
+def test_processes_sharing_a_directory_see_each_other_and_never_share_rows(tmp_path):
+    path = tmp_path / "flat"
+    reader = FlatVectorStore(path).create_collection("docs_en")
+    reader.upsert(ids=["seed"], embeddings=[[1.0, 0.0]])
+    assert reader.count() == 1
+
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=upsert_from_worker, args=(path, worker, 200)) for worker in range(2)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    # Rows appended by other processes are visible to this one without reopening it
+    assert reader.count() == 401
+    stored = reader.get(ids=[f"w{worker}_{i}" for worker in range(2) for i in range(200)], include=["embeddings"])
+    expected = np.array([[worker + 1.0, i + 1.0] for worker in range(2) for i in range(200)])
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    np.testing.assert_allclose(stored["embeddings"], expected, rtol=1e-6)
+    assert reader.query(query_embeddings=[[2.0, 1.0]], n_results=1)["ids"] == [["w1_0"]]
+
+def test_rows_freed_by_another_process_are_reused(tmp_path):
+    first = FlatVectorStore(tmp_path / "flat").create_collection("docs_en")
+    second = FlatVectorStore(tmp_path / "flat").get_collection("docs_en")
+    first.upsert(ids=["a", "b"], embeddings=[[1.0, 0.0], [0.0, 1.0]])
+
+    second.delete(ids=["a"])
+    first.upsert(ids=["c"], embeddings=[[1.0, 1.0]])
+
+    assert first.count() == second.count() == 2
+    assert first.size == 2
+    assert second.get(ids=["b", "c"])["ids"] == ["b", "c"]
@@ -0,0 +1,140 @@
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import pytest
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from loguru import logger
+from pathlib import Path
+from unittest.mock import Mock, patch
+from backend.ingest_component import IngestComponent
+from backend.ingest_pipeline import IngestPipeline
+from backend.embedding_component import EmbeddingComponent
+from backend.document_registry import DocumentRegistry
+from backend.dedup import ChunkDeduplicator
+from backend.retrieval_cache import IndexGeneration
+
+@pytest.fixture
+def ingest_component(tmp_path):
+    with patch('chromadb.PersistentClient') as mock_client:
+        mock_collection = Mock()
+        mock_client.return_value.get_or_create_collection.return_value = mock_collection
+        mock_client.return_value.get_collection.return_value = mock_collection
+        embedding_component = Mock(spec=EmbeddingComponent)
+        embedding_component.get_embedding_dim.return_value = 3
+        embedding_component.embed_documents.side_effect = lambda texts: np.zeros((len(texts), 3), dtype=np.float32)
+        yield IngestComponent(embedding_component, registry=DocumentRegistry(tmp_path / "registry.sqlite3"),
+                              dedup=ChunkDeduplicator(tmp_path / "dedup.sqlite3"), generation=IndexGeneration(tmp_path / "cache.sqlite3"))
+
+def test_pipeline_ingests_files_in_order(ingest_component, tmp_path):
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"doc{i}.txt"
+        path.write_text(f"Document number {i}. " * 300)
+        paths.append(path)
+
+    pipeline = IngestPipeline(ingest_component, workers=3, queue_size=2)
+    with patch('backend.ingest_component.BATCH_SIZE', 4):
+        results = pipeline.run(paths)
+
+    assert [result["filename"] for result in results] == [path.name for path in paths]
+    assert all(result["status"] == "success" for result in results)
+    stats = pipeline.get_stats()
+    assert stats["parse"]["chunks"] == stats["embed"]["chunks"] == stats["store"]["chunks"]
+    # Repeated sentences chunk into identical text, which is stored once
+    assert stats["store"]["chunks"] == sum(result["chunks_count"] - result["duplicate_chunks"] for result in results)
+    assert pipeline.summary["duplicate_chunks"] > 0
+
+def test_pipeline_isolates_failures(ingest_component, tmp_path):
+    good = tmp_path / "good.txt"
+    good.write_text("A perfectly fine document.")
+    missing = tmp_path / "missing.txt"
+
+    unsupported = tmp_path / "image.txt"
+    unsupported.write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4)
+
+    pipeline = IngestPipeline(ingest_component, workers=2)
+    results = pipeline.run([missing, good, unsupported])
+
+    assert [result["status"] for result in results] == ["failed", "success", "failed"]
+    assert pipeline.summary["failed"] == 2
+    assert pipeline.summary["ingested"] == 1
+
+def test_pipeline_rolls_back_document_when_store_fails(ingest_component, tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text("Some text. " * 500)
+    ingest_component.collections["en"].upsert.side_effect = Exception("disk full")
+
+    with patch('backend.ingest_component.BATCH_SIZE', 2):
+        results = IngestPipeline(ingest_component).run([path])
+
+    assert results[0]["status"] == "failed"
+    assert ingest_component.registry.get(str(path.resolve())) is None
+    assert ingest_component.collections["en"].delete.called
+
+def test_pipeline_workers_are_not_forked_while_threads_hold_locks(ingest_component, tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text("Some text. " * 500)
+    stop = threading.Event()
+
+    def log_continuously():
+        while not stop.is_set():
+            logger.debug("Background thread holding the loguru handler lock")
+
+    logging_thread = threading.Thread(target=log_continuously, daemon=True)
+    logging_thread.start()
+    try:
+        assert ingest_component.sink.thread.is_alive()
+        with patch('backend.ingest_pipeline.ProcessPoolExecutor', wraps=ProcessPoolExecutor) as pool:
+            results = IngestPipeline(ingest_component, workers=2).run([path])
+    finally:
+        stop.set()
+        logging_thread.join()
+
+    assert results[0]["status"] == "success"
+    assert pool.call_args.kwargs["mp_context"].get_start_method() != "fork"
+
+def test_pipeline_workers_do_not_rerun_the_main_script(tmp_path):
+    # Mirrors main.py and api.py: a script with module-level side effects that ingests through the pipeline
+    script = tmp_path / "ingest_script.py"
+    script.write_text(textwrap.dedent("""
+        from pathlib import Path
+        from unittest.mock import Mock, patch
+        import numpy as np
+
+        with open("side_effects.log", "a") as log:
+            log.write("module executed\\n")
+
+        if __name__ == "__main__":
+            from backend.ingest_component import IngestComponent
+            from backend.ingest_pipeline import IngestPipeline
+            from backend.embedding_component import EmbeddingComponent
+            from backend.document_registry import DocumentRegistry
+            from backend.dedup import ChunkDeduplicator
+            from backend.retrieval_cache import IndexGeneration
+
+            with patch("chromadb.PersistentClient"):
+                embedding_component = Mock(spec=EmbeddingComponent)
+                embedding_component.get_embedding_dim.return_value = 3
+                embedding_component.embed_documents.side_effect = lambda texts: np.zeros((len(texts), 3), dtype=np.float32)
+                ingest_component = IngestComponent(embedding_component, registry=DocumentRegistry(Path("registry.sqlite3")),
+                                                   dedup=ChunkDeduplicator(Path("dedup.sqlite3")),
+                                                   generation=IndexGeneration(Path("cache.sqlite3")))
+            paths = []
+            for i in range(4):
+                path = Path(f"doc{i}.txt")
+                path.write_text(f"Document number {i}. " * 50)
+                paths.append(path)
+            results = IngestPipeline(ingest_component, workers=2).run(paths)
+            ingest_component.close()
+            assert all(result["status"] == "success" for result in results), results
+    """))
+    repo_root = Path(__file__).resolve().parent.parent
+
+    completed = subprocess.run([sys.executable, str(script)], cwd=tmp_path, env={**os.environ, "PYTHONPATH": str(repo_root)},
+                               capture_output=True, text=True, timeout=120)
+
+    assert completed.returncode == 0, completed.stderr
+    assert (tmp_path / "side_effects.log").read_text().splitlines() == ["module executed"]
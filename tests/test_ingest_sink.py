@@ -0,0 +1,120 @@
+import threading
+import pytest
+import numpy as np
+from unittest.mock import Mock
+from backend.ingest_sink import IngestSink
+
+@pytest.fixture
+def collections():
+    return {lang: Mock(name=lang) for lang in ("en", "fr")}
+
+@pytest.fixture
+def sink(collections):
+    sink = IngestSink(collections, max_batch_size=100, max_delay=0.05)
+    yield sink
+    sink.close()
+
+def submit(sink, lang, prefix, count, callback=None):
+    ids = [f"{prefix}_{i}" for i in range(count)]
+    return sink.submit(lang, ids, np.ones((count, 3), dtype=np.float32), [f"chunk {i}" for i in ids],
+                       [{"language": lang} for _ in ids], callback=callback)
+
+def test_concurrent_submissions_share_a_group_commit(collections):
+    sink = IngestSink(collections, max_batch_size=100, max_delay=1.0)
+    barrier = threading.Barrier(4)
+    futures = []
+
+    def task(n):
+        barrier.wait()
+        futures.append(submit(sink, "en", f"doc{n}", 25))
+
+    threads = [threading.Thread(target=task, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [future.result(timeout=5) for future in futures] == [25] * 4
+    upsert = collections["en"].upsert
+    assert upsert.call_count == 1
+    assert len(upsert.call_args.kwargs["ids"]) == 100
+    assert isinstance(upsert.call_args.kwargs["embeddings"], list)
+    assert sink.get_stats()["sink_flushes"] == 1
+    sink.close()
+
+def test_pending_writes_are_flushed_after_max_delay(sink, collections):
+    done = threading.Event()
+    future = submit(sink, "fr", "doc", 3, callback=lambda f: done.set())
+
+    assert done.wait(timeout=5)
+    assert future.result() == 3
+    collections["fr"].upsert.assert_called_once()
+    collections["en"].upsert.assert_not_called()
+    assert sink.get_stats()["sink_queue_depth"] == 0
+
+def test_delete_is_applied_after_pending_writes(collections):
+    sink = IngestSink(collections, max_batch_size=100, max_delay=10)
+    calls = []
+    collections["en"].upsert.side_effect = lambda **kwargs: calls.append("upsert")
+    collections["en"].delete.side_effect = lambda **kwargs: calls.append("delete")
+
+    write = submit(sink, "en", "doc", 2)
+    sink.delete(["doc_0", "doc_1"]).result(timeout=5)
+
+    assert write.done()
+    assert calls == ["upsert", "delete"]
+    sink.close()
+
+def test_mixed_language_batch_is_split_across_collections(sink, collections):
+    ids = ["doc_0", "doc_1", "doc_2"]
+    embeddings = np.arange(9, dtype=np.float32).reshape(3, 3)
+    future = sink.submit(["en", "fr", "en"], ids, embeddings, ["a", "b", "c"], [{}, {}, {}])
+
+    assert future.result(timeout=5) == 3
+    assert collections["en"].upsert.call_args.kwargs["ids"] == ["doc_0", "doc_2"]
+    assert collections["en"].upsert.call_args.kwargs["embeddings"] == embeddings[[0, 2]].tolist()
+    assert collections["fr"].upsert.call_args.kwargs["documents"] == ["b"]
+
+def test_write_error_is_reported_to_each_task(sink, collections):
+    collections["en"].upsert.side_effect = Exception("disk full")
+    future = submit(sink, "en", "doc", 2)
+
+    with pytest.raises(Exception, match="disk full"):
+        future.result(timeout=5)
+
+def test_malformed_batch_fails_its_group_commit_and_sink_keeps_running(sink, collections):
+    # Embedding widths differ, so the two batches cannot be concatenated into one upsert
+    same_commit = sink.submit("en", ["a", "b"], np.ones((2, 3), dtype=np.float32), ["a", "b"], [{}, {}])
+    wrong_width = sink.submit("en", ["c"], np.ones((1, 4), dtype=np.float32), ["c"], [{}])
+
+    for future in (same_commit, wrong_width):
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+    assert sink.thread.is_alive()
+    assert submit(sink, "fr", "doc", 2).result(timeout=5) == 2
+
+def test_full_queue_blocks_submitters(collections):
+    release = threading.Event()
+    collections["en"].upsert.side_effect = lambda **kwargs: release.wait(5)
+    sink = IngestSink(collections, max_batch_size=1, max_delay=0.0, queue_size=1)
+    first = submit(sink, "en", "first", 1)
+    submit(sink, "en", "second", 1)
+    blocked = threading.Thread(target=submit, args=(sink, "en", "third", 1))
+    blocked.start()
+
+    blocked.join(timeout=0.2)
+    assert blocked.is_alive()
+    release.set()
+    blocked.join(timeout=5)
+    assert not blocked.is_alive()
+    assert first.result(timeout=5) == 1
+    sink.close()
+
+def test_submissions_after_close_fail_immediately(collections):
+    sink = IngestSink(collections, max_batch_size=100, max_delay=1.0)
+    pending = submit(sink, "en", "doc", 2)
+    sink.close()
+
+    assert pending.result(timeout=0) == 2
+    with pytest.raises(RuntimeError, match="closed"):
+        submit(sink, "en", "late", 1).result(timeout=1)
@@ -1,8 +1,13 @@
 import pytest
+import numpy as np
 from unittest.mock import Mock, patch
 from pathlib import Path
 from backend.ingest_component import IngestComponent
 from backend.embedding_component import EmbeddingComponent
+from backend.document_registry import DocumentRegistry
+from backend.dedup import ChunkDeduplicator
+from backend.retrieval_cache import IndexGeneration
+from backend.chunking import get_chunker
 
 @pytest.fixture
 def mock_chroma_client():
@@ -11,31 +16,32 @@ def mock_chroma_client():
         mock_collection = Mock()
         mock_collection.count.return_value = 0
         mock_instance.get_or_create_collection.return_value = mock_collection
+        mock_instance.get_collection.return_value = mock_collection
         mock_client.return_value = mock_instance
         yield mock_client
 
 @pytest.fixture
 def mock_embedding_component():
-    return Mock(spec=EmbeddingComponent)
+    mock = Mock(spec=EmbeddingComponent)
+    mock.get_embedding_dim.return_value = 3
+    mock.embed_documents.side_effect = lambda texts: np.full((len(texts), 3), 0.1, dtype=np.float32)
+    return mock
 
 @pytest.fixture
-def ingest_component(mock_chroma_client, mock_embedding_component):
-    return IngestComponent(mock_embedding_component)
+def ingest_component(mock_chroma_client, mock_embedding_component, tmp_path):
+    return IngestComponent(mock_embedding_component, registry=DocumentRegistry(tmp_path / "registry.sqlite3"),
+                           dedup=ChunkDeduplicator(tmp_path / "dedup.sqlite3"), generation=IndexGeneration(tmp_path / "cache.sqlite3"))
 
 def test_ingest_component_initialization(ingest_component):
     assert ingest_component is not None
     assert ingest_component.embedding_component is not None
-    assert ingest_component.collection is not None
+    assert ingest_component.collections
 
 def test_ingest_file(ingest_component, tmp_path):
     # Create a temporary test file
     test_file = tmp_path / "test_document.txt"
     test_file.write_text("This is a test document for ingestion.")
 
-    # Mock the necessary methods
-    ingest_component.embedding_component.embed_documents.return_value = [[0.1, 0.2, 0.3]]
-    ingest_component.collection.add.return_value = None
-
     result = ingest_component.ingest_file(str(test_file))
     assert isinstance(result, dict)
     assert "filename" in result
@@ -46,14 +52,104 @@ def test_ingest_directory(ingest_component, tmp_path):
     (tmp_path / "doc1.txt").write_text("This is document 1.")
     (tmp_path / "doc2.txt").write_text("This is document 2.")
 
-    # Mock the necessary methods
-    ingest_component.embedding_component.embed_documents.return_value = [[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]]
-    ingest_component.collection.add.return_value = None
+    (tmp_path / "notes.xyz").write_text("Not a supported extension.")
 
-    results = ingest_component.ingest_directory(str(tmp_path))
+    results = ingest_component.ingest_directory(str(tmp_path), workers=2)
     assert isinstance(results, list)
     assert len(results) == 2
     assert all(isinstance(result, dict) for result in results)
+    assert ingest_component.last_ingest_summary["ingested"] == 2
+
+def test_ingest_unchanged_file_is_skipped(ingest_component, tmp_path):
+    test_file = tmp_path / "test_document.txt"
+    test_file.write_text("This is a test document for ingestion.")
+
+    assert ingest_component.ingest_file(str(test_file))["status"] == "success"
+    assert ingest_component.generation.current() == 1
+    ingest_component.embedding_component.embed_documents.reset_mock()
+
+    result = ingest_component.ingest_file(str(test_file))
+    assert result["status"] == "unchanged"
+    ingest_component.embedding_component.embed_documents.assert_not_called()
+    # Nothing changed, so cached retrieval results stay valid
+    assert ingest_component.generation.current() == 1
+
+def test_ingest_changed_file_replaces_stale_chunks(ingest_component, tmp_path):
+    test_file = tmp_path / "test_document.txt"
+    test_file.write_text("First version of the document.")
+    ingest_component.ingest_file(str(test_file))
+    old_ids = ingest_component.registry.get(str(test_file.resolve()))["chunk_ids"]
+
+    test_file.write_text("Second version of the document.")
+    result = ingest_component.ingest_file(str(test_file))
+    assert result["status"] == "updated"
+    new_ids = ingest_component.registry.get(str(test_file.resolve()))["chunk_ids"]
+    assert set(old_ids).isdisjoint(new_ids)
+    deleted = [call.kwargs["ids"] for call in ingest_component.collections["en"].delete.call_args_list]
+    assert old_ids in deleted
+
+def test_revised_file_only_embeds_and_writes_changed_chunks(ingest_component, tmp_path):
+    paragraphs = [f"Clause {i}. The parties agree to the terms set out in section {i}." * 8 for i in range(30)]
+    test_file = tmp_path / "contract.txt"
+    test_file.write_text("\n\n".join(paragraphs))
+    with patch('backend.ingest_component.get_chunker', lambda file_type: get_chunker(strategy="cdc")):
+        first = ingest_component.ingest_file(str(test_file))
+        old_ids = ingest_component.registry.get(str(test_file.resolve()))["chunk_ids"]
+        ingest_component.embedding_component.embed_documents.reset_mock()
+        ingest_component.collections["en"].upsert.reset_mock()
+
+        paragraphs[15] = paragraphs[15].replace("agree", "agreed", 1)
+        test_file.write_text("\n\n".join(paragraphs))
+        result = ingest_component.ingest_file(str(test_file))
+
+    embedded = sum(len(call.args[0]) for call in ingest_component.embedding_component.embed_documents.call_args_list)
+    written = [chunk_id for call in ingest_component.collections["en"].upsert.call_args_list for chunk_id in call.kwargs["ids"]]
+    new_ids = ingest_component.registry.get(str(test_file.resolve()))["chunk_ids"]
+    assert result["status"] == "updated"
+    assert 0 < embedded <= 3
+    assert result["reused_chunks"] == result["chunks_count"] - embedded
+    assert set(written) == set(new_ids) - set(old_ids)
+    assert first["chunks_count"] > 10
+
+def test_same_stem_in_different_directories_does_not_collide(ingest_component, tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    (tmp_path / "a" / "notes.txt").write_text("Notes from folder a.")
+    (tmp_path / "b" / "notes.txt").write_text("Notes from folder b.")
+    ingest_component.ingest_file(str(tmp_path / "a" / "notes.txt"))
+    ingest_component.ingest_file(str(tmp_path / "b" / "notes.txt"))
+    ids_a = ingest_component.registry.get(str((tmp_path / "a" / "notes.txt").resolve()))["chunk_ids"]
+    ids_b = ingest_component.registry.get(str((tmp_path / "b" / "notes.txt").resolve()))["chunk_ids"]
+    assert set(ids_a).isdisjoint(ids_b)
+
+def test_large_file_is_written_in_bounded_batches(ingest_component, tmp_path):
+    test_file = tmp_path / "large_document.txt"
+    test_file.write_text(" ".join(f"Sentence {i} of a long document." for i in range(2000)))
+
+    ingest_component.sink.max_batch_size = 8
+    with patch('backend.ingest_component.BATCH_SIZE', 8):
+        result = ingest_component.ingest_file(str(test_file))
+
+    upsert_calls = ingest_component.collections["en"].upsert.call_args_list
+    assert len(upsert_calls) > 1
+    assert all(len(call.kwargs["ids"]) <= 8 for call in upsert_calls)
+    assert sum(len(call.kwargs["ids"]) for call in upsert_calls) == result["chunks_count"]
+
+def test_mixed_language_document_is_routed_per_chunk(ingest_component, tmp_path):
+    ingest_component.collections.update({lang: Mock(name=lang) for lang in ingest_component.collections})
+    english = "The supplier shall deliver the goods within thirty days of receiving the purchase order. " * 8
+    french = "Le fournisseur doit livrer les marchandises dans les trente jours suivant la commande. " * 8
+    test_file = tmp_path / "contract.txt"
+    test_file.write_text(f"{english}\n\n{french}")
+
+    with patch('backend.ingest_component.get_chunker', return_value=get_chunker(strategy="sentence", chunk_size=700, chunk_overlap=0)):
+        result = ingest_component.ingest_file(str(test_file))
+
+    stored = {lang: [metadata["language"] for call in collection.upsert.call_args_list for metadata in call.kwargs["metadatas"]]
+              for lang, collection in ingest_component.collections.items()}
+    assert stored["en"] and set(stored["en"]) == {"en"}
+    assert stored["fr"] and set(stored["fr"]) == {"fr"}
+    assert result["language"] == "en"
 
 def test_get_collection_stats(ingest_component):
     stats = ingest_component.get_collection_stats()
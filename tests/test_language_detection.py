@@ -0,0 +1,42 @@
+import pytest
+from backend.language_detection import LanguageDetector
+
+ENGLISH = "The contract sets out the payment terms and the obligations of both parties."
+FRENCH = "Le contrat précise les conditions de paiement et les obligations des deux parties."
+SPANISH = "El contrato establece las condiciones de pago y las obligaciones de ambas partes."
+
+@pytest.fixture
+def detector():
+    return LanguageDetector(sample_size=200, cache_size=2)
+
+def test_detects_supported_languages(detector):
+    assert detector.detect(ENGLISH) == "en"
+    assert detector.detect(FRENCH) == "fr"
+    assert detector.detect(SPANISH) == "es"
+
+def test_detection_is_deterministic():
+    text = "Data: 42 items"
+    results = {LanguageDetector().detect_with_probability(text) for _ in range(5)}
+    assert len(results) == 1
+
+def test_text_without_features_falls_back_to_default_language(detector):
+    assert detector.detect_with_probability("1234 ...") == ("en", 0.0)
+    assert detector.detect("") == "en"
+
+def test_long_text_is_sampled(detector):
+    sample = detector._sample(FRENCH * 100)
+    assert len(sample) < 220
+    assert detector.detect(FRENCH * 100) == "fr"
+
+def test_batch_detects_each_distinct_text_once(detector):
+    assert detector.detect_batch([ENGLISH, FRENCH, ENGLISH]) == ["en", "fr", "en"]
+    stats = detector.get_stats()
+    assert stats["language_cache_misses"] == 2
+    assert detector.detect(ENGLISH) == "en"
+    assert detector.get_stats()["language_cache_hits"] == 1
+
+def test_cache_evicts_least_recently_used(detector):
+    detector.detect_batch([ENGLISH, FRENCH, SPANISH])
+    assert len(detector.cache) == 2
+    detector.detect(ENGLISH)
+    assert detector.get_stats()["language_cache_misses"] == 4
@@ -0,0 +1,43 @@
+import pytest
+import numpy as np
+import chromadb
+from chromadb.config import Settings
+from backend.migrate_collections import migrate
+from backend.utils import get_language_collections, hnsw_metadata, language_collection_name
+
+@pytest.fixture
+def client(tmp_path):
+    return chromadb.PersistentClient(path=str(tmp_path / "chroma"), settings=Settings(anonymized_telemetry=False))
+
+@pytest.fixture
+def l2_collection(client):
+    # Created like the collections of earlier versions: no metadata, so the default L2 space
+    collection = client.create_collection(name=language_collection_name("en"))
+    embeddings = np.random.default_rng(0).normal(size=(50, 4)).astype(np.float32)
+    collection.add(ids=[f"chunk_{i}" for i in range(50)], embeddings=embeddings.tolist(),
+                   documents=[f"chunk {i}" for i in range(50)], metadatas=[{"chunk_index": i} for i in range(50)])
+    return embeddings
+
+def test_new_collections_use_configured_hnsw_settings(client):
+    collections = get_language_collections(client)
+    assert all(collection.metadata == hnsw_metadata() for collection in collections.values())
+
+def test_dry_run_reports_outdated_collection_without_changes(client, l2_collection):
+    results = migrate(languages=["en"], dry_run=True, client=client)
+    assert results[0]["status"] == "outdated"
+    assert client.get_collection(language_collection_name("en")).metadata is None
+
+def test_migration_rebuilds_collection_in_cosine_space(client, l2_collection):
+    results = migrate(languages=["en"], batch_size=16, client=client)
+    assert results[0] == {**results[0], "status": "migrated", "records": 50}
+
+    collection = client.get_collection(language_collection_name("en"))
+    assert collection.metadata == hnsw_metadata()
+    assert collection.count() == 50
+    found = collection.query(query_embeddings=[(l2_collection[7] * 3).tolist()], n_results=1, include=["metadatas", "distances"])
+    # Cosine distance ignores the norm, so 1 - distance is the similarity
+    assert found["metadatas"][0][0] == {"chunk_index": 7}
+    assert found["distances"][0][0] == pytest.approx(0.0, abs=1e-4)
+    assert sorted(c.name for c in client.list_collections()) == [language_collection_name("en")]
+
+    assert migrate(languages=["en"], client=client)[0]["status"] == "up_to_date"
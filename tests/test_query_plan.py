@@ -0,0 +1,74 @@
+import pytest
+import numpy as np
+from unittest.mock import Mock, patch
+from backend.query_plan import QueryPlan
+from backend.query_component import QueryComponent
+from backend.retrieval_component import RetrievalComponent
+from backend.embedding_component import EmbeddingComponent
+from backend.retrieval_cache import RetrievalCache
+
+QUERY = "What are the payment terms of the supply contract?"
+
+@pytest.fixture
+def embedding_component():
+    mock = Mock(spec=EmbeddingComponent)
+    mock.embed_query.return_value = np.ones(3, dtype=np.float32)
+    mock.embed_documents.side_effect = lambda texts: np.ones((len(texts), 3), dtype=np.float32)
+    return mock
+
+@pytest.fixture
+def language_detector():
+    mock = Mock()
+    mock.detect.return_value = "en"
+    mock.detect_batch.side_effect = lambda texts: ["en"] * len(texts)
+    return mock
+
+@pytest.fixture
+def retrieval_component(embedding_component, language_detector, tmp_path):
+    collection = Mock()
+    collection.query.return_value = {"ids": [["c1"]], "documents": [["Payment is due in 30 days."]],
+                                     "metadatas": [[{"source": "contract.txt"}]], "distances": [[0.1]]}
+    with patch.object(RetrievalComponent, "_initialize_collections", return_value=(Mock(), {"en": collection})):
+        return RetrievalComponent(embedding_component, language_detector=language_detector,
+                                  cache=RetrievalCache(tmp_path / "cache.sqlite3"))
+
+def test_plan_computes_each_property_once(embedding_component, language_detector):
+    plan = QueryPlan("  What IS   RAG? ", embedding_component, language_detector)
+
+    assert plan.normalized_text == "what is rag?"
+    for _ in range(3):
+        plan.embedding, plan.language
+    embedding_component.embed_query.assert_called_once_with("  What IS   RAG? ")
+    language_detector.detect.assert_called_once()
+    assert set(plan.timings) == {"normalize", "embed", "language"}
+
+def test_batch_plans_embed_and_detect_together(embedding_component, language_detector):
+    plans = QueryPlan.batch(["first query", "second query"], embedding_component, language_detector)
+
+    assert [plan.language for plan in plans] == ["en", "en"]
+    assert all(plan.embedding.shape == (3,) for plan in plans)
+    embedding_component.embed_documents.assert_called_once()
+    embedding_component.embed_query.assert_not_called()
+
+@patch('backend.query_component.ollama.Client')
+def test_query_embeds_and_detects_once_across_stages(mock_ollama_client, embedding_component, language_detector, retrieval_component):
+    mock_ollama_client.return_value.generate.return_value = {"response": "Within 30 days."}
+    query_component = QueryComponent(embedding_component, retrieval_component)
+
+    result = query_component.process_query(QUERY)
+
+    assert result["response"] == "Within 30 days."
+    assert result["language"] == "en"
+    assert {"embed", "language", "retrieve", "generate"} <= set(result["timings"])
+    embedding_component.embed_query.assert_called_once_with(QUERY)
+    language_detector.detect.assert_called_once_with(QUERY)
+
+def test_semantic_search_embeds_once(embedding_component, language_detector, retrieval_component):
+    with patch('backend.query_component.ollama.Client'):
+        query_component = QueryComponent(embedding_component, retrieval_component)
+
+    results = query_component.semantic_search(QUERY, n_results=1)
+
+    assert [r["chunk_id"] for r in results] == ["c1"]
+    embedding_component.embed_query.assert_called_once_with(QUERY)
+    language_detector.detect.assert_called_once_with(QUERY)
@@ -0,0 +1,67 @@
+import pytest
+import numpy as np
+from unittest.mock import Mock, patch
+from backend.answer_cache import AnswerCache
+from backend.query_component import QueryComponent
+from backend.query_plan import QueryPlan
+from backend.retrieval_cache import IndexGeneration
+
+QUERY = "How do refunds work?"
+CHUNKS = [{"chunk_id": "doc_a", "chunk": "Refunds are issued within 14 days.", "metadata": {"source": "faq.txt"},
+           "language": "en", "similarity_score": 0.9}]
+
+@pytest.fixture
+def retrieval_component():
+    embedding_component = Mock()
+    embedding_component.embed_query.return_value = np.array([1, 0, 0], dtype=np.float32)
+    language_detector = Mock()
+    language_detector.detect.return_value = "en"
+    mock = Mock()
+    mock.plan.side_effect = lambda query: QueryPlan(query, embedding_component, language_detector)
+    mock.retrieve_plan.return_value = CHUNKS
+    mock.retrieve_by_id.side_effect = lambda ids: [{k: v for k, v in CHUNKS[0].items() if k != "similarity_score"}]
+    return mock
+
+@patch('backend.query_component.ollama.Client')
+def test_stream_sends_chunks_before_tokens(mock_ollama_client, retrieval_component):
+    generate = mock_ollama_client.return_value.generate
+    generate.return_value = iter([{"response": "Within "}, {"response": ""}, {"response": "14 days."}])
+    query_component = QueryComponent(Mock(), retrieval_component)
+
+    events = list(query_component.stream_query(QUERY, model="llama"))
+
+    assert [event["event"] for event in events] == ["chunks", "token", "token", "done"]
+    assert events[0]["data"]["relevant_chunks"] == CHUNKS
+    assert "".join(event["data"]["token"] for event in events[1:3]) == "Within 14 days."
+    assert {"first_token", "generate"} <= set(events[-1]["data"]["timings"])
+    assert generate.call_args.kwargs["stream"] is True
+    assert generate.call_args.kwargs["model"] == "llama"
+
+@patch('backend.query_component.ollama.Client')
+def test_stream_ends_with_error_event_when_generation_fails(mock_ollama_client, retrieval_component, tmp_path):
+    def failing_stream():
+        yield {"response": "Within "}
+        raise ConnectionError("Ollama unavailable")
+
+    mock_ollama_client.return_value.generate.return_value = failing_stream()
+    cache = AnswerCache(max_entries=4, generation=IndexGeneration(tmp_path / "cache.sqlite3"))
+    query_component = QueryComponent(Mock(), retrieval_component, answer_cache=cache)
+
+    events = list(query_component.stream_query(QUERY))
+
+    assert [event["event"] for event in events] == ["chunks", "token", "error"]
+    assert "Ollama unavailable" in events[-1]["data"]["error"]
+    assert cache.get_stats()["answer_cache_entries"] == 0
+
+@patch('backend.query_component.ollama.Client')
+def test_streamed_answer_is_cached_and_replayed(mock_ollama_client, retrieval_component, tmp_path):
+    generate = mock_ollama_client.return_value.generate
+    generate.return_value = iter([{"response": "Within 14 days."}])
+    query_component = QueryComponent(Mock(), retrieval_component, answer_cache=AnswerCache(max_entries=4, generation=IndexGeneration(tmp_path / "cache.sqlite3")))
+
+    list(query_component.stream_query(QUERY))
+    events = list(query_component.stream_query("What is the refund process?"))
+
+    assert events[0]["data"]["cached"] is True
+    assert [event["data"] for event in events if event["event"] == "token"] == [{"token": "Within 14 days."}]
+    generate.assert_called_once()
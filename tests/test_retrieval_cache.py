@@ -0,0 +1,78 @@
+import pytest
+import numpy as np
+from unittest.mock import Mock, patch
+from backend.retrieval_cache import IndexGeneration, RetrievalCache
+from backend.retrieval_component import RetrievalComponent
+from backend.embedding_component import EmbeddingComponent
+
+RESULTS = [{"chunk_id": "c1", "chunk": "Payment is due in 30 days.", "metadata": {"source": "contract.txt"},
+            "similarity_score": 0.9, "language": "en"}]
+
+@pytest.fixture
+def cache(tmp_path):
+    return RetrievalCache(tmp_path / "cache.sqlite3", max_entries=2)
+
+@pytest.fixture
+def retrieval_component(cache):
+    embedding_component = Mock(spec=EmbeddingComponent)
+    embedding_component.embed_query.return_value = np.ones(3, dtype=np.float32)
+    embedding_component.embed_documents.side_effect = lambda texts: np.ones((len(texts), 3), dtype=np.float32)
+    language_detector = Mock()
+    language_detector.detect.return_value = "en"
+    language_detector.detect_batch.side_effect = lambda texts: ["en"] * len(texts)
+    collection = Mock()
+    collection.query.return_value = {"ids": [["c1"]], "documents": [["Payment is due in 30 days."]],
+                                     "metadatas": [[{"source": "contract.txt"}]], "distances": [[0.1]]}
+    with patch.object(RetrievalComponent, "_initialize_collections", return_value=(Mock(), {"en": collection})):
+        return RetrievalComponent(embedding_component, language_detector=language_detector, cache=cache)
+
+def test_repeated_query_is_served_from_cache(retrieval_component):
+    first = retrieval_component.retrieve("What are the payment terms?", k=1)
+    second = retrieval_component.retrieve("  what are the PAYMENT terms? ", k=1)
+
+    assert first == second
+    retrieval_component.embedding_component.embed_query.assert_called_once()
+    retrieval_component.collections["en"].query.assert_called_once()
+    assert retrieval_component.cache.get_stats()["retrieval_cache_hits"] == 1
+
+def test_key_depends_on_k_and_routing_mode(retrieval_component):
+    retrieval_component.retrieve("What are the payment terms?", k=1)
+    retrieval_component.retrieve("What are the payment terms?", k=2)
+    retrieval_component.routing = False
+    retrieval_component.retrieve("What are the payment terms?", k=1)
+
+    assert retrieval_component.embedding_component.embed_query.call_count == 3
+
+def test_generation_bump_invalidates_entries(cache):
+    key = cache.key("payment terms", 1, "fanout")
+    cache.put(key, RESULTS)
+    assert cache.get(cache.key("payment terms", 1, "fanout")) == RESULTS
+
+    cache.generation.bump()
+    assert cache.get(cache.key("payment terms", 1, "fanout")) is None
+
+def test_entries_are_shared_across_processes_through_the_backing_store(cache, tmp_path):
+    cache.put(cache.key("payment terms", 1, "fanout"), RESULTS)
+
+    other_worker = RetrievalCache(tmp_path / "cache.sqlite3")
+    assert other_worker.get(other_worker.key("payment terms", 1, "fanout")) == RESULTS
+    assert other_worker.get_stats()["retrieval_cache_shared_hits"] == 1
+
+    # A bump by any process, e.g. an ingestion worker, invalidates every cache
+    IndexGeneration(tmp_path / "cache.sqlite3").bump()
+    assert cache.get(cache.key("payment terms", 1, "fanout")) is None
+
+def test_expired_entries_are_not_served(tmp_path):
+    cache = RetrievalCache(tmp_path / "cache.sqlite3", ttl=0)
+    key = cache.key("payment terms", 1, "fanout")
+    cache.put(key, RESULTS)
+    assert cache.get(key) is None
+
+def test_batch_retrieve_only_embeds_cache_misses(retrieval_component):
+    retrieval_component.retrieve("What are the payment terms?", k=1)
+
+    results = retrieval_component.batch_retrieve(["What are the payment terms?", "Who signed the contract?"], k=1)
+
+    assert len(results) == 2
+    texts = retrieval_component.embedding_component.embed_documents.call_args.args[0]
+    assert texts == ["Who signed the contract?"]
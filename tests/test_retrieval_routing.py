@@ -0,0 +1,114 @@
+import threading
+import pytest
+import numpy as np
+from unittest.mock import Mock, patch
+from backend.retrieval_component import RetrievalComponent
+from backend.embedding_component import EmbeddingComponent
+from backend.language_detection import LanguageDetector
+from backend.retrieval_cache import RetrievalCache
+
+def query_result(lang, scores):
+    return {
+        "ids": [[f"{lang}_{i}" for i in range(len(scores))]],
+        "documents": [[f"{lang} chunk {i}" for i in range(len(scores))]],
+        "metadatas": [[{"language": lang} for _ in scores]],
+        "distances": [[1 - score for score in scores]],
+    }
+
+@pytest.fixture
+def collections():
+    return {lang: Mock(name=lang) for lang in ("en", "fr", "es")}
+
+@pytest.fixture
+def retrieval_component(collections, tmp_path):
+    embedding_component = Mock(spec=EmbeddingComponent)
+    embedding_component.embed_query.return_value = np.ones(3, dtype=np.float32)
+    embedding_component.embed_documents.side_effect = lambda texts: np.ones((len(texts), 3), dtype=np.float32)
+    with patch.object(RetrievalComponent, "_initialize_collections", return_value=(Mock(), collections)):
+        return RetrievalComponent(embedding_component, language_detector=LanguageDetector(), routing_min_score=0.5,
+                                  cache=RetrievalCache(tmp_path / "cache.sqlite3"))
+
+QUERY = "What are the payment terms of the supply contract?"
+
+def test_confident_routed_search_queries_one_collection(retrieval_component, collections):
+    collections["en"].query.return_value = query_result("en", [0.9, 0.8])
+
+    results = retrieval_component.retrieve(QUERY, k=2)
+
+    assert [r["chunk_id"] for r in results] == ["en_0", "en_1"]
+    collections["fr"].query.assert_not_called()
+    collections["es"].query.assert_not_called()
+    assert retrieval_component.get_routing_stats()["routing_hit_rate"] == 1.0
+
+@pytest.mark.parametrize("scores, fr_scores, expected", [
+    ([0.10, 0.05], [0.95, 0.94], ["fr_0", "fr_1"]),
+    ([0.3, 0.2], [0.95, 0.4], ["fr_0", "fr_1"]),
+    ([0.9], [0.85, 0.4], ["en_0", "fr_0"]),
+])
+def test_low_score_or_too_few_results_fall_back_to_all_collections(retrieval_component, collections, scores, fr_scores, expected):
+    collections["en"].query.return_value = query_result("en", scores)
+    collections["fr"].query.return_value = query_result("fr", fr_scores)
+    collections["es"].query.return_value = query_result("es", [0.1])
+
+    results = retrieval_component.retrieve(QUERY, k=2)
+
+    # Fallback results are merged by score, so better matches in other languages are returned
+    assert [r["chunk_id"] for r in results] == expected
+    collections["fr"].query.assert_called_once()
+    assert retrieval_component.get_routing_stats()["routing_fallbacks"] == 1
+
+def test_fallback_prefers_query_language_on_equal_scores(retrieval_component, collections):
+    collections["en"].query.return_value = query_result("en", [0.3])
+    collections["fr"].query.return_value = query_result("fr", [0.3, 0.2])
+    collections["es"].query.return_value = query_result("es", [0.1])
+
+    results = retrieval_component.retrieve(QUERY, k=2)
+
+    assert [r["chunk_id"] for r in results] == ["en_0", "fr_0"]
+
+def test_batch_retrieve_routes_each_query(retrieval_component, collections):
+    collections["en"].query.return_value = query_result("en", [0.9])
+    collections["fr"].query.return_value = query_result("fr", [0.9])
+
+    results = retrieval_component.batch_retrieve([QUERY, "Quelles sont les conditions de paiement du contrat ?"], k=1)
+
+    assert [r[0]["language"] for r in results] == ["en", "fr"]
+    collections["es"].query.assert_not_called()
+    assert retrieval_component.get_routing_stats()["routing_hits"] == 2
+
+def test_routing_disabled_searches_every_collection(retrieval_component, collections):
+    retrieval_component.routing = False
+    for lang, collection in collections.items():
+        collection.query.return_value = query_result(lang, [0.9])
+
+    retrieval_component.retrieve(QUERY, k=1)
+
+    assert all(collection.query.call_count == 1 for collection in collections.values())
+    assert retrieval_component.get_routing_stats()["routed_queries"] == 0
+
+def test_fan_out_queries_collections_concurrently(retrieval_component, collections):
+    retrieval_component.routing = False
+    barrier = threading.Barrier(len(collections), timeout=5)
+
+    def query(lang, scores):
+        def run(**kwargs):
+            barrier.wait()  # Only passes when every collection is queried at the same time
+            return query_result(lang, scores)
+        return run
+
+    collections["en"].query.side_effect = query("en", [0.2, 0.1])
+    collections["fr"].query.side_effect = query("fr", [0.9, 0.8])
+    collections["es"].query.side_effect = query("es", [0.7])
+
+    results = retrieval_component.retrieve(QUERY, k=3)
+
+    assert [r["chunk_id"] for r in results] == ["en_0", "en_1", "fr_0"]
+
+def test_retrieve_by_id_gets_from_all_collections(retrieval_component, collections):
+    for lang, collection in collections.items():
+        collection.get.return_value = {"ids": [f"{lang}_0"], "documents": [f"{lang} chunk"], "metadatas": [{}]}
+
+    results = retrieval_component.retrieve_by_id(["en_0", "fr_0", "es_0"])
+
+    assert [r["chunk_id"] for r in results] == ["en_0", "fr_0", "es_0"]
+    assert all(collection.get.call_args.kwargs["ids"] == ["en_0", "fr_0", "es_0"] for collection in collections.values())
@@ -0,0 +1,70 @@
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+from backend.single_flight import SingleFlight
+from backend.query_component import QueryComponent
+
+WAITERS = 5
+
+def test_concurrent_calls_share_one_execution():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    fn = Mock(side_effect=lambda: release.wait(5) and "answer")
+
+    with ThreadPoolExecutor(max_workers=WAITERS) as executor:
+        futures = [executor.submit(single_flight.do, "key", fn) for _ in range(WAITERS)]
+        while single_flight.get_stats()["single_flight_coalesced"] < WAITERS - 1:
+            threading.Event().wait(0.01)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == ["answer"] * WAITERS
+    fn.assert_called_once()
+    stats = single_flight.get_stats()
+    assert stats["single_flight_executions"] == 1
+    assert stats["single_flight_in_flight"] == 0
+
+def test_exception_reaches_every_waiter_and_releases_the_key():
+    single_flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise RuntimeError("Ollama unavailable")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(single_flight.do, "key", fail) for _ in range(2)]
+        while single_flight.get_stats()["single_flight_coalesced"] < 1:
+            threading.Event().wait(0.01)
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+
+    assert single_flight.do("key", lambda: "retried") == "retried"
+
+def test_sequential_calls_are_not_coalesced():
+    single_flight = SingleFlight()
+
+    assert [single_flight.do("key", lambda: i) for i in range(3)] == [0, 1, 2]
+    assert single_flight.get_stats()["single_flight_coalesced"] == 0
+
+@patch('backend.query_component.ollama.Client')
+def test_identical_queries_share_one_generation(mock_ollama_client):
+    release = threading.Event()
+    single_flight = SingleFlight()
+    query_component = QueryComponent(Mock(), Mock(), single_flight=single_flight)
+    process = Mock(side_effect=lambda query, model: release.wait(5) and {"query": query, "response": "Within 14 days."})
+
+    with patch.object(query_component, "_process_query", process), ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(query_component.process_query, query, "llama")
+                   for query in ["How do refunds work?", "how do  refunds work?", "How do refunds work?"]]
+        while single_flight.get_stats()["single_flight_coalesced"] < 2:
+            threading.Event().wait(0.01)
+        release.set()
+        results = [future.result() for future in futures]
+
+    process.assert_called_once()
+    assert [result["response"] for result in results] == ["Within 14 days."] * 3
+    assert results[1]["query"] == "how do  refunds work?"
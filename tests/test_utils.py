@@ -0,0 +1,33 @@
+import pytest
+from backend.utils import chunk_text, iter_chunks, batched
+
+def test_iter_chunks_matches_chunk_text_across_block_boundaries():
+    text = "".join(f"word{i} " for i in range(2000))
+    blocks = [text[i:i + 337] for i in range(0, len(text), 337)]
+    assert list(iter_chunks(blocks, chunk_size=100, chunk_overlap=20)) == chunk_text(text, chunk_size=100, chunk_overlap=20)
+
+def test_iter_chunks_is_lazy():
+    def blocks():
+        yield "a" * 50
+        raise AssertionError("second block should not be read yet")
+    chunks = iter_chunks(blocks(), chunk_size=10, chunk_overlap=2)
+    assert next(chunks) == "a" * 10
+
+def test_iter_chunks_rejects_overlap_not_smaller_than_size():
+    with pytest.raises(ValueError):
+        list(iter_chunks(["text"], chunk_size=10, chunk_overlap=10))
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+def test_inspect_file_computes_type_hash_and_content_from_one_buffer(tmp_path):
+    import hashlib
+    from backend.utils import inspect_file, read_file, get_file_metadata
+    path = tmp_path / "document.txt"
+    path.write_bytes("Ligne une\r\nLigne deux\n".encode("utf-8"))
+
+    with inspect_file(path) as inspection:
+        assert inspection.file_type == "text/plain"
+        assert inspection.file_hash == hashlib.sha256(path.read_bytes()).hexdigest()
+        assert read_file(path, inspection) == "Ligne une\nLigne deux\n"
+        assert get_file_metadata(path, inspection)["file_hash"] == inspection.file_hash